@@ -0,0 +1,90 @@
+# benchmarks/bench_chart_encoding.py
+"""
+Chart payloads with plain JSON lists versus Plotly typed arrays.
+
+For line, scatter and heatmap charts on a synthetic frame, reports the
+serialized size, build + dumps time and loads time of each encoding, and
+checks the typed payload decodes back to the same numbers.
+
+Usage:
+    python -m benchmarks.bench_chart_encoding --rows 5000 50000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.mcp_servers.charts import heatmap_chart, line_chart, scatter_chart
+from src.mcp_servers.encoding import from_typed_array, is_typed_array
+
+
+def make_frame(n_rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "x": np.arange(n_rows),
+        "y": rng.random(n_rows) * 1000,
+        "size": rng.integers(1, 30, n_rows),
+        "color": rng.integers(0, 5, n_rows).astype(str),
+        "hx": rng.integers(0, 100, n_rows),
+        "hy": np.arange(n_rows) // 100,
+    })
+
+
+def make_charts(df, encoding):
+    heat = df.drop_duplicates(["hx", "hy"])
+    return {
+        "line": lambda: line_chart(df, "x", "y", color_column="color", max_points=0, encoding=encoding),
+        "scatter": lambda: scatter_chart(df, "x", "y", size_column="size", max_points=0, encoding=encoding),
+        "heatmap": lambda: heatmap_chart(heat, "hx", "hy", "y", encoding=encoding),
+    }
+
+
+def decode(value):
+    if is_typed_array(value):
+        return from_typed_array(value).tolist()
+    if isinstance(value, dict):
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+def _timed(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main(args):
+    report = {"runs": []}
+    for n_rows in args.rows:
+        df = make_frame(n_rows)
+        charts = {encoding: make_charts(df, encoding) for encoding in ("json", "typed")}
+        for chart_type in charts["json"]:
+            run = {"rows": n_rows, "chart": chart_type}
+            payloads = {}
+            for encoding, builders in charts.items():
+                payload, seconds = _timed(lambda: json.dumps(builders[chart_type]()), args.repeat)
+                _, parse_seconds = _timed(lambda: json.loads(payload), args.repeat)
+                payloads[encoding] = payload
+                run[f"{encoding}_bytes"] = len(payload)
+                run[f"{encoding}_dumps_ms"] = round(seconds * 1000, 1)
+                run[f"{encoding}_loads_ms"] = round(parse_seconds * 1000, 2)
+            run["size_ratio"] = round(run["json_bytes"] / run["typed_bytes"], 1)
+            # Compared as JSON text so NaN cells count as equal
+            run["identical"] = json.dumps(decode(json.loads(payloads["typed"]))) == payloads["json"]
+            report["runs"].append(run)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
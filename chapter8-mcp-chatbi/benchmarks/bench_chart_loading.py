@@ -0,0 +1,79 @@
+# benchmarks/bench_chart_loading.py
+"""
+Loading a wide chart query into a DataFrame.
+
+Compares, on the seeded SQLite star schema of bench_tools:
+  - read_sql: pd.read_sql on the raw connection, as the visualization
+    server did before (object columns, every row materialized at once)
+  - fetch_frame: chunked fetchmany into Arrow record batches and an
+    Arrow-backed DataFrame, as visualization_server.execute_query does now
+
+Each method runs in a fresh process so its peak RSS is its own.
+
+Usage:
+    python -m benchmarks.bench_chart_loading --fact-rows 1000000 --rows 1000000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_tools import prepare_database
+from src.mcp_servers.frames import fetch_frame
+
+WIDE_QUERY = (
+    "SELECT s.*, r.name AS region, p.name AS product, p.category, c.name AS customer, c.segment "
+    "FROM sales s JOIN regions r ON r.id = s.region_id JOIN products p ON p.id = s.product_id "
+    "JOIN customers c ON c.id = s.customer_id WHERE s.id <= {rows}"
+)
+
+
+def _load(method, path, query, results):
+    connection = sqlite3.connect(path)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if method == "read_sql":
+        df = pd.read_sql(query, connection)
+    else:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        df = fetch_frame(cursor, max_bytes=1 << 40)
+    seconds = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put({
+        "method": method,
+        "rows": len(df),
+        "columns": df.shape[1],
+        "seconds": round(seconds, 3),
+        "frame_mb": round(df.memory_usage(deep=True).sum() / 1e6, 1),
+        "peak_rss_growth_mb": round((after - before) / 1024, 1),
+    })
+
+
+def main(args):
+    path, _ = prepare_database(args.data_dir, args.fact_rows, args.dim_rows)
+    query = WIDE_QUERY.format(rows=args.rows)
+    context = multiprocessing.get_context("spawn")
+    report = {"fact_rows": args.fact_rows, "runs": []}
+    for method in ("read_sql", "fetch_frame"):
+        results = context.Queue()
+        process = context.Process(target=_load, args=(method, path, query, results))
+        process.start()
+        report["runs"].append(results.get())
+        process.join()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fact-rows", type=int, default=200000)
+    parser.add_argument("--dim-rows", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=200000, help="rows selected by the wide query")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "chatbi-bench-data"))
+    main(parser.parse_args())
@@ -0,0 +1,89 @@
+# benchmarks/bench_concurrent_queries.py
+"""
+Concurrent query benchmark for the database MCP server.
+
+Runs N simulated agent sessions that each issue a slow query
+(SELECT SLEEP(s)) and compares:
+  - blocking: the old path, calling execute_query directly on the event loop
+  - worker_pool: the execute_sql_query tool, which offloads to run_db_call
+
+For each mode it reports wall time and the worst event loop stall, measured
+by a heartbeat task. With the worker pool the wall time should approach a
+single query's duration instead of N times it.
+
+Usage:
+    python -m benchmarks.bench_concurrent_queries --backend sqlite --concurrency 8
+    python -m benchmarks.bench_concurrent_queries --backend mysql  # uses DB_* env settings
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from src.mcp_servers import database_server
+from src.mcp_servers.db_pool import get_pool
+
+
+async def _heartbeat(interval, stop, lags):
+    """Record how late the event loop wakes up a periodic task."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def _run_mode(mode, concurrency, query):
+    async def blocking_call():
+        return database_server.execute_query(query)
+
+    async def worker_pool_call():
+        return await database_server.execute_sql_query(query)
+
+    call = blocking_call if mode == "blocking" else worker_pool_call
+
+    stop = asyncio.Event()
+    lags = []
+    heartbeat = asyncio.create_task(_heartbeat(0.01, stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - started
+    stop.set()
+    await heartbeat
+
+    return {
+        "mode": mode,
+        "wall_time_s": round(wall_time, 4),
+        "max_loop_stall_s": round(max(lags, default=0.0), 4),
+    }
+
+
+async def main(args):
+    if args.backend == "sqlite":
+        from benchmarks.sqlite_backend import install_sqlite_pool
+        path = os.path.join(tempfile.mkdtemp(prefix="chatbi-bench-"), "bench.db")
+        install_sqlite_pool(path, size=args.concurrency)
+
+    query = f"SELECT SLEEP({args.query_seconds}) AS slept"
+    results = []
+    for mode in ("blocking", "worker_pool"):
+        results.append(await _run_mode(mode, args.concurrency, query))
+
+    report = {
+        "backend": args.backend,
+        "concurrency": args.concurrency,
+        "query_seconds": args.query_seconds,
+        "results": results,
+        "speedup": round(results[0]["wall_time_s"] / results[1]["wall_time_s"], 2),
+        "pool": get_pool().metrics(),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--query-seconds", type=float, default=0.5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+# benchmarks/bench_json_formats.py
+"""
+Payload size and encode/decode time of the execute_sql_query_json formats.
+
+Builds a synthetic wide result (row dicts, as returned by execute_query) and
+encodes it as:
+  - baseline: json.dumps(rows, default=str), the original encoding
+  - rows / columnar / arrow: the renderers behind execute_sql_query_json
+
+Usage:
+    python -m benchmarks.bench_json_formats --rows 10000 --columns 20
+"""
+import argparse
+import datetime
+import decimal
+import json
+import random
+import time
+
+from src.mcp_servers.database_server import PAGE_RENDERERS
+from src.mcp_servers.encoding import decode_result_payload, dumps, from_arrow_base64
+
+
+def make_rows(n_rows, n_columns, seed=42):
+    """Rows mixing ints, decimals, floats, short strings and dates, like a BI fact table."""
+    rng = random.Random(seed)
+    base_date = datetime.date(2024, 1, 1)
+    makers = [
+        lambda: rng.randint(0, 1_000_000),
+        lambda: decimal.Decimal(rng.randint(0, 10_000_00)) / 100,
+        lambda: rng.random() * 1000,
+        lambda: rng.choice(["north", "south", "east", "west", "central"]),
+        lambda: base_date + datetime.timedelta(days=rng.randint(0, 365)),
+    ]
+    columns = [f"{['id', 'amount', 'ratio', 'region', 'order_date'][i % 5]}_{i}" for i in range(n_columns)]
+    return [
+        {col: makers[i % len(makers)]() for i, col in enumerate(columns)}
+        for _ in range(n_rows)
+    ], columns
+
+
+def _timed(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main(args):
+    rows, columns = make_rows(args.rows, args.columns)
+
+    encoders = {
+        "baseline": lambda: json.dumps(rows, default=str),
+        "rows": lambda: PAGE_RENDERERS["rows"](rows, columns),
+        "columnar": lambda: dumps({"columns": columns})[:-1] + ',"rows":' + PAGE_RENDERERS["columnar"](rows, columns) + "}",
+        "arrow": lambda: dumps({"columns": columns, "format": "arrow-ipc-stream",
+                                "data": PAGE_RENDERERS["arrow"](rows, columns)}),
+    }
+    decoders = {
+        "baseline": json.loads,
+        "rows": decode_result_payload,
+        "columnar": decode_result_payload,
+        "arrow": lambda payload: from_arrow_base64(json.loads(payload)["data"]),
+    }
+
+    report = {"rows": args.rows, "columns": args.columns, "formats": {}}
+    baseline_bytes = None
+    for name, encode in encoders.items():
+        payload, encode_s = _timed(encode, args.repeat)
+        _, decode_s = _timed(lambda: decoders[name](payload), args.repeat)
+        size = len(payload.encode())
+        baseline_bytes = baseline_bytes or size
+        report["formats"][name] = {
+            "bytes": size,
+            "size_ratio_vs_baseline": round(baseline_bytes / size, 2),
+            "encode_ms": round(encode_s * 1000, 2),
+            "decode_ms": round(decode_s * 1000, 2),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,403 @@
+# benchmarks/bench_tools.py
+"""
+End-to-end benchmark of every tool of the database and visualization MCP
+servers on synthetic data.
+
+Seeds a SQLite star schema (a `sales` fact table plus `regions`, `products`
+and `customers` dimensions) at the requested sizes, then calls each tool
+`--requests` times with `--concurrency` calls in flight, through the same
+coroutines the MCP servers expose. Seeded databases are kept in
+`--data-dir` and reused by later runs of the same size, and the data is
+generated deterministically, so runs on different commits are comparable.
+
+For each tool it reports latency percentiles (p50/p95/p99), throughput,
+response bytes, errors and peak RSS, as JSON.
+
+Usage:
+    python -m benchmarks.bench_tools --fact-rows 1000000 --dim-rows 10000 --concurrency 8
+    python -m benchmarks.bench_tools --tools execute_sql,create_line_chart --output run.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Bump when the generated data changes, so stale seeded files are not reused
+SEED_VERSION = 2
+
+REGIONS = ["north", "south", "east", "west", "central", "north-east",
+           "north-west", "south-east", "south-west", "overseas", "online", "wholesale"]
+CATEGORIES = ["electronics", "furniture", "grocery", "clothing", "toys", "books",
+              "sports", "beauty", "garden", "automotive", "office", "pets"]
+SEGMENTS = ["consumer", "corporate", "home office", "small business"]
+
+# Deterministic pseudo-random integer in [0, 2^31 - 1) from a row number and a salt:
+# two Lehmer steps modulo a prime, with a multiplier per salt so that columns
+# drawn with different salts are not correlated
+_PRIME = 2147483647
+_HASH = "(((({x} * {multiplier}) % {prime}) * 48271) % {prime})"
+
+
+def _hash(x, salt):
+    multiplier = (salt * 2654435761) % _PRIME or 1
+    return _HASH.format(x=x, multiplier=multiplier, prime=_PRIME)
+
+
+def _pick(values, x, salt):
+    """SQL CASE expression choosing one of `values` from a hash of `x`."""
+    branches = " ".join(f"WHEN {i} THEN '{value}'" for i, value in enumerate(values))
+    return f"CASE {_hash(x, salt)} % {len(values)} {branches} END"
+
+
+def _seq(n):
+    return f"WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < {int(n)})"
+
+
+def seed_database(path, fact_rows, dim_rows):
+    """Create and fill the synthetic star schema in a new SQLite file."""
+    import sqlite3
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    statements = [
+        "CREATE TABLE regions (id INTEGER PRIMARY KEY, name TEXT NOT NULL, country TEXT)",
+        "CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT NOT NULL, category TEXT NOT NULL, "
+        "unit_price REAL NOT NULL)",
+        "CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT NOT NULL, segment TEXT NOT NULL, "
+        "region_id INTEGER REFERENCES regions(id), signup_date TEXT)",
+        "CREATE TABLE sales (id INTEGER PRIMARY KEY, order_date TEXT NOT NULL, "
+        "customer_id INTEGER REFERENCES customers(id), product_id INTEGER REFERENCES products(id), "
+        "region_id INTEGER REFERENCES regions(id), quantity INTEGER NOT NULL, amount REAL NOT NULL)",
+
+        "INSERT INTO regions (id, name, country) VALUES "
+        + ", ".join(f"({i + 1}, '{name}', '{'XX' if name in ('overseas', 'online') else 'US'}')"
+                    for i, name in enumerate(REGIONS)),
+
+        f"INSERT INTO products {_seq(dim_rows)} "
+        f"SELECT x, 'product ' || x, {_pick(CATEGORIES, 'x', 11)}, "
+        f"ROUND(1 + {_hash('x', 13)} % 50000 / 100.0, 2) FROM seq",
+
+        f"INSERT INTO customers {_seq(dim_rows)} "
+        f"SELECT x, 'customer ' || x, {_pick(SEGMENTS, 'x', 17)}, 1 + {_hash('x', 19)} % {len(REGIONS)}, "
+        f"date('2020-01-01', '+' || ({_hash('x', 23)} % 1460) || ' days') FROM seq",
+
+        f"INSERT INTO sales {_seq(fact_rows)} "
+        f"SELECT x, date('2023-01-01', '+' || ({_hash('x', 29)} % 730) || ' days'), "
+        f"1 + {_hash('x', 31)} % {dim_rows}, 1 + {_hash('x', 37)} % {dim_rows}, "
+        f"1 + {_hash('x', 41)} % {len(REGIONS)}, 1 + {_hash('x', 43)} % 20, "
+        f"ROUND({_hash('x', 47)} % 100000 / 100.0, 2) FROM seq",
+
+        "CREATE INDEX idx_sales_order_date ON sales (order_date)",
+        "CREATE INDEX idx_sales_region ON sales (region_id)",
+        "CREATE INDEX idx_sales_product ON sales (product_id)",
+        "ANALYZE",
+    ]
+    for statement in statements:
+        connection.execute(statement)
+    connection.commit()
+    connection.close()
+
+
+def prepare_database(data_dir, fact_rows, dim_rows, reseed=False):
+    """Return the path of a seeded database, seeding it if needed, and the seconds spent seeding."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"chatbi_v{SEED_VERSION}_f{fact_rows}_d{dim_rows}.db")
+    if os.path.exists(path) and not reseed:
+        return path, 0.0
+    if os.path.exists(path):
+        os.remove(path)
+    started = time.perf_counter()
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    seed_database(partial, fact_rows, dim_rows)
+    os.replace(partial, path)
+    return path, time.perf_counter() - started
+
+
+# Daily revenue per region, also charted from its stored result_id
+DAILY_REVENUE = (
+    "SELECT s.order_date, r.name AS region, SUM(s.amount) AS revenue FROM sales s "
+    "JOIN regions r ON r.id = s.region_id GROUP BY s.order_date, r.name ORDER BY s.order_date"
+)
+
+
+def build_scenarios(db, viz, page_token, result_id):
+    """(name, zero-argument coroutine factory) for every tool of both servers."""
+    revenue_by_region = (
+        "SELECT r.name AS region, SUM(s.amount) AS revenue FROM sales s "
+        "JOIN regions r ON r.id = s.region_id GROUP BY r.name ORDER BY revenue DESC"
+    )
+    daily_revenue = DAILY_REVENUE
+    category_share = (
+        "SELECT p.category, SUM(s.amount) AS revenue FROM sales s "
+        "JOIN products p ON p.id = s.product_id GROUP BY p.category"
+    )
+    region_category = (
+        "SELECT r.name AS region, p.category, SUM(s.amount) AS revenue FROM sales s "
+        "JOIN regions r ON r.id = s.region_id JOIN products p ON p.id = s.product_id "
+        "GROUP BY r.name, p.category"
+    )
+    order_points = (
+        "SELECT s.quantity, s.amount, r.name AS region FROM sales s "
+        "JOIN regions r ON r.id = s.region_id WHERE s.id <= 20000"
+    )
+    wide_rows = "SELECT * FROM sales WHERE id <= 5000"
+    dashboard = json.dumps([
+        {"chart_type": "bar", "query": revenue_by_region, "x_column": "region", "y_column": "revenue"},
+        {"chart_type": "line", "query": daily_revenue, "x_column": "order_date", "y_column": "revenue",
+         "color_column": "region"},
+        {"chart_type": "pie", "query": category_share, "labels_column": "category", "values_column": "revenue"},
+        {"chart_type": "heatmap", "query": region_category, "x_column": "region", "y_column": "category",
+         "z_column": "revenue"},
+    ])
+
+    return [
+        ("database.get_table_schema", lambda: db.get_table_schema("sales")),
+        ("database.describe_database", lambda: db.describe_database()),
+        ("database.list_tables", lambda: db.list_tables()),
+        ("database.execute_sql_query", lambda: db.execute_sql_query(revenue_by_region)),
+        ("database.execute_sql_query.paged", lambda: db.execute_sql_query(wide_rows)),
+        ("database.execute_sql_query_json.rows", lambda: db.execute_sql_query_json(wide_rows)),
+        ("database.execute_sql_query_json.columnar",
+         lambda: db.execute_sql_query_json(wide_rows, format="columnar")),
+        ("database.execute_sql_query_json.arrow", lambda: db.execute_sql_query_json(wide_rows, format="arrow")),
+        ("database.fetch_result_page", lambda: db.fetch_result_page(page_token)),
+        ("database.get_table_sample", lambda: db.get_table_sample("sales", 20)),
+        ("database.get_database_stats", lambda: db.get_database_stats()),
+        ("database.get_database_stats.exact", lambda: db.get_database_stats(exact=True)),
+        ("database.get_database_server_metrics", lambda: db.get_database_server_metrics()),
+        ("visualization.create_bar_chart",
+         lambda: viz.create_bar_chart(revenue_by_region, x_column="region", y_column="revenue")),
+        ("visualization.create_line_chart",
+         lambda: viz.create_line_chart(
+             daily_revenue, x_column="order_date", y_column="revenue", color_column="region")),
+        ("visualization.create_pie_chart", lambda: viz.create_pie_chart(
+            category_share, labels_column="category", values_column="revenue")),
+        ("visualization.create_scatter_plot",
+         lambda: viz.create_scatter_plot(
+             order_points, x_column="quantity", y_column="amount", color_column="region")),
+        ("visualization.create_heatmap",
+         lambda: viz.create_heatmap(
+             region_category, x_column="region", y_column="category", z_column="revenue")),
+        ("visualization.create_line_chart.result_id",
+         lambda: viz.create_line_chart(
+             result_id=result_id, x_column="order_date", y_column="revenue", color_column="region")),
+        ("visualization.create_dashboard", lambda: viz.create_dashboard("Sales overview", dashboard)),
+        ("visualization.get_visualization_server_metrics", lambda: viz.get_visualization_server_metrics()),
+    ]
+
+
+def is_error(response) -> bool:
+    """Whether a tool response reports a failure."""
+    if not isinstance(response, str):
+        return False
+    if response.startswith(("Error", "Failed")):
+        return True
+    if response.startswith("{"):
+        try:
+            payload = json.loads(response)
+        except ValueError:
+            return False
+        if "error" in payload:
+            return True
+        return any(isinstance(chart, dict) and "error" in chart for chart in payload.get("charts", []))
+    return False
+
+
+class RSSSampler:
+    """Samples the process RSS on a background thread and keeps the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        if psutil is not None:
+            return psutil.Process().memory_info().rss
+        import resource
+        # ru_maxrss is the lifetime peak, in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def __enter__(self):
+        self.peak = self.current()
+
+        def run():
+            while not self._stop.wait(self.interval):
+                self.peak = max(self.peak, self.current())
+
+        self._thread = threading.Thread(target=run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+async def run_scenario(call, requests, concurrency, warmup):
+    """Issue `requests` calls with up to `concurrency` in flight and collect timings."""
+    for _ in range(warmup):
+        await call()
+
+    latencies = []
+    sizes = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            started = time.perf_counter()
+            try:
+                response = await call()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            sizes.append(len(response.encode()) if isinstance(response, str) else 0)
+            errors += is_error(response)
+
+    with RSSSampler() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall_time = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "calls": requests,
+        "errors": errors,
+        "p50_ms": _ms(percentile(latencies, 0.50)),
+        "p95_ms": _ms(percentile(latencies, 0.95)),
+        "p99_ms": _ms(percentile(latencies, 0.99)),
+        "max_ms": _ms(latencies[-1] if latencies else None),
+        "throughput_rps": round(requests / wall_time, 2) if wall_time else None,
+        "response_bytes_mean": round(sum(sizes) / len(sizes)) if sizes else 0,
+        "response_bytes_total": sum(sizes),
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def main(args):
+    if args.no_result_cache:
+        # Read by the servers' modules at import time
+        os.environ["RESULT_CACHE_ENABLED"] = "false"
+    # Result files go to a directory of this run, not the servers' shared one
+    results_dir = tempfile.mkdtemp(prefix="chatbi-bench-results-")
+    os.environ["RESULT_STORE_DIR"] = results_dir
+    try:
+        await run(args)
+    finally:
+        shutil.rmtree(results_dir, ignore_errors=True)
+
+
+async def run(args):
+    path, seed_seconds = prepare_database(args.data_dir, args.fact_rows, args.dim_rows, args.reseed)
+
+    from benchmarks.sqlite_backend import install_sqlite_pool
+    from src.mcp_servers import database_server as db
+    from src.mcp_servers import visualization_server as viz
+    from src.mcp_servers.db_pool import get_pool
+
+    # The servers log every call at INFO, which would dominate short timings
+    logging.getLogger("src").setLevel(args.log_level)
+    install_sqlite_pool(path, size=args.pool_size)
+
+    first_page = json.loads(await db.execute_sql_query_json("SELECT * FROM sales WHERE id <= 5000"))
+    page_token = first_page.get("next_page_token", "unknown:0") if isinstance(first_page, dict) else "unknown:0"
+
+    selected = [name.strip() for name in args.tools.split(",")] if args.tools else None
+    tools = {}
+    # Stored once, then charted from the result store without running the query again
+    daily = json.loads(await db.execute_sql_query_json(DAILY_REVENUE, format="columnar"))
+    result_id = daily.get("result_id", "unknown")
+
+    for name, call in build_scenarios(db, viz, page_token, result_id):
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        tools[name] = await run_scenario(call, args.requests, args.concurrency, args.warmup)
+        print(f"{name}: p50 {tools[name]['p50_ms']} ms, p99 {tools[name]['p99_ms']} ms", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": "sqlite",
+            "fact_rows": args.fact_rows,
+            "dim_rows": args.dim_rows,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "pool_size": args.pool_size,
+            "result_cache": not args.no_result_cache,
+            "seed_s": round(seed_seconds, 2),
+        },
+        "tools": tools,
+        "peak_rss_mb": max((tool["peak_rss_mb"] for tool in tools.values()), default=None),
+        "pool": get_pool().metrics(),
+        "result_cache": db.query_cache.metrics(),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fact-rows", type=int, default=100000, help="rows in the sales fact table")
+    parser.add_argument("--dim-rows", type=int, default=1000, help="rows in the products and customers tables")
+    parser.add_argument("--concurrency", type=int, default=4, help="tool calls in flight")
+    parser.add_argument("--requests", type=int, default=20, help="measured calls per tool")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured calls per tool before measuring")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--tools", help="comma-separated substrings selecting the tools to run")
+    parser.add_argument("--no-result-cache", action="store_true", help="disable the SELECT result cache")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "chatbi-bench-data"))
+    parser.add_argument("--reseed", action="store_true", help="rebuild the seeded database")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--log-level", default="WARNING", help="log level of the servers' loggers")
+    asyncio.run(main(parser.parse_args()))
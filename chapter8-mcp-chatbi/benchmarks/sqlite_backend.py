@@ -0,0 +1,233 @@
+# benchmarks/sqlite_backend.py
+"""
+SQLite stand-in for the MySQL database used by the MCP servers.
+
+Wraps sqlite3 in the small subset of the mysql.connector connection/cursor
+API the servers rely on, so benchmarks can run without an external MySQL.
+The information_schema tables the servers read (TABLES, COLUMNS,
+KEY_COLUMN_USAGE) are emulated from SQLite's own catalog.
+"""
+import re
+import sqlite3
+import time
+import weakref
+import zlib
+
+from src.mcp_servers.db_pool import ConnectionPool, set_pool
+
+_DESCRIBE_RE = re.compile(r"^\s*(?:DESCRIBE|DESC)\s+`?(\w+)`?\s*;?\s*$", re.IGNORECASE)
+_SHOW_TABLES_RE = re.compile(r"^\s*SHOW\s+TABLES\s*;?\s*$", re.IGNORECASE)
+_KILL_QUERY_RE = re.compile(r"^\s*KILL\s+QUERY\s+(\d+)\s*;?\s*$", re.IGNORECASE)
+
+# Open connections by connection_id, for KILL QUERY
+_connections = weakref.WeakValueDictionary()
+
+
+def _sleep(seconds):
+    time.sleep(float(seconds))
+    return 0
+
+
+def _crc32(value):
+    return None if value is None else zlib.crc32(str(value).encode())
+
+
+def _concat_ws(separator, *values):
+    return separator.join(str(value) for value in values if value is not None)
+
+
+INFORMATION_SCHEMA_DDL = [
+    """CREATE TABLE information_schema.TABLES (
+        TABLE_SCHEMA TEXT, TABLE_NAME TEXT, TABLE_TYPE TEXT, TABLE_ROWS INTEGER,
+        DATA_LENGTH INTEGER, INDEX_LENGTH INTEGER, UPDATE_TIME TEXT)""",
+    """CREATE TABLE information_schema.COLUMNS (
+        TABLE_SCHEMA TEXT, TABLE_NAME TEXT, COLUMN_NAME TEXT, ORDINAL_POSITION INTEGER,
+        COLUMN_TYPE TEXT, IS_NULLABLE TEXT, COLUMN_KEY TEXT, COLUMN_DEFAULT TEXT)""",
+    """CREATE TABLE information_schema.KEY_COLUMN_USAGE (
+        TABLE_SCHEMA TEXT, TABLE_NAME TEXT, COLUMN_NAME TEXT,
+        REFERENCED_TABLE_NAME TEXT, REFERENCED_COLUMN_NAME TEXT)""",
+]
+
+
+def _refresh_information_schema(connection, with_sizes=False):
+    """
+    Rebuild the emulated information_schema from sqlite_master and PRAGMAs.
+
+    TABLE_ROWS comes from sqlite_stat1 (run ANALYZE to fill it). Sizes are
+    read from the dbstat table, which scans every page, so only on request.
+    """
+    connection.execute("DELETE FROM information_schema.TABLES")
+    connection.execute("DELETE FROM information_schema.COLUMNS")
+    connection.execute("DELETE FROM information_schema.KEY_COLUMN_USAGE")
+
+    row_estimates = {}
+    has_stats = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone()
+    if has_stats:
+        for table_name, stat in connection.execute("SELECT tbl, stat FROM sqlite_stat1"):
+            row_estimates.setdefault(table_name, int(str(stat).split()[0]))
+
+    sizes = {}
+    if with_sizes:
+        try:
+            sizes = dict(connection.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+        except sqlite3.Error:
+            pass
+
+    objects = connection.execute(
+        "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') "
+        "AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    for table_name, object_type in objects:
+        index_bytes = sum(
+            sizes.get(index_name, 0) for (index_name,) in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (table_name,)
+            )
+        )
+        connection.execute(
+            "INSERT INTO information_schema.TABLES VALUES ('main', ?, ?, ?, ?, ?, NULL)",
+            (table_name, "VIEW" if object_type == "view" else "BASE TABLE",
+             row_estimates.get(table_name), sizes.get(table_name), index_bytes)
+        )
+        for cid, name, col_type, notnull, default, pk in connection.execute(f"PRAGMA table_info(`{table_name}`)"):
+            connection.execute(
+                "INSERT INTO information_schema.COLUMNS VALUES ('main', ?, ?, ?, ?, ?, ?, ?)",
+                (table_name, name, cid + 1, (col_type or "").lower(), "NO" if notnull or pk else "YES",
+                 "PRI" if pk else "", default)
+            )
+        for fk in connection.execute(f"PRAGMA foreign_key_list(`{table_name}`)"):
+            connection.execute(
+                "INSERT INTO information_schema.KEY_COLUMN_USAGE VALUES ('main', ?, ?, ?, ?)",
+                (table_name, fk[3], fk[2], fk[4])
+            )
+    # End the implicit transaction so it does not hold a read lock on main
+    connection.commit()
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over a sqlite3 cursor."""
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+        self._rows = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def column_names(self):
+        return tuple(col[0] for col in self._cursor.description or ())
+
+    def execute(self, operation, params=None):
+        self._rows = None
+        if _SHOW_TABLES_RE.match(operation):
+            operation = "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+        elif match := _DESCRIBE_RE.match(operation):
+            self._describe(match.group(1))
+            return
+        elif match := _KILL_QUERY_RE.match(operation):
+            target = _connections.get(int(match.group(1)))
+            if target is not None:
+                target._connection.interrupt()
+            return
+        operation = operation.replace("%s", "?")
+        if "information_schema" in operation.lower():
+            _refresh_information_schema(self._connection, with_sizes="DATA_LENGTH" in operation.upper())
+        self._cursor.execute(operation, params or ())
+
+    def _describe(self, table_name):
+        """Emulate DESCRIBE: (Field, Type, Null, Key, Default, Extra)."""
+        info = self._connection.execute(f"PRAGMA table_info({table_name})").fetchall()
+        if not info:
+            raise sqlite3.OperationalError(f"Table '{table_name}' doesn't exist")
+        self._cursor.execute(
+            "SELECT NULL AS Field, NULL AS Type, NULL AS `Null`, NULL AS `Key`, NULL AS `Default`, NULL AS Extra"
+        )
+        self._cursor.fetchall()
+        self._rows = [
+            (name, col_type, "NO" if notnull else "YES", "PRI" if pk else "", default, "")
+            for _, name, col_type, notnull, default, pk in info
+        ]
+
+    def _convert(self, rows):
+        if self._dictionary:
+            names = self.column_names
+            return [dict(zip(names, row)) for row in rows]
+        return rows
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return self._convert(rows)
+        return self._convert(self._cursor.fetchall())
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return self._convert(rows)
+        return self._convert(self._cursor.fetchmany(size))
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """mysql.connector-style connection over sqlite3."""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.create_function("SLEEP", 1, _sleep)
+        self._connection.create_function("DATABASE", 0, lambda: "main")
+        self._connection.create_function("CRC32", 1, _crc32)
+        self._connection.create_function("CONCAT_WS", -1, _concat_ws)
+        self._connection.execute("ATTACH DATABASE ':memory:' AS information_schema")
+        for statement in INFORMATION_SCHEMA_DDL:
+            self._connection.execute(statement)
+        self._closed = False
+        self.connection_id = id(self)
+        _connections[self.connection_id] = self
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self._connection, dictionary=dictionary)
+
+    def ping(self, reconnect=False):
+        self._connection.execute("SELECT 1")
+
+    def is_connected(self):
+        return not self._closed
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._closed = True
+        self._connection.close()
+
+
+def install_sqlite_pool(path, size=10):
+    """Point the MCP servers' shared pool at a SQLite database file."""
+    pool = ConnectionPool(creator=lambda: SQLiteConnection(path), size=size)
+    set_pool(pool)
+    return pool
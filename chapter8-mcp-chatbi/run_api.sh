@@ -1,2 +1,2 @@
 #!/bin/bash
-uvicorn src.api.main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
+alembic upgrade head && uvicorn src.api.main:app --host 0.0.0.0 --port 8000 --reload
@@ -1,2 +1,2 @@
 #!/bin/bash
-python src/mcp_servers/database_server.py
\ No newline at end of file
+python -m src.mcp_servers.database_server
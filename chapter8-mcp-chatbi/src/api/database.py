@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -14,12 +15,34 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "88888888")
 DB_NAME = os.getenv("DB_NAME", "chatbi")
 DB_PORT = os.getenv("DB_PORT", "3306")
 
-# Create SQLAlchemy engine
+# Connection pool of the API's async engine: connections kept open, extra ones
+# opened under load, seconds to wait for one, seconds before one is replaced,
+# and whether a connection is checked before it is handed out
+API_DB_POOL_SIZE = int(os.getenv("API_DB_POOL_SIZE", "10"))
+API_DB_MAX_OVERFLOW = int(os.getenv("API_DB_MAX_OVERFLOW", "20"))
+API_DB_POOL_TIMEOUT = float(os.getenv("API_DB_POOL_TIMEOUT", "30"))
+API_DB_POOL_RECYCLE = int(os.getenv("API_DB_POOL_RECYCLE", "1800"))
+API_DB_POOL_PRE_PING = os.getenv("API_DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Create SQLAlchemy engine (migrations and scripts)
 SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
-# Create session factory
+# Async engine used by the API, so database I/O does not block the event loop
+ASYNC_SQLALCHEMY_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    pool_size=API_DB_POOL_SIZE,
+    max_overflow=API_DB_MAX_OVERFLOW,
+    pool_timeout=API_DB_POOL_TIMEOUT,
+    pool_recycle=API_DB_POOL_RECYCLE,
+    pool_pre_ping=API_DB_POOL_PRE_PING,
+)
+
+# Create session factories; objects stay loaded after a commit, since an
+# async session cannot lazy load expired attributes
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create base class for models
 Base = declarative_base()
@@ -30,4 +53,10 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
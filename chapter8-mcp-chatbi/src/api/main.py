@@ -1,19 +1,34 @@
+from contextlib import asynccontextmanager
+
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from . import models
-from .database import engine
+from .database import async_engine
 from .routers import chat
+from .services.agent_runtime import AgentRuntime
 
 # Load environment variables
 load_dotenv()
 
-# Create database tables
-# Ensure models.Base is correctly accessed after relative import
-models.Base.metadata.create_all(bind=engine)
+# The database schema is managed by migrations (src/api/migrations):
+# run `alembic upgrade head` before starting the API, as run_api.sh does
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One warm agent runtime per process, shared by every chat request
+    runtime = AgentRuntime()
+    await runtime.start()
+    app.state.agent_runtime = runtime
+    try:
+        yield
+    finally:
+        await runtime.close()
+        await async_engine.dispose()
+
 
-app = FastAPI(title="ChatBI API")
+app = FastAPI(title="ChatBI API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
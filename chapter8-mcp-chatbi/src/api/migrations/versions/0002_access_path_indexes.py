@@ -0,0 +1,66 @@
+"""Composite indexes for the chat API's access paths
+
+- messages (conversation_id, created_at): a conversation's messages in
+  order, for the history and the newest-N window
+- visualizations (conversation_id): a conversation's charts
+- conversations (user_id, id): a user's conversations newest first, the
+  keyset-paginated sidebar listing
+
+On MySQL the new indexes also take over from the indexes InnoDB created
+implicitly for the conversation_id foreign keys.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_messages_conversation_id_created_at", "messages", ["conversation_id", "created_at"]),
+    ("ix_visualizations_conversation_id", "visualizations", ["conversation_id"]),
+    ("ix_conversations_user_id_id", "conversations", ["user_id", "id"]),
+]
+
+# Foreign key indexes a MySQL downgrade puts back, see downgrade()
+MYSQL_FK_INDEXES = [
+    ("ix_conversations_user_id", "conversations", ["user_id"]),
+    ("ix_messages_conversation_id", "messages", ["conversation_id"]),
+]
+
+
+def _index_names(table):
+    # Offline (--sql) there is no database to inspect: assume none of them exist
+    if context.is_offline_mode():
+        return set()
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # A MySQL downgrade keeps ix_visualizations_conversation_id, so only create what is missing
+    for name, table, columns in INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+    # The new indexes cover the foreign keys again
+    for name, table, _ in MYSQL_FK_INDEXES:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
+
+
+def downgrade():
+    # InnoDB needs an index on every foreign key column, which these indexes now
+    # provide; on MySQL put single-column ones back before dropping them, and keep
+    # the visualizations one, which is exactly the foreign key index
+    mysql = op.get_bind().dialect.name == "mysql"
+    if mysql:
+        for name, table, columns in MYSQL_FK_INDEXES:
+            op.create_index(name, table, columns)
+    op.drop_index("ix_conversations_user_id_id", table_name="conversations")
+    if not mysql:
+        op.drop_index("ix_visualizations_conversation_id", table_name="visualizations")
+    op.drop_index("ix_messages_conversation_id_created_at", table_name="messages")
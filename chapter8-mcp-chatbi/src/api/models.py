@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -19,6 +19,11 @@ class User(Base):
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    # Schema changes go through migrations (src/api/migrations); keep the indexes in sync with them
+    __table_args__ = (
+        # A user's conversations newest first (keyset-paginated listing)
+        Index("ix_conversations_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
@@ -29,10 +34,16 @@ class Conversation(Base):
     user = relationship("User", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     visualizations = relationship("Visualization", back_populates="conversation", cascade="all, delete-orphan")
+    summary = relationship("ConversationSummary", back_populates="conversation", uselist=False,
+                           cascade="all, delete-orphan")
 
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # A conversation's messages in order
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"))
@@ -45,6 +56,9 @@ class Message(Base):
 
 class Visualization(Base):
     __tablename__ = "visualizations"
+    __table_args__ = (
+        Index("ix_visualizations_conversation_id", "conversation_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"))
@@ -54,3 +68,15 @@ class Visualization(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     conversation = relationship("Conversation", back_populates="visualizations")
+
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text, nullable=False)
+    # Id of the last message folded into the summary
+    summarized_upto = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    conversation = relationship("Conversation", back_populates="summary")
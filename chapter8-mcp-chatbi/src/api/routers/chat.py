@@ -1,12 +1,22 @@
-from typing import List  # Optional is not used, can be removed
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from src.api.database import get_db
+from src.api.database import get_async_db
 from src.api.models import Conversation, Message, Visualization
-from src.api.services.chat_service import process_chat_message
+from src.api.services.agent_runtime import AgentRuntime, get_agent_runtime
+from src.api.services.chat_service import process_chat_message, stream_chat_events
+from src.api.services.conversation_context import conversation_context
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -38,6 +48,19 @@ class ConversationResponse(BaseModel):
         orm_mode = True  # In Pydantic v2, orm_mode is deprecated, use from_attributes = True
 
 
+class ConversationListItem(BaseModel):
+    id: int
+    title: str
+    updated_at: Optional[datetime] = None
+    message_count: int
+
+
+class ConversationPage(BaseModel):
+    items: List[ConversationListItem]
+    # Pass as `cursor` to get the next page; None on the last page
+    next_cursor: Optional[int] = None
+
+
 class VisualizationResponse(BaseModel):
     id: int
     title: str
@@ -48,39 +71,73 @@ class VisualizationResponse(BaseModel):
         orm_mode = True  # In Pydantic v2, orm_mode is deprecated, use from_attributes = True
 
 
+# Database I/O is awaited on the async engine (see database.py), so requests
+# never block the event loop that runs the agents of other conversations.
+# Relationships are never lazy loaded here: load them with selectinload or
+# refresh, an async session cannot load them on attribute access.
+
+
 @router.post("/conversations", response_model=ConversationResponse)
-def create_conversation(conversation: ConversationCreate, db: Session = Depends(get_db)):
+async def create_conversation(conversation: ConversationCreate, db: AsyncSession = Depends(get_async_db)):
     # For simplicity, we're using user_id=1 (admin user)
     db_conversation = Conversation(title=conversation.title, user_id=1)
     db.add(db_conversation)
-    db.commit()
-    db.refresh(db_conversation)
+    await db.commit()
+    await db.refresh(db_conversation, ["messages"])
     return db_conversation
 
 
 @router.get("/conversations", response_model=List[ConversationResponse])
-def get_conversations(db: Session = Depends(get_db)):
+async def get_conversations(db: AsyncSession = Depends(get_async_db)):
+    # For simplicity, we're using user_id=1 (admin user)
+    # Load the messages of all conversations in one query instead of one per conversation
+    conversations = await db.scalars(select(Conversation).options(selectinload(Conversation.messages)).where(
+        Conversation.user_id == 1).order_by(Conversation.id.desc()))
+    return conversations.all()
+
+
+@router.get("/conversations/page", response_model=ConversationPage)
+async def get_conversation_page(
+        limit: int = Query(30, ge=1, le=100),
+        cursor: Optional[int] = None,
+        db: AsyncSession = Depends(get_async_db),
+):
+    """
+    List conversations newest first, without their messages, one page at a time.
+
+    Keyset pagination: `cursor` is the id of the last conversation of the
+    previous page, so every page is an index range scan on (user_id, id)
+    however far back it is. The message count is a correlated subquery,
+    evaluated only for the conversations on the page.
+    """
+    message_count = select(func.count(Message.id)).where(
+        Message.conversation_id == Conversation.id).correlate(Conversation).scalar_subquery()
     # For simplicity, we're using user_id=1 (admin user)
-    conversations = db.query(Conversation).filter(Conversation.user_id == 1).order_by(Conversation.id.desc()).all()
-    return conversations
+    query = select(
+        Conversation.id, Conversation.title, Conversation.updated_at, message_count.label("message_count")
+    ).where(Conversation.user_id == 1)
+    if cursor is not None:
+        query = query.where(Conversation.id < cursor)
+    rows = (await db.execute(query.order_by(Conversation.id.desc()).limit(limit + 1))).all()
+
+    items = [ConversationListItem(**row._mapping) for row in rows[:limit]]
+    next_cursor = items[-1].id if len(rows) > limit else None
+    return ConversationPage(items=items, next_cursor=next_cursor)
 
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
-def get_conversation(conversation_id: int, db: Session = Depends(get_db)):
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+async def get_conversation(conversation_id: int, db: AsyncSession = Depends(get_async_db)):
+    conversation = await db.scalar(select(Conversation).options(selectinload(Conversation.messages)).where(
+        Conversation.id == conversation_id))
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
 
 
-@router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
-async def create_message(
-        conversation_id: int,
-        message: MessageCreate,
-        db: Session = Depends(get_db)
-):
+async def save_user_message(db: AsyncSession, conversation_id: int, message: MessageCreate):
+    """Store a user message and return (conversation, whether it is the first message)."""
     # Check if conversation exists
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+    conversation = await db.get(Conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
@@ -91,16 +148,18 @@ async def create_message(
         content=message.content
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.commit()
+    await db.refresh(db_message)
+    conversation_context.append(conversation_id, db_message)
 
-    # Get all messages in the conversation for context
-    messages_from_db = db.query(Message).filter(Message.conversation_id == conversation_id).order_by(
-        Message.created_at).all()
-    message_history = [{"role": msg.role, "content": msg.content} for msg in messages_from_db]
+    first_turn = len(await conversation_context.recent_messages(db, conversation_id)) == 1
+    return conversation, first_turn
 
-    # Process the message with the AI
-    response_content, visualizations = await process_chat_message(message_history, db)
+
+async def save_assistant_reply(db: AsyncSession, conversation: Conversation, message: MessageCreate,
+                               first_turn: bool, response_content, visualizations):
+    """Store the AI response and its visualizations, and return the saved message."""
+    conversation_id = conversation.id
 
     # Save AI response
     ai_message = Message(
@@ -121,21 +180,94 @@ async def create_message(
             )
             db.add(db_viz)
 
-    db.commit()
-    db.refresh(ai_message)  # Refresh ai_message to get its ID for the response
+    await db.commit()
+    await db.refresh(ai_message)  # Refresh ai_message to get its ID for the response
+    conversation_context.append(conversation_id, ai_message)
 
     # Update conversation title if it's the first user message (now second message overall)
-    if len(messages_from_db) == 1:  # This means only the user's first message was in db before this function call
+    if first_turn:
         new_title = message.content[:50]
         if len(message.content) > 50:
             new_title += "..."
         conversation.title = new_title
-        db.commit()
+        await db.commit()
 
     return ai_message
 
 
+@router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
+async def create_message(
+        conversation_id: int,
+        message: MessageCreate,
+        background_tasks: BackgroundTasks,
+        db: AsyncSession = Depends(get_async_db),
+        runtime: AgentRuntime = Depends(get_agent_runtime),
+):
+    conversation, first_turn = await save_user_message(db, conversation_id, message)
+    # The summary of older turns plus the newest messages within the token budget
+    message_history = await conversation_context.build_history(db, conversation_id)
+    # Fold the messages that left the window into the summary once the reply is sent
+    background_tasks.add_task(conversation_context.update_summary, conversation_id, runtime.model)
+
+    # Process the message with the AI
+    response_content, visualizations = await process_chat_message(message_history, db, runtime)
+
+    return await save_assistant_reply(db, conversation, message, first_turn, response_content, visualizations)
+
+
+def sse_event(event: dict) -> str:
+    """Format an event as a Server-Sent Events frame named after its type."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str, ensure_ascii=False)}\n\n"
+
+
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def stream_message(
+        conversation_id: int,
+        message: MessageCreate,
+        background_tasks: BackgroundTasks,
+        db: AsyncSession = Depends(get_async_db),
+        runtime: AgentRuntime = Depends(get_agent_runtime),
+):
+    """
+    Streaming variant of create_message, as Server-Sent Events.
+
+    Emits token, tool_start, tool_end and visualization events while the
+    agent runs (see chat_service.stream_chat_events), then saves the reply
+    and ends with a "done" event carrying the stored message. If the agent
+    or saving the reply fails once streaming started, the stream ends with
+    an "error" event carrying the message instead.
+    """
+    conversation, first_turn = await save_user_message(db, conversation_id, message)
+    message_history = await conversation_context.build_history(db, conversation_id)
+    # Runs after the stream ends
+    background_tasks.add_task(conversation_context.update_summary, conversation_id, runtime.model)
+
+    async def events():
+        try:
+            async for event in stream_chat_events(message_history, runtime):
+                if event["type"] != "final":
+                    yield sse_event(event)
+                    continue
+                ai_message = await save_assistant_reply(db, conversation, message, first_turn, event["content"],
+                                                        event["visualizations"])
+                yield sse_event({
+                    "type": "done",
+                    "message": {"id": ai_message.id, "role": ai_message.role, "content": ai_message.content},
+                })
+        except Exception as err:
+            # The status code is already sent, so the failure goes out as the last event
+            logger.exception(f"Streaming a reply to conversation {conversation_id} failed")
+            yield sse_event({"type": "error", "message": str(err) or type(err).__name__})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/conversations/{conversation_id}/visualizations", response_model=List[VisualizationResponse])
-def get_visualizations(conversation_id: int, db: Session = Depends(get_db)):
-    visualizations = db.query(Visualization).filter(Visualization.conversation_id == conversation_id).all()
-    return visualizations
+async def get_visualizations(conversation_id: int, db: AsyncSession = Depends(get_async_db)):
+    visualizations = await db.scalars(select(Visualization).where(Visualization.conversation_id == conversation_id))
+    return visualizations.all()
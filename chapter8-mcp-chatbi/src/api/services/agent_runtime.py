@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import anyio
+from dotenv import load_dotenv
+from fastapi import Request
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from langchain_openai import ChatOpenAI
+from langgraph.prebuilt import create_react_agent
+from mcp import types
+from mcp.shared.exceptions import McpError
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# MCP servers the agent takes its tools from
+MCP_DATABASE_URL = os.getenv("MCP_DATABASE_URL", "http://localhost:8002/sse")
+MCP_VISUALIZATION_URL = os.getenv("MCP_VISUALIZATION_URL", "http://localhost:8003/sse")
+
+# Seconds the cached tool schemas are trusted before they are listed again;
+# a tools/list_changed notification from a server refreshes them right away
+MCP_TOOLS_TTL = float(os.getenv("MCP_TOOLS_TTL", "300"))
+
+# Seconds to wait for a server session, and the backoff between reconnect attempts
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "10"))
+MCP_RECONNECT_DELAY = float(os.getenv("MCP_RECONNECT_DELAY", "1"))
+MCP_RECONNECT_MAX_DELAY = float(os.getenv("MCP_RECONNECT_MAX_DELAY", "30"))
+
+
+class MCPConnection:
+    """
+    A long-lived session to one MCP server.
+
+    The session is opened and closed by a background task that owns it (the
+    SSE transport runs in task groups that must exit in the task that entered
+    them). When a call finds the session broken, the task closes it and
+    connects again, backing off while the server is unreachable.
+
+    Args:
+        client: MultiServerMCPClient holding the connection settings
+        name: Server name in the client's connections
+        on_tools_changed: Called when the server announces a tool list change
+    """
+
+    def __init__(self, client: MultiServerMCPClient, name: str, on_tools_changed=None):
+        self.client = client
+        self.name = name
+        self.on_tools_changed = on_tools_changed
+        self.connects = 0
+
+        self._session = None
+        self._ready = asyncio.Event()
+        self._reconnect = asyncio.Event()
+        self._closed = False
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.name}")
+
+    async def close(self):
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        delay = MCP_RECONNECT_DELAY
+        while not self._closed:
+            try:
+                async with self.client.session(self.name) as session:
+                    self._session = session
+                    self.connects += 1
+                    delay = MCP_RECONNECT_DELAY
+                    logger.info(f"Connected to MCP server '{self.name}'")
+                    self._ready.set()
+                    await self._reconnect.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.warning(f"MCP server '{self.name}' session failed: {err!r}")
+            finally:
+                self._session = None
+                self._ready.clear()
+                self._reconnect.clear()
+            if not self._closed:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MCP_RECONNECT_MAX_DELAY)
+
+    async def session(self):
+        """Return the live session, waiting up to MCP_CONNECT_TIMEOUT for a (re)connect."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), MCP_CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"MCP server '{self.name}' is not reachable")
+        return self._session
+
+    def reconnect(self, session=None):
+        """Drop the session (only if it is still `session`, when given) and connect again."""
+        if self._session is None or (session is not None and session is not self._session):
+            return
+        self._ready.clear()
+        self._reconnect.set()
+
+    async def list_tools(self) -> List[types.Tool]:
+        session = await self.session()
+        tools, cursor = [], None
+        while True:
+            page = await session.list_tools(cursor=cursor)
+            tools.extend(page.tools)
+            cursor = page.nextCursor
+            if not cursor:
+                return tools
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> types.CallToolResult:
+        """
+        Call a tool on the live session.
+
+        If the session turns out to be closed before the request is sent, it
+        reconnects and retries the call once. Any failure after that is
+        raised without a retry: the server may already have run the tool,
+        and execute_sql_query also runs writes.
+        """
+        for attempt in range(2):
+            session = await self.session()
+            try:
+                return await session.call_tool(name, arguments)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError) as err:
+                # Raised by writing the request to a closed transport, so the tool did not run
+                if attempt:
+                    raise
+                logger.warning(f"MCP server '{self.name}' session closed before calling {name}, reconnecting: {err!r}")
+                self.reconnect(session)
+            except McpError as err:
+                if err.error.code == types.CONNECTION_CLOSED:
+                    self.reconnect(session)
+                raise
+            except Exception:
+                self.reconnect(session)
+                raise
+
+    async def handle_message(self, message):
+        """ClientSession message handler: watches for tool list changes and transport errors."""
+        if isinstance(message, Exception):
+            logger.warning(f"MCP server '{self.name}' transport error: {message!r}")
+            self.reconnect()
+        elif isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            logger.info(f"MCP server '{self.name}' changed its tool list")
+            if self.on_tools_changed is not None:
+                self.on_tools_changed()
+
+
+class AgentRuntime:
+    """
+    Warm agent runtime shared by all chat requests.
+
+    Holds the chat model, one persistent session per MCP server, the tool
+    schemas listed from them and the ReAct agent compiled from those tools.
+    The schemas are listed again after MCP_TOOLS_TTL seconds or when a
+    server announces a tool list change, and the agent is only recompiled
+    if they actually changed. Tool calls go through the persistent sessions
+    instead of a new SSE connection per call.
+
+    Args:
+        connections: MCP server connections, by server name
+        tools_ttl: Seconds the tool schemas are cached
+    """
+
+    def __init__(self, connections: Optional[Dict[str, dict]] = None, tools_ttl: float = MCP_TOOLS_TTL):
+        if connections is None:
+            connections = {
+                "database": {"url": MCP_DATABASE_URL, "transport": "sse"},
+                "visualization": {"url": MCP_VISUALIZATION_URL, "transport": "sse"},
+            }
+        connections = {name: dict(connection) for name, connection in connections.items()}
+        self.client = MultiServerMCPClient(connections)
+        self.tools_ttl = tools_ttl
+        self.model = None
+        self.connections = {}
+        for name, connection in connections.items():
+            server = MCPConnection(self.client, name, on_tools_changed=self.invalidate_tools)
+            connection["session_kwargs"] = {**connection.get("session_kwargs", {}), "message_handler": server.handle_message}
+            self.connections[name] = server
+
+        self._lock = asyncio.Lock()
+        self._agent = None
+        self._tools = []
+        self._schemas = None
+        self._expires_at = 0.0
+        self._stats = {"tool_refreshes": 0, "agent_builds": 0}
+
+    async def start(self):
+        """Connect to the MCP servers and compile the agent; called from the app lifespan."""
+        self.model = ChatOpenAI(
+            model=os.environ.get("MODEL", "gpt-4-turbo"),
+            api_key=os.environ.get("API_KEY"),
+            base_url=os.environ.get("BASE_URL", "https://api.openai.com/v1"),
+        )
+        for server in self.connections.values():
+            server.start()
+        try:
+            await self.get_agent()
+        except Exception as err:
+            # The servers may start after the API; the first chat message retries
+            logger.warning(f"Agent runtime not warmed up: {err!r}")
+
+    async def close(self):
+        await asyncio.gather(*(server.close() for server in self.connections.values()))
+
+    def invalidate_tools(self):
+        self._expires_at = 0.0
+
+    async def get_agent(self):
+        """Return the compiled agent, refreshing the tool schemas first if they are stale."""
+        if self._agent is not None and time.monotonic() < self._expires_at:
+            return self._agent
+        async with self._lock:
+            if self._agent is None or time.monotonic() >= self._expires_at:
+                try:
+                    await self._refresh_tools()
+                except Exception as err:
+                    if self._agent is None:
+                        raise
+                    logger.warning(f"Could not refresh MCP tools, using the cached ones: {err!r}")
+        return self._agent
+
+    async def _refresh_tools(self):
+        listed = await asyncio.gather(*(server.list_tools() for server in self.connections.values()))
+        self._stats["tool_refreshes"] += 1
+        self._expires_at = time.monotonic() + self.tools_ttl
+
+        schemas = json.dumps([[tool.model_dump(mode="json") for tool in tools] for tools in listed], sort_keys=True)
+        if schemas == self._schemas:
+            return
+
+        tools = [
+            convert_mcp_tool_to_langchain_tool(
+                None,
+                tool,
+                connection=self.client.connections[name],
+                server_name=name,
+                tool_interceptors=[self._call_tool],
+            )
+            for name, server_tools in zip(self.connections, listed)
+            for tool in server_tools
+        ]
+        logger.info(f"Available tools: {[tool.name for tool in tools]}")
+        self._agent = create_react_agent(self.model, tools)
+        self._tools = tools
+        self._schemas = schemas
+        self._stats["agent_builds"] += 1
+
+    async def _call_tool(self, request, handler):
+        # Run the call on the server's persistent session rather than `handler`,
+        # which would open a new session for every call
+        return await self.connections[request.server_name].call_tool(request.name, request.args)
+
+    def metrics(self) -> dict:
+        return {
+            "tools": len(self._tools),
+            "tools_expire_in": max(0.0, round(self._expires_at - time.monotonic(), 1)),
+            "connects": {name: server.connects for name, server in self.connections.items()},
+            **self._stats,
+        }
+
+
+def get_agent_runtime(request: Request) -> AgentRuntime:
+    """Dependency returning the runtime started by the app lifespan."""
+    return request.app.state.agent_runtime
@@ -0,0 +1,250 @@
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.api.database import AsyncSessionLocal
+from src.api.models import ConversationSummary, Message
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Token budget of the history sent to the agent: the running summary plus the newest messages that fit
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "8000"))
+
+# Newest messages kept in memory per conversation, and conversations kept (LRU)
+CONTEXT_CACHE_MESSAGES = int(os.getenv("CONTEXT_CACHE_MESSAGES", "50"))
+CONTEXT_CACHE_CONVERSATIONS = int(os.getenv("CONTEXT_CACHE_CONVERSATIONS", "1000"))
+
+# Fold messages that leave the window into a running summary, after the reply is sent
+# (one short LLM call per CONTEXT_MAX_TOKENS of messages folded)
+CONTEXT_SUMMARY_ENABLED = os.getenv("CONTEXT_SUMMARY_ENABLED", "true").lower() == "true"
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and a BI assistant. "
+    "Update the summary with the new messages. Keep the questions asked, the tables, columns, "
+    "filters and SQL that were used, key numbers in the answers and any preferences the user "
+    "stated. Reply with the updated summary only, in the language of the conversation, "
+    "in at most 200 words."
+)
+
+
+def _message_dict(message: Message) -> Dict:
+    return {"id": message.id, "role": message.role, "content": message.content}
+
+
+def _tokens(messages) -> int:
+    return count_tokens_approximately([{"role": m["role"], "content": m["content"]} for m in messages])
+
+
+class _CachedConversation:
+    __slots__ = ("messages", "summary", "summarized_upto")
+
+    def __init__(self, messages, summary):
+        self.messages = messages
+        # Text of the summary and id of the last message folded into it
+        self.summary = summary.summary if summary else ""
+        self.summarized_upto = summary.summarized_upto if summary else 0
+
+
+class ConversationContext:
+    """
+    Builds the message history the agent sees for a conversation.
+
+    The history is a rolling window of the newest messages that fit in
+    `max_tokens` (token counts are approximate), preceded by a running
+    summary of the older ones. The summary is persisted in
+    conversation_summaries and updated incrementally, after the reply:
+    only the messages that left the window since the last update are
+    folded into it, in batches that fit in `max_tokens`.
+
+    The newest `cache_messages` messages and the summary of each
+    conversation are cached in memory, so a turn does not read the whole
+    conversation. The cache assumes one API process writes a conversation;
+    messages added by another process are only seen once the conversation
+    is evicted from it.
+
+    Args:
+        max_tokens: Token budget of the history
+        cache_messages: Messages kept per conversation, also the largest window
+        cache_conversations: Conversations kept in memory
+        summarize: Summarize older messages instead of dropping them
+        session_factory: Opens the database sessions of summary updates
+    """
+
+    def __init__(self, max_tokens=CONTEXT_MAX_TOKENS, cache_messages=CONTEXT_CACHE_MESSAGES,
+                 cache_conversations=CONTEXT_CACHE_CONVERSATIONS, summarize=CONTEXT_SUMMARY_ENABLED,
+                 session_factory=AsyncSessionLocal):
+        self.max_tokens = max_tokens
+        self.cache_messages = max(2, cache_messages)
+        self.cache_conversations = cache_conversations
+        self.summarize = summarize
+        self.session_factory = session_factory
+
+        self._lock = threading.Lock()
+        self._conversations = OrderedDict()
+        self._summarizing = set()
+        self._stats = {"hits": 0, "loads": 0, "summary_updates": 0, "summary_errors": 0}
+
+    async def _entry(self, db: AsyncSession, conversation_id: int) -> _CachedConversation:
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is not None:
+                self._conversations.move_to_end(conversation_id)
+                self._stats["hits"] += 1
+                return entry
+
+        newest = (await db.scalars(select(Message).where(Message.conversation_id == conversation_id).order_by(
+            Message.created_at.desc(), Message.id.desc()).limit(self.cache_messages))).all()
+        summary = await db.get(ConversationSummary, conversation_id)
+        entry = _CachedConversation(
+            deque((_message_dict(msg) for msg in reversed(newest)), maxlen=self.cache_messages), summary)
+
+        with self._lock:
+            self._stats["loads"] += 1
+            self._conversations[conversation_id] = entry
+            while len(self._conversations) > self.cache_conversations:
+                self._conversations.popitem(last=False)
+        return entry
+
+    async def recent_messages(self, db: AsyncSession, conversation_id: int) -> List[Dict]:
+        """The newest messages of a conversation, oldest first, as {"id", "role", "content"}."""
+        return list((await self._entry(db, conversation_id)).messages)
+
+    def append(self, conversation_id: int, message: Message):
+        """Record a message just saved; conversations not in the cache are loaded on their next use."""
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is not None:
+                entry.messages.append(_message_dict(message))
+
+    def _window(self, entry: _CachedConversation) -> List[Dict]:
+        """The newest cached messages that fit in the budget next to the summary; the latest always does."""
+        budget = self.max_tokens - (_tokens([{"role": "system", "content": entry.summary}]) if entry.summary else 0)
+        window, used = [], 0
+        for msg in reversed(entry.messages):
+            cost = _tokens([msg])
+            if window and used + cost > budget:
+                break
+            window.append(msg)
+            used += cost
+        window.reverse()
+        return window
+
+    async def build_history(self, db: AsyncSession, conversation_id: int) -> List[Dict[str, str]]:
+        """
+        Return the agent input for the next turn: the summary as a system
+        message, if any, followed by the newest messages within the budget.
+        The latest message is always included. Messages that left the window
+        are only dropped here; update_summary folds them in after the reply.
+
+        Args:
+            db: Database session
+            conversation_id: Conversation to build the history of
+        """
+        entry = await self._entry(db, conversation_id)
+        history = [{"role": msg["role"], "content": msg["content"]} for msg in self._window(entry)]
+        if entry.summary:
+            history.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{entry.summary}"})
+        return history
+
+    async def update_summary(self, conversation_id: int, model=None):
+        """
+        Fold the messages older than the current window into the summary.
+        Meant to run after the reply is sent (e.g. as a background task), on
+        its own database session; one update runs per conversation at a time.
+
+        Args:
+            conversation_id: Conversation to summarize
+            model: Chat model writing the summary; None does nothing
+        """
+        if not self.summarize or model is None:
+            return
+        with self._lock:
+            if conversation_id in self._summarizing:
+                return
+            self._summarizing.add(conversation_id)
+        try:
+            async with self.session_factory() as db:
+                entry = await self._entry(db, conversation_id)
+                window = self._window(entry)
+                if window:
+                    await self._fold(db, conversation_id, entry, window[0]["id"], model)
+        except Exception as err:
+            logger.warning(f"Could not update the summary of conversation {conversation_id}: {err!r}")
+            self._stats["summary_errors"] += 1
+        finally:
+            with self._lock:
+                self._summarizing.discard(conversation_id)
+
+    async def _pending(self, db, conversation_id, entry, window_start, limit=200) -> List[Dict]:
+        """The oldest messages not yet summarized and older than the window, at most `limit`."""
+        upto = entry.summarized_upto
+        recent = list(entry.messages)
+        if len(recent) == self.cache_messages and recent[0]["id"] > upto + 1:
+            # Messages older than the cache may not be summarized yet
+            older = (await db.scalars(select(Message).where(
+                Message.conversation_id == conversation_id, Message.id > upto,
+                Message.id < min(recent[0]["id"], window_start)
+            ).order_by(Message.id).limit(limit))).all()
+            if older:
+                return [_message_dict(msg) for msg in older]
+        return [msg for msg in recent if upto < msg["id"] < window_start][:limit]
+
+    async def _fold(self, db, conversation_id, entry, window_start, model):
+        """Summarize the pending messages one batch of at most max_tokens at a time."""
+        while True:
+            pending = await self._pending(db, conversation_id, entry, window_start)
+            if not pending:
+                return
+
+            budget = self.max_tokens - (_tokens([{"role": "system", "content": entry.summary}]) if entry.summary else 0)
+            batch, used = [], 0
+            for msg in pending:
+                cost = _tokens([msg])
+                if batch and used + cost > budget:
+                    break
+                if cost > budget:
+                    # A single message over the budget is cut down to it (about 4 characters a token)
+                    msg = {**msg, "content": msg["content"][:max(budget, 1) * 4]}
+                batch.append(msg)
+                used += cost
+
+            transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in batch)
+            if entry.summary:
+                transcript = f"Current summary:\n{entry.summary}\n\nNew messages:\n{transcript}"
+            try:
+                response = await model.ainvoke([SystemMessage(SUMMARY_PROMPT), HumanMessage(transcript)])
+            except Exception as err:
+                # The messages stay pending and are folded in after a later turn
+                logger.warning(f"Could not update the summary of conversation {conversation_id}: {err!r}")
+                self._stats["summary_errors"] += 1
+                return
+
+            summary = await db.get(ConversationSummary, conversation_id)
+            if summary is None:
+                summary = ConversationSummary(conversation_id=conversation_id)
+                db.add(summary)
+            summary.summary = response.text
+            summary.summarized_upto = batch[-1]["id"]
+            await db.commit()
+
+            entry.summary = summary.summary
+            entry.summarized_upto = summary.summarized_upto
+            self._stats["summary_updates"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"conversations": len(self._conversations), **self._stats}
+
+
+conversation_context = ConversationContext()
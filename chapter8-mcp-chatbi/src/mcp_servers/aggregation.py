@@ -0,0 +1,184 @@
+# src/mcp_servers/aggregation.py
+from src.mcp_servers.charts import ChartError
+
+# Aggregate functions accepted by the chart tools, by name
+AGG_FUNCTIONS = {
+    "sum": "SUM({})",
+    "avg": "AVG({})",
+    "min": "MIN({})",
+    "max": "MAX({})",
+    "count": "COUNT({})",
+    "count_distinct": "COUNT(DISTINCT {})",
+}
+
+# The same aggregations applied to a DataFrame, for stored results
+FRAME_AGG_FUNCTIONS = {
+    "sum": "sum",
+    "avg": "mean",
+    "min": "min",
+    "max": "max",
+    "count": "count",
+    "count_distinct": "nunique",
+}
+
+# Chart types that can push an aggregation down: (group-by keys, value key)
+AGGREGATABLE_CHARTS = {
+    "bar": (("x_column", "color_column"), "y_column"),
+    "pie": (("labels_column",), "values_column"),
+}
+
+
+def quote_identifier(name: str) -> str:
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def _check_aggregation(agg, measure, top_k) -> str:
+    agg = (agg or "").lower()
+    if agg not in AGG_FUNCTIONS:
+        raise ChartError(f"Unsupported aggregation '{agg}', use one of {list(AGG_FUNCTIONS)}")
+    if measure is None and agg != "count":
+        raise ChartError(f"Aggregation '{agg}' needs a measure column")
+    if top_k is not None and int(top_k) < 1:
+        raise ChartError("top_k must be a positive number")
+    return agg
+
+
+def build_aggregate_query(query, group_by, measure, agg, value_alias, top_k=None) -> str:
+    """
+    Wrap a query in GROUP BY SQL so the database returns aggregated rows.
+
+    Args:
+        query: The user's SQL, used as a derived table
+        group_by: Columns of the query to group by
+        measure: Column to aggregate; None with "count" counts rows
+        agg: Key of AGG_FUNCTIONS
+        value_alias: Name of the aggregated column in the result
+        top_k: Keep only the k groups of the first group-by column with the
+            largest aggregated value
+
+    Returns:
+        The aggregate SQL
+    """
+    agg = _check_aggregation(agg, measure, top_k)
+    source = query.strip().rstrip(";")
+    keys = [quote_identifier(col) for col in group_by]
+    value = AGG_FUNCTIONS[agg].format("*" if measure is None else f"src.{quote_identifier(measure)}")
+    select = ", ".join(f"src.{key} AS {key}" for key in keys)
+    group = ", ".join(f"src.{key}" for key in keys)
+    alias = quote_identifier(value_alias)
+
+    if top_k is None:
+        return (
+            f"SELECT {select}, {value} AS {alias} FROM ({source}) AS src "
+            f"GROUP BY {group} ORDER BY {group}"
+        )
+    if len(keys) == 1:
+        return (
+            f"SELECT {select}, {value} AS {alias} FROM ({source}) AS src "
+            f"GROUP BY {group} ORDER BY {alias} DESC LIMIT {int(top_k)}"
+        )
+
+    # Rank the first group-by column on its own, then break the top ones down by the rest.
+    # The query is a CTE so it is evaluated once for both, and joined rather than
+    # filtered with IN (... LIMIT k), which MySQL does not support.
+    first = keys[0]
+    return (
+        f"WITH src AS ({source}) "
+        f"SELECT {select}, {value} AS {alias} FROM src "
+        f"JOIN (SELECT src.{first} AS top_key FROM src GROUP BY src.{first} "
+        f"ORDER BY {value} DESC LIMIT {int(top_k)}) AS top_groups ON top_groups.top_key = src.{first} "
+        f"GROUP BY {group} ORDER BY {group}"
+    )
+
+
+def aggregate_frame(df, group_by, measure, agg, value_alias, top_k=None):
+    """
+    Apply the aggregation of build_aggregate_query to a DataFrame, for charts
+    built from a stored result rather than a query.
+
+    Args:
+        df: The stored result
+        group_by: Columns to group by
+        measure: Column to aggregate; None with "count" counts rows
+        agg: Key of AGG_FUNCTIONS
+        value_alias: Name of the aggregated column in the result
+        top_k: Keep only the k groups of the first group-by column with the
+            largest aggregated value
+
+    Returns:
+        The aggregated frame, ordered like the SQL version
+    """
+    agg = _check_aggregation(agg, measure, top_k)
+    missing = [col for col in [*group_by, measure] if col is not None and col not in df.columns]
+    if missing:
+        raise ChartError(f"Columns {', '.join(missing)} not found in the stored result")
+
+    def aggregate(frame, keys):
+        grouped = frame.groupby(keys, dropna=False, sort=True)
+        return grouped.size() if measure is None else grouped[measure].agg(FRAME_AGG_FUNCTIONS[agg])
+
+    keys = list(group_by)
+    if top_k is not None and len(keys) > 1:
+        top_groups = aggregate(df, keys[:1]).sort_values(ascending=False, kind="stable").head(int(top_k))
+        df = df[df[keys[0]].isin(top_groups.index)]
+    values = aggregate(df, keys)
+    if top_k is not None and len(keys) == 1:
+        values = values.sort_values(ascending=False, kind="stable").head(int(top_k))
+    return values.rename(value_alias).reset_index()
+
+
+def _chart_aggregation(chart_type, params):
+    """(group_by, measure, agg, value_alias, top_k) when a chart's parameters ask for an aggregation, else None."""
+    agg, measure, top_k = params.get("agg"), params.get("measure"), params.get("top_k")
+    if chart_type not in AGGREGATABLE_CHARTS or not (agg or measure or top_k):
+        return None
+
+    group_keys, value_key = AGGREGATABLE_CHARTS[chart_type]
+    group_by = list(dict.fromkeys(params[key] for key in group_keys if params.get(key)))
+    value_alias = params.get(value_key)
+    if not group_by or not value_alias:
+        raise ChartError(f"Aggregation needs {' and '.join(group_keys[:1] + (value_key,))}")
+
+    agg = agg or "sum"
+    if measure is None and agg != "count":
+        measure = value_alias
+    return group_by, measure, agg, value_alias, top_k
+
+
+def chart_aggregate_query(chart_type, query, params):
+    """
+    Rewrite a chart's query when its parameters ask for an aggregation.
+
+    The chart's category columns (x and color for bars, labels for pies)
+    become the GROUP BY, and the aggregate is returned under the chart's
+    value column, so the chart is then built from the aggregated rows as is.
+
+    Args:
+        chart_type: "bar" or "pie"; other types are returned unchanged
+        query: The user's SQL
+        params: Chart parameters, including agg, measure and top_k
+
+    Returns:
+        (query, aggregation) where aggregation describes the push-down, or None
+    """
+    spec = _chart_aggregation(chart_type, params)
+    if spec is None:
+        return query, None
+    group_by, measure, agg, value_alias, top_k = spec
+    aggregation = {"agg": agg, "measure": measure, "group_by": group_by, "top_k": top_k}
+    return build_aggregate_query(query, group_by, measure, agg, value_alias, top_k), aggregation
+
+
+def chart_aggregate_frame(chart_type, df, params):
+    """
+    Like chart_aggregate_query, for a chart built from a stored result.
+
+    Returns:
+        (frame, aggregation) where aggregation describes what was applied, or None
+    """
+    spec = _chart_aggregation(chart_type, params)
+    if spec is None:
+        return df, None
+    group_by, measure, agg, value_alias, top_k = spec
+    aggregation = {"agg": agg, "measure": measure, "group_by": group_by, "top_k": top_k}
+    return aggregate_frame(df, group_by, measure, agg, value_alias, top_k), aggregation
@@ -0,0 +1,263 @@
+# src/mcp_servers/charts.py
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+
+from src.mcp_servers.downsample import CHART_MAX_POINTS, downsample
+from src.mcp_servers.encoding import to_typed_array
+from src.mcp_servers.heatmap import heatmap_grid
+
+# Load environment variables
+load_dotenv()
+
+# Encoding of numeric trace data: "json" (plain lists) or "typed" (Plotly
+# base64 typed arrays, several times smaller and faster to parse)
+CHART_ENCODING = os.getenv("CHART_ENCODING", "json").lower()
+
+
+class ChartError(ValueError):
+    """A chart cannot be built from the given data and parameters."""
+
+
+def split_by_color(df, color_column):
+    """
+    Partition row positions by the value of `color_column` in one pass.
+
+    Returns (names, order, bounds): rows order[bounds[i]:bounds[i + 1]]
+    hold names[i], in order of first appearance like Series.unique().
+    """
+    codes, names = pd.factorize(df[color_column], use_na_sentinel=False)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return names, order, bounds.tolist()
+
+
+def numeric_array(values: pd.Series):
+    """
+    A column as a numpy array if it can be sent as a typed array, else None.
+
+    DECIMAL columns, which arrive as objects, are converted to float64;
+    missing values become NaN.
+    """
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return None
+    if pd.api.types.is_numeric_dtype(dtype):
+        if values.hasnans:
+            return values.to_numpy(dtype=float, na_value=np.nan)
+        return values.to_numpy()
+    if dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ("decimal", "integer", "floating"):
+        return values.astype(float).to_numpy()
+    return None
+
+
+def _trace_values(values: pd.Series, encoding):
+    """A column's trace values: a numpy array when it will be typed-array encoded, else a list."""
+    if encoding == "typed":
+        array = numeric_array(values)
+        if array is not None:
+            return array
+    if isinstance(values.dtype, pd.ArrowDtype):
+        # JSON-ready values: NULL as None rather than pd.NA, dates and times as ISO strings
+        array = pa.Array.from_pandas(values)
+        if pa.types.is_temporal(array.type):
+            array = array.cast(pa.string())
+        return array.to_pylist()
+    return values.tolist()
+
+
+def _pack(values):
+    return to_typed_array(values) if isinstance(values, np.ndarray) else values
+
+
+def build_traces(df, trace, columns, color_column=None, marker_columns=None, encoding=None):
+    """
+    Build Plotly traces, one per value of `color_column` (or a single trace).
+
+    Each column is converted once and sliced per group, instead of filtering
+    the whole frame once per color value.
+
+    Args:
+        df: Query results
+        trace: Keys shared by every trace, e.g. {"type": "bar"}
+        columns: Trace key -> column name, e.g. {"x": "month", "y": "sales"}
+        color_column: Optional column whose values split the data into traces
+        marker_columns: Optional marker key -> column name, e.g. {"size": "pop"}
+        encoding: "json" or "typed", CHART_ENCODING if None
+
+    Returns:
+        List of trace dicts
+    """
+    encoding = encoding or CHART_ENCODING
+    marker_columns = marker_columns or {}
+    if not color_column:
+        data = {**{key: _pack(_trace_values(df[col], encoding)) for key, col in columns.items()}, **trace}
+        if marker_columns:
+            data["marker"] = {key: _pack(_trace_values(df[col], encoding)) for key, col in marker_columns.items()}
+        return [data]
+
+    names, order, bounds = split_by_color(df, color_column)
+    values = {key: _trace_values(df[col].take(order), encoding) for key, col in columns.items()}
+    markers = {key: _trace_values(df[col].take(order), encoding) for key, col in marker_columns.items()}
+
+    traces = []
+    for i, name in enumerate(names):
+        start, end = bounds[i], bounds[i + 1]
+        data = {key: _pack(column[start:end]) for key, column in values.items()}
+        data.update(trace)
+        data["name"] = str(name)
+        if markers:
+            data["marker"] = {key: _pack(column[start:end]) for key, column in markers.items()}
+        traces.append(data)
+    return traces
+
+
+def chart_config(chart_type, title, chart_data, x_column=None, y_column=None) -> dict:
+    """Wrap traces in the chart configuration returned by the chart tools."""
+    layout = {"title": title}
+    if x_column is not None:
+        layout["xaxis"] = {"title": x_column}
+        layout["yaxis"] = {"title": y_column}
+    return {
+        "title": title,
+        "chart_type": chart_type,
+        "chart_data": {
+            "data": chart_data,
+            "layout": layout
+        }
+    }
+
+
+def _check_columns(df, x_column, y_column, color_column=None, size_column=None):
+    if x_column not in df.columns or y_column not in df.columns:
+        raise ChartError(f"Columns {x_column} or {y_column} not found in query results")
+    if color_column and color_column not in df.columns:
+        raise ChartError(f"Color column {color_column} not found in query results")
+    if size_column and size_column not in df.columns:
+        raise ChartError(f"Size column {size_column} not found in query results")
+
+
+def _downsample(df, x_column, y_column, max_points, method, color_column):
+    """Apply the point budget (CHART_MAX_POINTS if max_points is None, 0 for none)."""
+    budget = CHART_MAX_POINTS if max_points is None else max_points
+    if not budget or len(df) <= budget:
+        return df, None
+    groups = split_by_color(df, color_column)[1:] if color_column else None
+    return downsample(df, x_column, y_column, budget, method, groups)
+
+
+def bar_chart(df, x_column, y_column, title="Bar Chart", color_column=None, encoding=None) -> dict:
+    """Bar chart configuration, one trace per color value."""
+    _check_columns(df, x_column, y_column, color_column)
+    chart_data = build_traces(df, {"type": "bar"}, {"x": x_column, "y": y_column}, color_column, encoding=encoding)
+    return chart_config("bar", title, chart_data, x_column, y_column)
+
+
+def line_chart(df, x_column, y_column, title="Line Chart", color_column=None, max_points=None,
+               encoding=None) -> dict:
+    """Line chart configuration, one trace per color value, reduced to `max_points` with LTTB."""
+    _check_columns(df, x_column, y_column, color_column)
+    df, downsampling = _downsample(df, x_column, y_column, max_points, "lttb", color_column)
+    chart_data = build_traces(df, {"type": "line"}, {"x": x_column, "y": y_column}, color_column,
+                              encoding=encoding)
+    config = chart_config("line", title, chart_data, x_column, y_column)
+    if downsampling:
+        config["downsampling"] = downsampling
+    return config
+
+
+def pie_chart(df, labels_column, values_column, title="Pie Chart", encoding=None) -> dict:
+    """Pie chart configuration."""
+    if labels_column not in df.columns or values_column not in df.columns:
+        raise ChartError(f"Columns {labels_column} or {values_column} not found in query results")
+    chart_data = build_traces(df, {"type": "pie"}, {"labels": labels_column, "values": values_column},
+                              encoding=encoding)
+    return chart_config("pie", title, chart_data)
+
+
+def scatter_chart(df, x_column, y_column, title="Scatter Plot", color_column=None, size_column=None,
+                  max_points=None, encoding=None) -> dict:
+    """
+    Scatter plot configuration, one trace per color value, optionally sized by
+    a column and reduced to `max_points` by grid decimation.
+    """
+    _check_columns(df, x_column, y_column, color_column, size_column)
+    df, downsampling = _downsample(df, x_column, y_column, max_points, "grid", color_column)
+    chart_data = build_traces(
+        df, {"mode": "markers", "type": "scatter"}, {"x": x_column, "y": y_column}, color_column,
+        marker_columns={"size": size_column} if size_column else None, encoding=encoding
+    )
+    config = chart_config("scatter", title, chart_data, x_column, y_column)
+    if downsampling:
+        config["downsampling"] = downsampling
+    return config
+
+
+def heatmap_chart(df, x_column, y_column, z_column, title="Heatmap", agg="sum", bins=None, top_k=None,
+                  encoding=None) -> dict:
+    """
+    Heatmap configuration from long-format x/y/z rows. Duplicate cells are
+    aggregated with `agg`, numeric axes with many values are binned and other
+    axes are capped to their top categories (see heatmap.heatmap_grid).
+    """
+    if x_column not in df.columns or y_column not in df.columns or z_column not in df.columns:
+        raise ChartError(f"Columns {x_column}, {y_column}, or {z_column} not found in query results")
+
+    try:
+        z, x_labels, y_labels, binning = heatmap_grid(df, x_column, y_column, z_column, agg, bins, top_k)
+    except Exception as e:
+        raise ChartError(f"Error creating heatmap: {str(e)}")
+
+    encoding = encoding or CHART_ENCODING
+    chart_data = [{
+        "z": to_typed_array(z) if encoding == "typed" else z.tolist(),
+        "x": _pack(_trace_values(x_labels, encoding)),
+        "y": _pack(_trace_values(y_labels, encoding)),
+        "type": "heatmap"
+    }]
+    config = chart_config("heatmap", title, chart_data, x_column, y_column)
+    if binning:
+        config["binning"] = binning
+    return config
+
+
+# Dashboard chart types: (builder, default title, required config keys, optional config keys)
+CHART_BUILDERS = {
+    "bar": (bar_chart, "Bar Chart", ("x_column", "y_column"), ("color_column", "encoding")),
+    "line": (line_chart, "Line Chart", ("x_column", "y_column"), ("color_column", "max_points", "encoding")),
+    "pie": (pie_chart, "Pie Chart", ("labels_column", "values_column"), ("encoding",)),
+    "scatter": (scatter_chart, "Scatter Plot", ("x_column", "y_column"),
+                ("color_column", "size_column", "max_points", "encoding")),
+    "heatmap": (heatmap_chart, "Heatmap", ("x_column", "y_column", "z_column"),
+                ("agg", "bins", "top_k", "encoding")),
+}
+
+
+def build_chart(df, chart_type, config, index) -> dict:
+    """
+    Build one dashboard chart from its configuration entry.
+
+    Args:
+        df: Query results for the chart
+        chart_type: Key of CHART_BUILDERS
+        config: The chart's entry of chart_configs
+        index: 1-based position of the chart, used in titles and errors
+
+    Returns:
+        Chart configuration, or {"error": message}
+    """
+    if chart_type not in CHART_BUILDERS:
+        return {"error": f"Unsupported chart type '{chart_type}' for chart {index}"}
+
+    builder, default_title, required, optional = CHART_BUILDERS[chart_type]
+    if not all(config.get(key) for key in required):
+        return {"error": f"{default_title} {index} is missing one of {', '.join(required)}"}
+
+    params = {key: config.get(key) for key in required + optional}
+    try:
+        return builder(df, title=config.get("title", f"{default_title} {index}"), **params)
+    except ChartError as err:
+        return {"error": f"{err} for chart {index}"}
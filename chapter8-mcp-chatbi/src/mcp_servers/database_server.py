@@ -3,69 +3,260 @@ import asyncio
 import json
 import logging
 import os
+import sys
 
 import mysql.connector
 import pandas as pd
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 
+from src.mcp_servers.db_pool import QueryCancelled, get_db_connection, get_pool, run_db_call
+from src.mcp_servers.encoding import ARROW_FORMAT, dumps, to_arrow_base64, to_columnar
+from src.mcp_servers.query_guard import add_execution_time_hint, check_query
+from src.mcp_servers.result_cache import (
+    RESULT_CACHE_ENABLED,
+    QueryResultCache,
+    fetch_table_versions,
+    is_cacheable,
+    referenced_tables,
+)
+from src.mcp_servers.result_store import (
+    QUERY_MAX_BYTES,
+    QUERY_MAX_ROWS,
+    QUERY_PAGE_SIZE,
+    ResultStore,
+    fetch_result_set,
+    make_page_token,
+    page_bounds,
+    parse_page_token,
+)
+from src.mcp_servers.schema_catalog import (
+    STATS_COUNT_CONCURRENCY,
+    STATS_COUNT_TIMEOUT,
+    SchemaCatalog,
+    StatsCache,
+    count_table_rows,
+    fetch_table_sizes,
+    format_bytes,
+    is_ddl,
+)
+
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
+# Default time limits in seconds for the tools' database work. A statement
+# still running when its limit expires, or when the client cancels the tool
+# call, is stopped with KILL QUERY.
+SQL_TOOL_TIMEOUT = float(os.getenv("SQL_TOOL_TIMEOUT", "60"))
+METADATA_TOOL_TIMEOUT = float(os.getenv("METADATA_TOOL_TIMEOUT", "15"))
+
 # Initialize MCP server
 mcp = FastMCP("Database Query Provider", port=8002)
 
-# Database connection settings
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "88888888")
-DB_NAME = os.getenv("DB_NAME", "chatbi")
-DB_PORT = os.getenv("DB_PORT", "3306")
+# Cache of SELECT results shared by all sessions
+query_cache = QueryResultCache()
 
+# Cached information_schema snapshot behind describe_database
+schema_catalog = SchemaCatalog()
 
-def get_db_connection():
-    """Create a connection to the MySQL database."""
-    try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            port=DB_PORT
-        )
-        return connection
-    except mysql.connector.Error as err:
-        print(f"Error connecting to MySQL: {err}")
-        return None
+# Rendered get_database_stats output, per mode
+stats_cache = StatsCache()
+
+# Large results kept for fetch_result_page
+result_store = ResultStore()
+
+
+def execute_query(query: str, guard: bool = False):
+    """
+    Execute a SQL query and return the results.
 
+    SELECT rows are streamed until the result or the QUERY_MAX_ROWS /
+    QUERY_MAX_BYTES budget ends and returned as a ResultSet. Other statements
+    return {"affected_rows": n}; failures return {"error": message}.
+
+    With `guard` set, reads are first checked against the EXPLAIN cost guard,
+    which may return {"guard": action, "message": ...} instead of running
+    the query, or run it with a LIMIT appended.
+    """
+    cacheable = RESULT_CACHE_ENABLED and is_cacheable(query)
+    if cacheable:
+        cached = query_cache.get(query)
+        if cached is not None:
+            return cached
 
-def execute_query(query: str):
-    """Execute a SQL query and return the results."""
     connection = get_db_connection()
     if not connection:
         return {"error": "Failed to connect to the database"}
 
+    cursor = None
+    truncated = False
     try:
+        executed, notice = query, None
+        if guard:
+            decision = check_query(connection, query)
+            if decision.action in ("reject", "confirm"):
+                return {"guard": decision.action, "message": decision.message}
+            if decision.action == "limit":
+                executed, notice = decision.query, decision.message
+                # A capped result must not be served for the uncapped query
+                cacheable = False
+
+        versions = None
+        if cacheable:
+            # Snapshot UPDATE_TIME before reading so a concurrent write is never missed
+            tables = referenced_tables(query)
+            try:
+                versions = fetch_table_versions(connection, tables)
+            except Exception as err:
+                logger.info(f"Could not read table versions, relying on TTL only: {err}")
+
         cursor = connection.cursor(dictionary=True)
-        cursor.execute(query)
+        cursor.execute(add_execution_time_hint(executed))
 
         # Check if the query is a SELECT query
         if cursor.description:
-            results = cursor.fetchall()
+            results = fetch_result_set(cursor)
+            results.notice = notice
+            truncated = results.truncated
+            if cacheable:
+                query_cache.put(query, results, versions=versions)
             return results
         else:
             connection.commit()
+            query_cache.invalidate_for_write(query)
+            if is_ddl(query):
+                schema_catalog.invalidate()
+                stats_cache.clear()
             return {"affected_rows": cursor.rowcount}
     except mysql.connector.Error as err:
         return {"error": str(err)}
     finally:
-        if connection.is_connected():
-            cursor.close()
+        if truncated:
+            # Unread rows are still on the wire; drop the connection rather than drain it
+            connection.discard()
+        else:
+            if cursor is not None and connection.is_connected():
+                cursor.close()
             connection.close()
 
 
+def rows_to_text(rows, columns, offset=0) -> str:
+    """Format rows as a text table numbered from `offset`."""
+    df = pd.DataFrame(list(rows), columns=columns, index=range(offset, offset + len(rows)))
+    return df.to_string()
+
+
+def rows_to_json(rows, columns=None, offset=0) -> str:
+    """Format rows as a JSON list of objects."""
+    return dumps(list(rows))
+
+
+def rows_to_columnar(rows, columns, offset=0) -> str:
+    """Format rows as a JSON list of value lists in column order."""
+    return dumps(to_columnar(rows, columns))
+
+
+def rows_to_arrow(rows, columns, offset=0) -> str:
+    """Format rows as a base64 Arrow IPC stream."""
+    return to_arrow_base64(rows, columns)
+
+
+# JSON output formats of execute_sql_query_json
+JSON_FORMATS = ("rows", "columnar", "arrow")
+
+# Page renderers by output format
+PAGE_RENDERERS = {
+    "text": rows_to_text,
+    "rows": rows_to_json,
+    "columnar": rows_to_columnar,
+    "arrow": rows_to_arrow,
+}
+
+
+def paging_info(results, result_id, offset, end) -> dict:
+    """Describe where a page sits in its result and how to fetch the next one."""
+    return {
+        "row_count": len(results),
+        "offset": offset,
+        "returned_rows": end - offset,
+        "truncated": results.truncated,
+        "result_id": result_id,
+        "next_page_token": make_page_token(result_id, end) if end < len(results) else None,
+    }
+
+
+def paging_footer(info) -> str:
+    """Plain-text paging notes appended to a text page."""
+    lines = []
+    if "offset" in info:
+        total = f"{info['row_count']}{'+' if info['truncated'] else ''}"
+        showing = f"Showing rows {info['offset'] + 1}-{info['offset'] + info['returned_rows']} of {total}."
+        if info["truncated"]:
+            showing += (f" The result was cut off at the fetch budget ({QUERY_MAX_ROWS} rows / "
+                        f"{format_bytes(QUERY_MAX_BYTES)}); add filters, aggregation or a LIMIT.")
+        lines.append(showing)
+    if info.get("notice"):
+        lines.append(f"Note: {info['notice']}")
+    if info.get("result_id"):
+        lines.append(f"result_id: {info['result_id']} (pass it to the visualization tools as result_id "
+                     "to chart this result without running the query again)")
+    if info.get("next_page_token"):
+        lines.append(f"next_page_token: {info['next_page_token']}\n"
+                     "Call fetch_result_page with next_page_token to get more rows.")
+    return "\n\n" + "\n".join(lines) if lines else ""
+
+
+def render_page(query, results, fmt, offset=0, page_size=QUERY_PAGE_SIZE, result_id=None) -> str:
+    """
+    Render one page of a result set in one of the PAGE_RENDERERS formats.
+
+    A result that spans several pages is kept in the result store, and the
+    page carries its result_id and a next_page_token. A result that fits in
+    a single page is not stored: it is all in the response, and charting it
+    runs its (cheap, usually cached) query again. A row-list result that fits
+    in a single page is returned as a plain list,
+    as before paging existed. The columnar and Arrow formats always return an
+    object with the column names.
+    """
+    page_size = max(1, page_size)
+    render = PAGE_RENDERERS[fmt]
+    key = f"{fmt}:{page_size}"
+
+    cached = query_cache.get_rendered(query, key) if offset == 0 else None
+    if cached is not None:
+        body, end = cached
+    else:
+        body, end = page_bounds(
+            results, offset, page_size,
+            lambda rows: render(rows, results.columns, offset)
+        )
+        if offset == 0:
+            query_cache.set_rendered(query, key, (body, end), size=sys.getsizeof(body))
+
+    single_page = offset == 0 and end == len(results) and not results.truncated
+    if single_page and fmt == "rows" and not results.notice:
+        return body
+
+    if result_id is None and results and not single_page:
+        # Writes the result file; callers on the event loop run render_page in a thread
+        result_id = result_store.put(query, results)
+    if single_page:
+        info = {"row_count": len(results)}
+    else:
+        info = paging_info(results, result_id, offset, end)
+    if results.notice:
+        info["notice"] = results.notice
+
+    if fmt == "text":
+        return body + paging_footer(info)
+    if fmt == "arrow":
+        return dumps({"columns": results.columns, "format": ARROW_FORMAT, **info, "data": body})
+    # The row body is already JSON; splice it in rather than re-encoding it
+    return dumps({"columns": results.columns, **info})[:-1] + ',"rows":' + body + "}"
+
+
 @mcp.tool(
     name="get_table_schema",
     description="Get the schema of a specific table in the database"
@@ -75,6 +266,14 @@ async def get_table_schema(table_name: str) -> str:
 
     logger.info(f"Fetching schema for table: {table_name}")
 
+    try:
+        return await run_db_call(describe_table, table_name, timeout=METADATA_TOOL_TIMEOUT)
+    except QueryCancelled as err:
+        return f"Error retrieving schema for table '{table_name}': {err}"
+
+
+def describe_table(table_name: str) -> str:
+    """Describe a table and format its columns."""
     connection = get_db_connection()
     if not connection:
         return "Failed to connect to the database"
@@ -101,7 +300,23 @@ async def get_table_schema(table_name: str) -> str:
     finally:
         if connection.is_connected():
             cursor.close()
-            connection.close()
+        connection.close()
+
+
+@mcp.tool(
+    name="describe_database",
+    description="Describe all tables in the database in one call: columns, types, primary and "
+                "foreign keys, and estimated row counts"
+)
+async def describe_database() -> str:
+    """Describe all tables in the database in one call."""
+
+    logger.info("Describing the database schema")
+
+    try:
+        return await run_db_call(schema_catalog.render, timeout=METADATA_TOOL_TIMEOUT)
+    except Exception as err:
+        return f"Error describing database: {err}"
 
 
 @mcp.tool(
@@ -113,6 +328,14 @@ async def list_tables() -> str:
 
     logger.info("Listing all tables in the database")
 
+    try:
+        return await run_db_call(show_tables, timeout=METADATA_TOOL_TIMEOUT)
+    except QueryCancelled as err:
+        return f"Error listing tables: {err}"
+
+
+def show_tables() -> str:
+    """Fetch and format the table names of the database."""
     connection = get_db_connection()
     if not connection:
         return "Failed to connect to the database"
@@ -132,19 +355,38 @@ async def list_tables() -> str:
     finally:
         if connection.is_connected():
             cursor.close()
-            connection.close()
+        connection.close()
 
 
 @mcp.tool(
     name="execute_sql_query",
-    description="Execute a SQL query on the database and return the results"
+    description="Execute a SQL query on the database and return the results. Large results are paged: the "
+                "response then ends with a next_page_token for fetch_result_page and a result_id that the "
+                "visualization tools accept instead of a query"
 )
-async def execute_sql_query(query: str) -> str:
-    """Execute a SQL query and return the results."""
+async def execute_sql_query(query: str, page_size: int = QUERY_PAGE_SIZE, confirm: bool = False) -> str:
+    """
+    Execute a SQL query and return the results.
+
+    Args:
+        query: SQL query to execute
+        page_size: Maximum number of rows in the response
+        confirm: Run the query even if the cost guard considers it too expensive
+
+    Returns:
+        Formatted rows, followed by the result_id and paging notes if the result
+        spans several pages
+    """
 
     logger.info(f"Executing SQL query: {query}")
 
-    results = execute_query(query)
+    try:
+        results = await run_db_call(execute_query, query, guard=not confirm, timeout=SQL_TOOL_TIMEOUT)
+    except QueryCancelled as err:
+        return f"Error executing query: {err}"
+
+    if isinstance(results, dict) and "guard" in results:
+        return results["message"]
 
     if isinstance(results, dict) and "error" in results:
         return f"Error executing query: {results['error']}"
@@ -156,21 +398,46 @@ async def execute_sql_query(query: str) -> str:
     if not results:
         return "Query executed successfully. No results returned."
 
-    # Convert to DataFrame for better formatting
-    df = pd.DataFrame(results)
-    return df.to_string()
+    # A paged result is kept so chart tools and later pages can use it without re-running the query
+    return await asyncio.to_thread(render_page, query, results, "text", page_size=page_size)
 
 
 @mcp.tool(
     name="execute_sql_query_json",
-    description="Execute a SQL query and return the results as JSON"
+    description="Execute a SQL query and return the results as JSON. format='rows' (default) returns a list "
+                "of objects, 'columnar' returns {columns, rows: [[...]]}, 'arrow' returns a base64 Arrow IPC "
+                "stream. Large results are paged: the response then carries row_count, next_page_token and a "
+                "result_id that the visualization tools accept instead of a query"
 )
-async def execute_sql_query_json(query: str) -> str:
-    """Execute a SQL query and return the results as JSON."""
+async def execute_sql_query_json(query: str, page_size: int = QUERY_PAGE_SIZE, format: str = "rows",
+                                 confirm: bool = False) -> str:
+    """
+    Execute a SQL query and return the results as JSON.
+
+    Args:
+        query: SQL query to execute
+        page_size: Maximum number of rows in the response
+        format: "rows", "columnar" or "arrow"
+        confirm: Run the query even if the cost guard considers it too expensive
+
+    Returns:
+        A JSON list of rows, or an object with columns, rows/data and paging
+        fields for the columnar and Arrow formats or when the result spans
+        several pages
+    """
 
     logger.info(f"Executing SQL query: {query}")
 
-    results = execute_query(query)
+    if format not in JSON_FORMATS:
+        return json.dumps({"error": f"Unsupported format '{format}', use one of {list(JSON_FORMATS)}"})
+
+    try:
+        results = await run_db_call(execute_query, query, guard=not confirm, timeout=SQL_TOOL_TIMEOUT)
+    except QueryCancelled as err:
+        return json.dumps({"error": str(err), "cancelled": True})
+
+    if isinstance(results, dict) and "guard" in results:
+        return json.dumps(results)
 
     if isinstance(results, dict) and "error" in results:
         return json.dumps({"error": results["error"]})
@@ -179,7 +446,49 @@ async def execute_sql_query_json(query: str) -> str:
         return json.dumps({"affected_rows": results["affected_rows"]})
 
     # Return results as JSON
-    return json.dumps(results, default=str)
+    try:
+        return await asyncio.to_thread(render_page, query, results, format, page_size=page_size)
+    except Exception as err:
+        return json.dumps({"error": f"Error encoding results as {format}: {err}"})
+
+
+@mcp.tool(
+    name="fetch_result_page",
+    description="Fetch the next page of a large query result using the next_page_token "
+                "returned by execute_sql_query or execute_sql_query_json"
+)
+async def fetch_result_page(page_token: str, page_size: int = QUERY_PAGE_SIZE, format: str = "text") -> str:
+    """
+    Fetch a further page of a stored query result without re-running the query.
+
+    Args:
+        page_token: next_page_token from a previous response
+        page_size: Maximum number of rows in the response
+        format: "text", "json", "columnar" or "arrow"
+
+    Returns:
+        The requested page in the same layout as the original tool
+    """
+    try:
+        result_id, offset = parse_page_token(page_token)
+    except ValueError as err:
+        return f"Error fetching result page: {err}"
+
+    stored = await asyncio.to_thread(result_store.get, result_id)
+    if stored is None:
+        return f"Error fetching result page: result '{result_id}' has expired, please run the query again"
+
+    query, results = stored
+    if offset >= len(results):
+        return f"No more rows: the result has {len(results)} rows."
+
+    fmt = "rows" if format == "json" else format
+    if fmt not in PAGE_RENDERERS:
+        return f"Error fetching result page: unsupported format '{format}'"
+    try:
+        return render_page(query, results, fmt, offset=offset, page_size=page_size, result_id=result_id)
+    except Exception as err:
+        return f"Error fetching result page: {err}"
 
 
 @mcp.tool(
@@ -189,7 +498,10 @@ async def execute_sql_query_json(query: str) -> str:
 async def get_table_sample(table_name: str, limit: int = 5) -> str:
     """Get a sample of rows from a specific table."""
     query = f"SELECT * FROM {table_name} LIMIT {limit}"
-    results = execute_query(query)
+    try:
+        results = await run_db_call(execute_query, query, timeout=METADATA_TOOL_TIMEOUT)
+    except QueryCancelled as err:
+        return f"Error retrieving sample from table '{table_name}': {err}"
 
     logger.info(f"Fetching sample from table: {table_name}")
     logger.info(f"Query: {query}")
@@ -209,34 +521,79 @@ async def get_table_sample(table_name: str, limit: int = 5) -> str:
 
 @mcp.tool(
     name="get_database_stats",
-    description="Get statistics about the database tables"
+    description="Get statistics about the database tables: estimated row counts and data/index sizes. "
+                "Set exact=true to count rows exactly, which is slow on large tables"
 )
-async def get_database_stats() -> str:
-    """Get statistics about the database tables."""
-    connection = get_db_connection()
-    if not connection:
-        return "Failed to connect to the database"
+async def get_database_stats(exact: bool = False) -> str:
+    """
+    Get statistics about the database tables.
+
+    Args:
+        exact: Run COUNT(*) on every table instead of using storage engine estimates
+
+    Returns:
+        Formatted statistics, one line per table
+    """
+    mode = "exact" if exact else "estimate"
+    stats = stats_cache.get(mode)
+    if stats is not None:
+        return stats
 
     try:
-        cursor = connection.cursor()
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
+        tables = await run_db_call(fetch_table_sizes, timeout=METADATA_TOOL_TIMEOUT)
+    except Exception as err:
+        return f"Error retrieving database statistics: {err}"
 
-        stats = "Database Statistics:\n"
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = cursor.fetchone()[0]
-            stats += f"- {table_name}: {count} rows\n"
+    counts = {}
+    if exact:
+        counts = await count_tables_concurrently([table[0] for table in tables])
 
-        return stats
-    except mysql.connector.Error as err:
-        return f"Error retrieving database statistics: {err}"
-    finally:
-        if connection.is_connected():
-            cursor.close()
-            connection.close()
+    stats = f"Database Statistics ({'exact counts' if exact else 'estimates'}):\n"
+    for table_name, table_rows, data_length, index_length in tables:
+        if exact:
+            count = counts[table_name]
+            rows = f"{count} rows" if isinstance(count, int) else f"~{table_rows} rows (exact count {count})"
+        else:
+            rows = f"~{table_rows} rows"
+        stats += f"- {table_name}: {rows}, data {format_bytes(data_length)}, index {format_bytes(index_length)}\n"
+
+    stats_cache.put(mode, stats)
+    return stats
+
+
+async def count_tables_concurrently(table_names):
+    """Count rows of several tables in parallel, each bounded by STATS_COUNT_TIMEOUT."""
+    semaphore = asyncio.Semaphore(STATS_COUNT_CONCURRENCY)
+
+    async def count(table_name):
+        async with semaphore:
+            try:
+                result = await run_db_call(count_table_rows, table_name, STATS_COUNT_TIMEOUT,
+                                           timeout=STATS_COUNT_TIMEOUT + 1)
+            except QueryCancelled:
+                result = None
+            except Exception as err:
+                return f"failed: {err}"
+            return result if result is not None else f"timed out after {STATS_COUNT_TIMEOUT:g}s"
+
+    results = await asyncio.gather(*(count(name) for name in table_names))
+    return dict(zip(table_names, results))
+
+
+@mcp.tool(
+    name="get_database_server_metrics",
+    description="Get internal metrics of the database server (connection pool, caches)"
+)
+async def get_database_server_metrics() -> str:
+    """Get internal metrics of the database server (connection pool, caches)."""
+    return json.dumps({
+        "pool": get_pool().metrics(),
+        "result_cache": query_cache.metrics(),
+        "schema_catalog": schema_catalog.metrics(),
+        "result_store": result_store.metrics(),
+    })
 
 
 if __name__ == "__main__":
+    schema_catalog.start_background_refresh()
     asyncio.run(mcp.run_sse_async())
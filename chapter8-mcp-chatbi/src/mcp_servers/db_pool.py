@@ -0,0 +1,413 @@
+# src/mcp_servers/db_pool.py
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Database connection settings
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_USER = os.getenv("DB_USER", "root")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "88888888")
+DB_NAME = os.getenv("DB_NAME", "chatbi")
+DB_PORT = os.getenv("DB_PORT", "3306")
+
+# Pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = float(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Worker threads for blocking database calls; defaults to the pool size so
+# a worker never sits waiting for a connection
+DB_QUERY_WORKERS = int(os.getenv("DB_QUERY_WORKERS", str(DB_POOL_SIZE)))
+
+# Default time limit in seconds for a database call made by run_db_call
+DB_QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "60"))
+
+# Session value of information_schema_stats_expiry (MySQL 8). The server caches
+# TABLES.UPDATE_TIME and row estimates for this many seconds, 86400 by default,
+# which would hide external writes from the result cache; 0 reads them fresh.
+# Set to an empty value on servers without the variable (MySQL 5.7, MariaDB).
+DB_STATS_EXPIRY = os.getenv("DB_STATS_EXPIRY", "0")
+
+
+def connect_mysql():
+    """Open a new raw connection to the MySQL database."""
+    options = {}
+    if DB_STATS_EXPIRY:
+        options["init_command"] = f"SET SESSION information_schema_stats_expiry = {int(DB_STATS_EXPIRY)}"
+    return mysql.connector.connect(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        port=DB_PORT,
+        **options
+    )
+
+
+class QueryCancelled(Exception):
+    """Raised by run_db_call when a database call runs past its time limit."""
+
+
+class _DbCall:
+    """
+    Book-keeping for one run_db_call: the connections it has checked out.
+
+    Once cancel() has been called the call may not check out further
+    connections, and the ones it holds are closed rather than pooled, so a
+    KILL QUERY sent to their connection IDs cannot hit another caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connection_ids = set()
+        self.cancelled = False
+
+    def attach(self, connection_id):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("Database call was cancelled")
+            self._connection_ids.add(connection_id)
+
+    def detach(self, connection_id):
+        with self._lock:
+            self._connection_ids.discard(connection_id)
+
+    def cancel(self) -> list:
+        """Mark the call cancelled and return the IDs of connections still in use."""
+        with self._lock:
+            self.cancelled = True
+            return list(self._connection_ids)
+
+
+# The _DbCall of the run_db_call executing in the current worker thread
+_current_call = contextvars.ContextVar("current_db_call", default=None)
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled connection.
+
+    Behaves like the underlying connection, except that close() hands it
+    back to the pool instead of tearing down the socket.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._connection_id = getattr(raw, "connection_id", None)
+        self._call = _current_call.get() if self._connection_id is not None else None
+        if self._call is not None:
+            try:
+                self._call.attach(self._connection_id)
+            except QueryCancelled:
+                self._call = None
+                self.discard()
+                raise
+
+    def close(self):
+        if self._raw is not None:
+            self._release(discard=self._call is not None and self._call.cancelled)
+
+    def discard(self):
+        """Close the underlying connection instead of returning it, e.g. with unread rows pending."""
+        if self._raw is not None:
+            self._release(discard=True)
+
+    def _release(self, discard):
+        raw, self._raw = self._raw, None
+        if self._call is not None:
+            self._call.detach(self._connection_id)
+        self._pool.release(raw, discard=discard)
+
+    def is_connected(self):
+        return self._raw is not None and self._raw.is_connected()
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections.
+
+    Args:
+        creator: Callable returning a new raw connection
+        size: Maximum number of open connections
+        timeout: Seconds to wait for a free connection before failing
+        recycle: Seconds a connection may sit idle before it is replaced
+        pre_ping: Ping connections on checkout and replace dead ones
+    """
+
+    def __init__(self, creator=connect_mysql, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 recycle=DB_POOL_RECYCLE, pre_ping=DB_POOL_PRE_PING):
+        self.creator = creator
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (raw connection, returned_at)
+        self._open = 0
+        self._checked_out = 0
+
+        self._stats = {
+            "checkouts": 0,
+            "connections_created": 0,
+            "connections_recycled": 0,
+            "ping_failures": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+        }
+
+    def connect(self) -> PooledConnection:
+        """Check a connection out of the pool, waiting up to `timeout` seconds."""
+        deadline = time.monotonic() + self.timeout
+        waited = None
+
+        with self._lock:
+            while True:
+                if self._idle:
+                    raw, returned_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    raw, returned_at = None, None
+                    self._open += 1
+                    break
+
+                if waited is None:
+                    waited = time.monotonic()
+                    self._stats["waits"] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    self._record_wait(waited)
+                    raise mysql.connector.errors.PoolError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"(pool size {self.size})"
+                    )
+                self._lock.wait(remaining)
+
+            if waited is not None:
+                self._record_wait(waited)
+            self._checked_out += 1
+            self._stats["checkouts"] += 1
+
+        try:
+            raw = self._checkout(raw, returned_at)
+        except Exception:
+            with self._lock:
+                self._open -= 1
+                self._checked_out -= 1
+                self._lock.notify()
+            raise
+
+        return PooledConnection(self, raw)
+
+    def _checkout(self, raw, returned_at):
+        """Validate an idle connection, replacing it if stale or dead."""
+        if raw is not None and time.monotonic() - returned_at > self.recycle:
+            self._discard(raw)
+            self._bump("connections_recycled")
+            raw = None
+
+        if raw is not None and self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception as err:
+                logger.info(f"Discarding dead pooled connection: {err}")
+                self._discard(raw)
+                self._bump("ping_failures")
+                raw = None
+
+        if raw is None:
+            raw = self.creator()
+            self._bump("connections_created")
+        return raw
+
+    def release(self, raw, discard=False):
+        """Return a raw connection to the pool, or close it if `discard` is set."""
+        reusable = False
+        if not discard:
+            try:
+                # Never hand out a connection with an open transaction snapshot
+                if getattr(raw, "in_transaction", False):
+                    raw.rollback()
+                reusable = raw.is_connected()
+            except Exception as err:
+                logger.info(f"Discarding pooled connection on release: {err}")
+
+        with self._lock:
+            self._checked_out -= 1
+            if reusable:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._open -= 1
+            self._lock.notify()
+
+        if not reusable:
+            self._discard(raw)
+
+    def dispose(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._lock.notify_all()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def metrics(self) -> dict:
+        """Snapshot of pool usage counters."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                **self._stats,
+            }
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _record_wait(self, started):
+        elapsed = time.monotonic() - started
+        self._stats["wait_time_total"] += elapsed
+        self._stats["wait_time_max"] = max(self._stats["wait_time_max"], elapsed)
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def set_pool(pool: ConnectionPool):
+    """Replace the process-wide connection pool (e.g. to point at another backend)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.dispose()
+        _pool = pool
+
+
+def get_db_connection():
+    """Check a connection out of the shared pool. Closing it returns it to the pool."""
+    try:
+        return get_pool().connect()
+    except mysql.connector.Error as err:
+        print(f"Error connecting to MySQL: {err}")
+        return None
+
+
+def kill_queries(connection_ids):
+    """Stop the statements running on the given connections with KILL QUERY."""
+    if not connection_ids:
+        return
+    # A separate connection outside the pool, which may have no free slot
+    connection = get_pool().creator()
+    try:
+        cursor = connection.cursor()
+        for connection_id in connection_ids:
+            try:
+                cursor.execute(f"KILL QUERY {int(connection_id)}")
+                logger.info(f"Killed query on connection {connection_id}")
+            except mysql.connector.Error as err:
+                # The statement may have finished in the meantime
+                logger.info(f"Could not kill query on connection {connection_id}: {err}")
+        cursor.close()
+    finally:
+        connection.close()
+
+
+_query_executor = ThreadPoolExecutor(max_workers=DB_QUERY_WORKERS, thread_name_prefix="db-query")
+_kill_tasks = set()
+
+
+def _run_tracked(call, func, args, kwargs):
+    if call.cancelled:
+        raise QueryCancelled("Database call was cancelled before it started")
+    token = _current_call.set(call)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current_call.reset(token)
+
+
+async def run_db_call(func, *args, timeout=DB_QUERY_TIMEOUT, **kwargs):
+    """
+    Run a blocking database call on the bounded query worker pool.
+
+    Keeps the event loop free for other sessions while the query runs. If
+    the call exceeds `timeout` seconds (None waits forever) or the awaiting
+    task is cancelled, e.g. because the MCP client cancelled the request or
+    went away, the statements it is running are stopped with KILL QUERY.
+    A timeout raises QueryCancelled.
+    """
+    loop = asyncio.get_running_loop()
+    call = _DbCall()
+    future = loop.run_in_executor(_query_executor, functools.partial(_run_tracked, call, func, args, kwargs))
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        future.cancel()
+        await _kill_call(loop, call)
+        raise QueryCancelled(f"Query cancelled: it ran longer than the {timeout:g}s time limit")
+    except asyncio.CancelledError:
+        future.cancel()
+        # The awaiting task is going away; kill in the background
+        task = asyncio.ensure_future(_kill_call(loop, call))
+        _kill_tasks.add(task)
+        task.add_done_callback(_kill_tasks.discard)
+        raise
+
+
+async def _kill_call(loop, call):
+    try:
+        # Off the query pool, whose workers may all be busy
+        await loop.run_in_executor(None, kill_queries, call.cancel())
+    except Exception as err:
+        logger.warning(f"Failed to kill cancelled query: {err}")
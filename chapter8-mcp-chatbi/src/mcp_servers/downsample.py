@@ -0,0 +1,198 @@
+# src/mcp_servers/downsample.py
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Default point budget of line and scatter charts, 0 disables downsampling
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "5000"))
+
+
+def _as_numeric(values: pd.Series):
+    """Float view of a column for geometry: datetimes as epoch numbers, other non-numerics as None."""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        if isinstance(values.dtype, pd.ArrowDtype):
+            # Arrow dates and timestamps (DATE arrives as date32) as epoch microseconds, NULL as NaN
+            array = pa.Array.from_pandas(values).cast(pa.timestamp("us"), safe=False).cast(pa.int64())
+            return array.to_numpy(zero_copy_only=False).astype(float)
+        return values.astype("int64").to_numpy(dtype=float)
+    if pd.api.types.is_bool_dtype(values.dtype) or not pd.api.types.is_numeric_dtype(values.dtype):
+        return None
+    return values.to_numpy(dtype=float, na_value=np.nan)
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets selection of `n_out` points.
+
+    The first and last points are kept. The rest are split into n_out - 2
+    buckets, and from each the point forming the largest triangle with the
+    point picked from the previous bucket and the mean of the next bucket is
+    kept. Bucket bounds and means are computed for all buckets at once;
+    only the pick itself walks the buckets, since it depends on the
+    previous pick.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+
+    y = np.nan_to_num(y, nan=0.0)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.intp)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Mean of every bucket, via cumulative sums, then shifted: bucket i looks at bucket i + 1
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    next_x = np.append((x_sums[ends] - x_sums[starts]) / counts, x[-1])[1:]
+    next_y = np.append((y_sums[ends] - y_sums[starts]) / counts, y[-1])[1:]
+
+    picked = np.empty(n_out, dtype=np.intp)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = starts[i], ends[i]
+        bx, by = x[start:end], y[start:end]
+        # Twice the triangle area; the constant factor does not change the argmax
+        area = np.abs((x[a] - next_x[i]) * (by - y[a]) - (x[a] - bx) * (next_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def grid_indices(x, y, n_out):
+    """
+    Grid decimation for scatter plots: keep the first point of every occupied
+    cell of a square grid over the x/y extent, using the finest grid that
+    stays within `n_out` points. Outliers and sparse regions survive; dense
+    clusters are thinned.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+
+    def unit(values):
+        """Scale to [0, 1]; NaN goes to the low edge."""
+        values = np.nan_to_num(values, nan=np.nanmin(values) if np.isfinite(values).any() else 0.0)
+        low, high = values.min(), values.max()
+        return (values - low) / (high - low) if high > low else np.zeros_like(values)
+
+    ux, uy = unit(x), unit(y)
+    positions = np.arange(n)
+
+    def cells(size):
+        cell = np.minimum((ux * size).astype(np.int64), size - 1) * size + np.minimum((uy * size).astype(np.int64), size - 1)
+        # Scatter positions in reverse so the first point of a cell is the one kept, no sort needed
+        first = np.full(size * size, -1, dtype=np.int64)
+        first[cell[::-1]] = positions[::-1]
+        return first[first >= 0]
+
+    size = max(1, math.isqrt(n_out))
+    best = cells(size)
+    # Occupied cells are usually far fewer than size ** 2; refine while under budget
+    for _ in range(8):
+        size = int(size * 1.5) + 1
+        finer = cells(size)
+        if len(finer) > n_out:
+            break
+        best = finer
+    return np.sort(best)
+
+
+def group_budgets(sizes, max_points, minimum):
+    """
+    Split a point budget between groups; the budgets never add up to more than `max_points`.
+
+    Every group is first given `minimum` points (or all of its points if it
+    has fewer), largest groups first, as long as the budget lasts; groups
+    left over get 0. The rest of the budget is shared in proportion to size.
+    """
+    sizes = np.asarray(sizes, dtype=np.int64)
+    budgets = np.zeros(len(sizes), dtype=np.int64)
+    left = max_points
+    for i in np.argsort(-sizes, kind="stable"):
+        floor = min(int(sizes[i]), minimum)
+        if floor > left:
+            break
+        budgets[i] = floor
+        left -= floor
+    kept = budgets > 0
+    if left > 0 and kept.any():
+        share = np.floor(left * sizes * kept / sizes[kept].sum()).astype(np.int64)
+        budgets = np.minimum(budgets + share, sizes)
+    return budgets
+
+
+def downsample(df, x_column, y_column, max_points, method, groups=None):
+    """
+    Reduce a frame to at most `max_points` rows for a line or scatter chart.
+
+    With groups (one per trace) the budget is shared between them, see
+    group_budgets, and each is reduced on its own. A line keeps at least
+    2 points per group and a scatter 1; when there are more groups than
+    that allows, the smallest are left out.
+
+    Args:
+        df: Query results
+        x_column: Column name for x-axis
+        y_column: Column name for y-axis
+        max_points: Point budget for the whole chart
+        method: "lttb" (lines) or "grid" (scatter)
+        groups: Optional (order, bounds) from charts.split_by_color
+
+    Returns:
+        (frame, report) where report is None if nothing was dropped
+    """
+    n = len(df)
+    if not max_points or n <= max_points:
+        return df, None
+
+    x = _as_numeric(df[x_column])
+    y = _as_numeric(df[y_column])
+    if y is None:
+        if method == "lttb":
+            return df, None
+        y = pd.factorize(df[y_column])[0].astype(float)
+    if x is None:
+        x = np.arange(n, dtype=float) if method == "lttb" else pd.factorize(df[x_column])[0].astype(float)
+
+    select = lttb_indices if method == "lttb" else grid_indices
+    if groups is not None:
+        order, bounds = groups
+        budgets = group_budgets(np.diff(bounds), max_points, 2 if method == "lttb" else 1)
+        picked = []
+        for start, end, budget in zip(bounds[:-1], bounds[1:], budgets):
+            if budget:
+                rows = order[start:end]
+                picked.append(rows[_select(select, method, x[rows], y[rows], budget)])
+        keep = np.sort(np.concatenate(picked))
+        groups_dropped = int((budgets == 0).sum())
+    else:
+        keep = _select(select, method, x, y, max_points)
+        groups_dropped = 0
+
+    report = {
+        "method": method,
+        "max_points": max_points,
+        "input_points": n,
+        "output_points": len(keep),
+        "ratio": round(len(keep) / n, 6),
+    }
+    if groups_dropped:
+        report["groups_dropped"] = groups_dropped
+    return df.take(keep), report
+
+
+def _select(select, method, x, y, budget):
+    # LTTB needs x in drawing order; fall back to positions if it is not monotonic
+    if method == "lttb" and len(x) > 1 and not (np.diff(x) >= 0).all():
+        x = np.arange(len(x), dtype=float)
+    return select(x, y, budget)
@@ -0,0 +1,136 @@
+# src/mcp_servers/encoding.py
+import base64
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ARROW_FORMAT = "arrow-ipc-stream"
+
+# numpy dtype -> Plotly typed array dtype; Plotly has no 64-bit integers
+TYPED_ARRAY_DTYPES = {
+    "int8": "i1", "uint8": "u1", "int16": "i2", "uint16": "u2",
+    "int32": "i4", "uint32": "u4", "float32": "f4", "float64": "f8",
+}
+
+
+def dumps(obj) -> str:
+    """
+    Serialize to compact JSON, using orjson when available.
+
+    Values JSON cannot represent (Decimal, datetime, bytes, ...) are
+    rendered with str(), matching json.dumps(obj, default=str).
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=str,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        ).decode()
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+
+def loads(payload):
+    """Parse JSON, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def to_columnar(rows, columns) -> list:
+    """Row dicts -> list of value lists in `columns` order."""
+    return [[row.get(col) for col in columns] for row in rows]
+
+
+def rows_to_table(rows, columns):
+    """Row dicts -> pyarrow Table with `columns` in order."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    return pa.Table.from_pylist(list(rows)).select(columns) if rows else pa.table({col: [] for col in columns})
+
+
+def to_arrow_base64(rows, columns) -> str:
+    """Row dicts -> base64 of an Arrow IPC stream holding one record batch."""
+    table = rows_to_table(rows, columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii")
+
+
+def from_arrow_base64(data: str):
+    """Decode a base64 Arrow IPC stream into a pyarrow Table."""
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed")
+    with pa.ipc.open_stream(base64.b64decode(data)) as reader:
+        return reader.read_all()
+
+
+def to_typed_array(values) -> dict:
+    """
+    Numeric numpy array -> Plotly typed array {"dtype", "bdata"}, plus
+    "shape" for 2-D arrays, with bdata the base64 of the little-endian buffer.
+
+    64-bit integers are narrowed to int32 when they fit and sent as float64
+    otherwise.
+    """
+    array = np.asarray(values)
+    code = TYPED_ARRAY_DTYPES.get(array.dtype.name)
+    if code is None:
+        info = np.iinfo(np.int32)
+        if array.dtype.kind in "iu" and (array.size == 0 or (array.min() >= info.min and array.max() <= info.max)):
+            array, code = array.astype(np.int32), "i4"
+        else:
+            array, code = array.astype(np.float64), "f8"
+    data = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<")).tobytes()
+    spec = {"dtype": code, "bdata": base64.b64encode(data).decode("ascii")}
+    if array.ndim > 1:
+        spec["shape"] = ", ".join(str(dim) for dim in array.shape)
+    return spec
+
+
+def is_typed_array(value) -> bool:
+    return isinstance(value, dict) and "bdata" in value and "dtype" in value
+
+
+def from_typed_array(spec):
+    """Decode a Plotly typed array into a numpy array."""
+    array = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=np.dtype(spec["dtype"]).newbyteorder("<"))
+    shape = spec.get("shape")
+    if shape:
+        if isinstance(shape, str):
+            shape = [int(dim) for dim in shape.split(",")]
+        array = array.reshape(shape)
+    return array
+
+
+def decode_result_payload(payload):
+    """
+    Turn any execute_sql_query_json payload back into a list of row dicts.
+
+    Accepts the plain row list, the paged object, the columnar layout and
+    the Arrow layout.
+    """
+    if isinstance(payload, (str, bytes)):
+        payload = loads(payload)
+    if isinstance(payload, list):
+        return payload
+    columns = payload.get("columns", [])
+    if payload.get("format") == ARROW_FORMAT:
+        return from_arrow_base64(payload["data"]).to_pylist()
+    rows = payload.get("rows", [])
+    if rows and isinstance(rows[0], list):
+        return [dict(zip(columns, row)) for row in rows]
+    return rows
@@ -0,0 +1,92 @@
+# src/mcp_servers/frames.py
+import os
+
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+
+from src.mcp_servers.charts import ChartError
+from src.mcp_servers.result_store import read_result_table
+
+# Load environment variables
+load_dotenv()
+
+# Memory budget of the DataFrame behind a chart; loading stops once the rows read exceed it
+CHART_MAX_BYTES = int(os.getenv("CHART_MAX_BYTES", str(256 * 1024 * 1024)))
+CHART_FETCH_CHUNK = int(os.getenv("CHART_FETCH_CHUNK", "50000"))
+
+
+class ResultTooLarge(ChartError):
+    """A chart query returned more data than the CHART_MAX_BYTES budget."""
+
+
+def _too_large(what, max_bytes, rows) -> ResultTooLarge:
+    return ResultTooLarge(
+        f"{what} exceeds the chart memory budget of {max_bytes / (1024 * 1024):g} MB "
+        f"after {rows} rows; aggregate or filter it in SQL"
+    )
+
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    """
+    Convert an Arrow table to an Arrow-backed DataFrame, with DECIMAL columns
+    (SUM and AVG always return one in MySQL) as float64, as pd.read_sql's
+    coerce_float did: decimal.Decimal values are not JSON serializable.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def fetch_frame(cursor, max_bytes=CHART_MAX_BYTES, chunk_size=CHART_FETCH_CHUNK) -> pd.DataFrame:
+    """
+    Stream rows from an unbuffered cursor into an Arrow-backed DataFrame.
+
+    Each chunk of rows is converted to an Arrow record batch right away, so
+    only one chunk of Python objects is alive at a time, and the columns end
+    up as pyarrow dtypes instead of object columns.
+
+    When the batches read so far exceed `max_bytes`, ResultTooLarge is
+    raised with the remaining rows unread; the caller must discard the
+    connection rather than return it to the pool.
+    """
+    columns = [col[0] for col in cursor.description]
+    tables = []
+    size = 0
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        arrays = [pa.array(values) for values in zip(*chunk)]
+        table = pa.Table.from_arrays(arrays, names=columns)
+        size += table.nbytes
+        if size > max_bytes:
+            raise _too_large("Query result", max_bytes, sum(t.num_rows for t in tables) + table.num_rows)
+        tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    # Chunks can infer different types for a column (all-NULL chunks, DECIMAL precision)
+    return _to_frame(pa.concat_tables(tables, promote_options="permissive"))
+
+
+def load_result_frame(result_id, max_bytes=CHART_MAX_BYTES):
+    """
+    Load a result stored by the database server (see result_store.ResultStore)
+    as an Arrow-backed DataFrame.
+
+    Returns:
+        (frame, truncated) where truncated is True if the stored result was
+        cut off at the database server's fetch budget
+    """
+    try:
+        table = read_result_table(result_id)
+    except ValueError as err:
+        raise ChartError(str(err))
+    if table is None:
+        raise ChartError(f"Result '{result_id}' has expired or does not exist; run the query again")
+    if table.nbytes > max_bytes:
+        raise _too_large(f"Result '{result_id}'", max_bytes, table.num_rows)
+    truncated = (table.schema.metadata or {}).get(b"truncated") == b"1"
+    return _to_frame(table), truncated
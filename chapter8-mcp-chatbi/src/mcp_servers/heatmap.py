@@ -0,0 +1,153 @@
+# src/mcp_servers/heatmap.py
+import os
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Numeric heatmap axes with more distinct values than this are binned into this many bins
+HEATMAP_MAX_BINS = int(os.getenv("HEATMAP_MAX_BINS", "50"))
+
+# Categorical heatmap axes keep this many most frequent categories; the rest share OTHER_LABEL
+HEATMAP_TOP_K = int(os.getenv("HEATMAP_TOP_K", "30"))
+
+OTHER_LABEL = "Other"
+
+# Aggregations of the z values falling into one cell, as in pivot_table(aggfunc=...)
+HEATMAP_AGGS = ("sum", "mean", "count", "min", "max")
+
+
+def _is_binnable(values: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype)
+
+
+def _relabel(codes, n_uniques, keep):
+    """Renumber codes so the codes in `keep` become 0, 1, ... and the rest len(keep); -1 stays."""
+    remap = np.full(n_uniques + 1, len(keep), dtype=np.intp)
+    remap[keep] = np.arange(len(keep))
+    remap[-1] = -1
+    return remap[codes]
+
+
+def axis_codes(values: pd.Series, bins, top_k):
+    """
+    Map the values of one heatmap axis to cell positions.
+
+    Axes with few distinct values keep them all, sorted. Beyond that, numeric
+    axes are cut into `bins` equal-width bins labelled by their centers, and
+    other axes keep their `top_k` most frequent values, sorted, followed by
+    an OTHER_LABEL cell for the rest.
+
+    Args:
+        values: The axis column
+        bins: Bin count for numeric axes
+        top_k: Category count for other axes
+
+    Returns:
+        (codes, labels, report): codes[i] is the cell of row i, -1 for
+        missing values; report is None if every distinct value was kept
+    """
+    binnable = _is_binnable(values)
+    # A numeric column whose head already has too many values is binned without
+    # factorizing it, which for millions of distinct floats costs far more than binning
+    if not (binnable and values.iloc[:100000].nunique() > bins):
+        # Factorize unsorted (a hash pass) and only sort the labels that are kept
+        codes, uniques = pd.factorize(values)
+        if len(uniques) <= (bins if binnable else top_k):
+            keep = uniques.argsort()
+            return _relabel(codes, len(uniques), keep), pd.Series(uniques[keep]), None
+
+    if binnable:
+        numeric = values.to_numpy(dtype=float, na_value=np.nan)
+        low, high = float(np.nanmin(numeric)), float(np.nanmax(numeric))
+        width = (high - low) / bins
+        missing = np.isnan(numeric)
+        cells = np.minimum(np.floor((np.where(missing, low, numeric) - low) / width), bins - 1)
+        codes = np.where(missing, -1, cells).astype(np.intp)
+        labels = pd.Series(low + width * (np.arange(bins) + 0.5))
+        return codes, labels, {"method": "bins", "bins": bins, "min": low, "max": high}
+
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    keep = np.argsort(-counts, kind="stable")[:top_k]
+    keep = keep[uniques[keep].argsort()]
+    codes = _relabel(codes, len(uniques), keep)
+    labels = pd.Series(list(uniques[keep]) + [OTHER_LABEL])
+    report = {
+        "method": "top_k",
+        "top_k": top_k,
+        "distinct": len(uniques),
+        "other_rows": int(counts.sum() - counts[keep].sum()),
+    }
+    return codes, labels, report
+
+
+def heatmap_grid(df, x_column, y_column, z_column, agg="sum", bins=None, top_k=None):
+    """
+    Aggregate long-format x/y/z rows into a bounded heatmap matrix.
+
+    Equivalent to df.pivot_table(index=y, columns=x, values=z, aggfunc=agg)
+    after binning or capping the axes (see axis_codes), but computed as a 2D
+    histogram over integer cell codes with np.bincount, so duplicate keys are
+    aggregated and the matrix is at most (bins or top_k + 1) on each side.
+
+    Args:
+        df: Query results
+        x_column: Column for the x-axis (matrix columns)
+        y_column: Column for the y-axis (matrix rows)
+        z_column: Column with the values
+        agg: One of HEATMAP_AGGS
+        bins: Bin count for numeric axes, HEATMAP_MAX_BINS if None
+        top_k: Category count for other axes, HEATMAP_TOP_K if None
+
+    Returns:
+        (z, x_labels, y_labels, report): z is a 2-D float array with NaN
+        for empty cells (integer if z is integer and every cell is filled);
+        report is None if the matrix is the plain pivot of the data
+    """
+    agg = (agg or "sum").lower()
+    if agg not in HEATMAP_AGGS:
+        raise ValueError(f"unsupported aggregation '{agg}', use one of {list(HEATMAP_AGGS)}")
+    bins = HEATMAP_MAX_BINS if bins is None else int(bins)
+    top_k = HEATMAP_TOP_K if top_k is None else int(top_k)
+    if bins < 1 or top_k < 1:
+        raise ValueError("bins and top_k must be positive numbers")
+
+    x_codes, x_labels, x_report = axis_codes(df[x_column], bins, top_k)
+    y_codes, y_labels, y_report = axis_codes(df[y_column], bins, top_k)
+    z_values = df[z_column]
+    if not _is_binnable(z_values):
+        z_values = pd.to_numeric(z_values, errors="coerce")
+    integer = pd.api.types.is_integer_dtype(z_values.dtype)
+    z_values = z_values.to_numpy(dtype=float, na_value=np.nan)
+
+    valid = (x_codes >= 0) & (y_codes >= 0) & ~np.isnan(z_values)
+    width, size = len(x_labels), len(x_labels) * len(y_labels)
+    cells = y_codes[valid] * width + x_codes[valid]
+    z_values = z_values[valid]
+
+    counts = np.bincount(cells, minlength=size)
+    if agg == "count":
+        grid = counts.astype(float)
+    elif agg in ("sum", "mean"):
+        # Weighted bincount of no cells returns integers, which cannot hold NaN
+        grid = np.bincount(cells, weights=z_values, minlength=size).astype(float)
+        if agg == "mean":
+            grid = grid / np.maximum(counts, 1)
+    else:
+        grid = np.full(size, np.nan)
+        reduced = pd.Series(z_values).groupby(cells).agg(agg)
+        grid[reduced.index.to_numpy()] = reduced.to_numpy()
+    grid[counts == 0] = np.nan
+    grid = grid.reshape(len(y_labels), width)
+
+    # Keep integer values integer when nothing is missing, as pivot would
+    if (integer or agg == "count") and agg != "mean" and counts.all():
+        grid = grid.astype(np.int64)
+
+    report = None
+    if x_report or y_report or counts.max(initial=0) > 1:
+        report = {"agg": agg, "input_rows": len(df), "x": x_report, "y": y_report}
+    return grid, x_labels, y_labels, report
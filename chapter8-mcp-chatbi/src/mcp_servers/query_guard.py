@@ -0,0 +1,211 @@
+# src/mcp_servers/query_guard.py
+import json
+import logging
+import os
+import re
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Cost guard settings
+QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() in ("1", "true", "yes")
+QUERY_GUARD_MAX_ROWS = int(os.getenv("QUERY_GUARD_MAX_ROWS", "1000000"))
+# What to do with a query over budget: reject, limit or confirm
+QUERY_GUARD_ACTION = os.getenv("QUERY_GUARD_ACTION", "limit").lower()
+QUERY_GUARD_LIMIT = int(os.getenv("QUERY_GUARD_LIMIT", "1000"))
+# Server-side cap on SELECT run time, 0 disables the hint
+QUERY_MAX_EXECUTION_MS = int(os.getenv("QUERY_MAX_EXECUTION_MS", "30000"))
+
+_SELECT_RE = re.compile(r"^(\s*\(?\s*)SELECT\b(?!\s*/\*\+)", re.IGNORECASE)
+_WITH_RE = re.compile(r"^\s*\(?\s*WITH\b", re.IGNORECASE)
+_FIRST_SELECT_RE = re.compile(r"\bSELECT\b", re.IGNORECASE)
+_EXPLAINABLE_RE = re.compile(r"^\s*\(?\s*(SELECT|WITH)\b", re.IGNORECASE)
+_TRAILING_LIMIT_RE = re.compile(
+    r"\bLIMIT\s+(\d+)(?:\s*(?:,|OFFSET)\s*(\d+))?\s*(?:FOR\s+\w+(?:\s+\w+)*)?\s*;?\s*$",
+    re.IGNORECASE
+)
+
+
+class GuardDecision:
+    """
+    Outcome of checking a query against the cost guard.
+
+    Attributes:
+        action: "allow", "limit", "reject" or "confirm"
+        query: The SQL to execute (rewritten when a LIMIT was appended)
+        estimated_rows: Rows examined according to EXPLAIN, or None if unknown
+        message: Explanation for anything other than "allow"
+    """
+
+    def __init__(self, action, query, estimated_rows=None, message=None):
+        self.action = action
+        self.query = query
+        self.estimated_rows = estimated_rows
+        self.message = message
+
+
+def add_execution_time_hint(query: str, max_execution_ms: int = QUERY_MAX_EXECUTION_MS) -> str:
+    """
+    Add a MAX_EXECUTION_TIME optimizer hint to a SELECT. MySQL takes it
+    after the first SELECT keyword of the statement, which for a WITH
+    statement is the one in the first common table expression.
+    """
+    if max_execution_ms <= 0:
+        return query
+    hint = f"/*+ MAX_EXECUTION_TIME({int(max_execution_ms)}) */"
+    if _WITH_RE.match(query):
+        match = _FIRST_SELECT_RE.search(query)
+        if match is None or query[match.end():].lstrip().startswith("/*+"):
+            return query
+        return f"{query[:match.end()]} {hint}{query[match.end():]}"
+    return _SELECT_RE.sub(rf"\1SELECT {hint}", query, count=1)
+
+
+def trailing_limit(query: str):
+    """Row count of a LIMIT clause ending the statement, or None."""
+    match = _TRAILING_LIMIT_RE.search(query)
+    if not match:
+        return None
+    # "LIMIT offset, count" puts the row count second
+    if match.group(2) is not None and "," in match.group(0):
+        return int(match.group(2))
+    return int(match.group(1))
+
+
+def add_limit(query: str, limit: int) -> str:
+    """Append a LIMIT to a statement, or lower the LIMIT it already ends with."""
+    match = _TRAILING_LIMIT_RE.search(query)
+    if not match:
+        return f"{query.strip().rstrip(';').rstrip()} LIMIT {int(limit)}"
+    if trailing_limit(query) <= limit:
+        return query
+    group = 2 if match.group(2) is not None and "," in match.group(0) else 1
+    return query[:match.start(group)] + str(int(limit)) + query[match.end(group):]
+
+
+def explain(connection, query: str) -> dict:
+    """Run EXPLAIN FORMAT=JSON and return the parsed plan."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN FORMAT=JSON {query}")
+        row = cursor.fetchone()
+        cursor.fetchall()
+    finally:
+        cursor.close()
+    return json.loads(row[0])
+
+
+def estimate_rows_examined(plan) -> int:
+    """
+    Estimate the rows a plan reads.
+
+    In a nested loop every table is scanned once per row produced by the
+    tables before it, so its rows_examined_per_scan is multiplied by the
+    previous table's rows_produced_per_join. Subqueries, unions and derived
+    tables are added on top.
+    """
+    total = 0.0
+
+    def visit_table(table, prefix):
+        nonlocal total
+        examined = float(table.get("rows_examined_per_scan", 0) or 0)
+        total += prefix * examined
+        for key, value in table.items():
+            if key != "rows_examined_per_scan":
+                visit(value, 1.0)
+        return float(table.get("rows_produced_per_join", examined) or 0)
+
+    def visit(node, prefix=1.0):
+        if isinstance(node, list):
+            for item in node:
+                visit(item, prefix)
+        elif isinstance(node, dict):
+            for key, value in node.items():
+                if key == "nested_loop" and isinstance(value, list):
+                    produced = prefix
+                    for item in value:
+                        if isinstance(item, dict) and "table" in item:
+                            produced = visit_table(item["table"], produced) or produced
+                        else:
+                            visit(item, 1.0)
+                elif key == "table" and isinstance(value, dict):
+                    visit_table(value, prefix)
+                else:
+                    visit(value, 1.0)
+
+    visit(plan)
+    return int(total)
+
+
+def _needs_full_pass(plan) -> bool:
+    """Whether the plan sorts, groups or materializes, so a LIMIT cannot stop the scan early."""
+    text = json.dumps(plan)
+    return any(flag in text for flag in (
+        '"using_filesort": true',
+        '"using_temporary_table": true',
+        '"grouping_operation"',
+        '"duplicates_removal"',
+        '"materialized_from_subquery"',
+        '"union_result"',
+    ))
+
+
+def check_query(connection, query: str, max_rows=QUERY_GUARD_MAX_ROWS, action=QUERY_GUARD_ACTION,
+                limit=QUERY_GUARD_LIMIT) -> GuardDecision:
+    """
+    Check a read query's EXPLAIN estimate against the row budget.
+
+    Args:
+        connection: Open database connection
+        query: SQL written by the agent
+        max_rows: Largest acceptable estimate of rows examined
+        action: What to do when over budget: "reject", "limit" or "confirm"; "limit"
+            falls back to "confirm" for plans a LIMIT cannot stop early
+        limit: Row count appended when action is "limit"
+
+    Returns:
+        A GuardDecision
+    """
+    if not QUERY_GUARD_ENABLED or not _EXPLAINABLE_RE.match(query):
+        return GuardDecision("allow", query)
+
+    try:
+        plan = explain(connection, query)
+    except Exception as err:
+        # Let the query itself report syntax or permission errors
+        logger.info(f"EXPLAIN failed, skipping cost guard: {err}")
+        return GuardDecision("allow", query)
+
+    estimated = estimate_rows_examined(plan)
+    existing_limit = trailing_limit(query)
+    if estimated <= max_rows or (existing_limit is not None and existing_limit <= limit
+                                 and not _needs_full_pass(plan)):
+        return GuardDecision("allow", query, estimated)
+
+    budget = f"EXPLAIN estimates ~{estimated:,} rows examined, above the limit of {max_rows:,}"
+    if action == "reject":
+        return GuardDecision("reject", query, estimated, (
+            f"Query rejected by the cost guard: {budget}. Add selective filters on indexed columns, "
+            "aggregate in SQL, or query a smaller date range."
+        ))
+    if action == "confirm":
+        return GuardDecision("confirm", query, estimated, (
+            f"Query needs confirmation: {budget}. Ask the user whether to run it anyway, then call "
+            "the tool again with confirm=true."
+        ))
+    if _needs_full_pass(plan):
+        # MySQL reads every row before it applies a LIMIT, which would only cut a complete result short
+        return GuardDecision("confirm", query, estimated, (
+            f"Query needs confirmation: {budget}, and it groups, sorts or removes duplicates, so a "
+            "LIMIT would not make it cheaper. Add selective filters on indexed columns, or ask the "
+            "user whether to run it anyway, then call the tool again with confirm=true."
+        ))
+    limited = add_limit(query, limit)
+    return GuardDecision("limit", limited, estimated, (
+        f"The cost guard appended LIMIT {limit}: {budget}. Results may be incomplete; narrow the "
+        "query, or call again with confirm=true to run it unmodified."
+    ))
@@ -0,0 +1,291 @@
+# src/mcp_servers/result_cache.py
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from src.mcp_servers.db_pool import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Result cache settings
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+# How often a cached entry re-checks information_schema.TABLES.UPDATE_TIME.
+# MySQL 8 only reports a current UPDATE_TIME when the session's
+# information_schema_stats_expiry is 0, which pooled connections set (see
+# DB_STATS_EXPIRY in db_pool); with the server default of 86400 s external
+# writes go unnoticed and only RESULT_CACHE_TTL bounds staleness.
+RESULT_CACHE_VALIDATE_INTERVAL = float(os.getenv("RESULT_CACHE_VALIDATE_INTERVAL", "5"))
+
+_LITERAL_RE = re.compile(r"('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+_COMMENT_RE = re.compile(r"/\*(?!\+).*?\*/|--[^\n]*|#[^\n]*", re.DOTALL)
+_WHITESPACE_RE = re.compile(r"\s+")
+_TABLE_RE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO|TABLE)\s+`?(\w+)`?(?:\s*\.\s*`?(\w+)`?)?",
+    re.IGNORECASE
+)
+_READ_RE = re.compile(r"^\s*\(?\s*(SELECT|WITH)\b", re.IGNORECASE)
+_VOLATILE_RE = re.compile(
+    r"\b(NOW|SYSDATE|CURDATE|CURTIME|RAND|UUID|UUID_SHORT|UNIX_TIMESTAMP|LAST_INSERT_ID|"
+    r"FOUND_ROWS|ROW_COUNT|CONNECTION_ID|SLEEP|GET_LOCK)\s*\(|"
+    r"\b(CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP)\b|"
+    r"\bFOR\s+UPDATE\b|\bINTO\s+(OUTFILE|DUMPFILE|@)",
+    re.IGNORECASE
+)
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normalize a SQL statement into a cache key.
+
+    Comments are stripped, whitespace collapsed, a trailing semicolon dropped
+    and everything outside string literals and quoted identifiers lower-cased.
+    """
+    parts = _LITERAL_RE.split(query)
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            normalized.append(part)
+        else:
+            part = _COMMENT_RE.sub(" ", part)
+            normalized.append(_WHITESPACE_RE.sub(" ", part).lower())
+    return "".join(normalized).strip().rstrip(";").strip()
+
+
+def referenced_tables(query: str) -> frozenset:
+    """Best-effort set of table names a statement reads or writes."""
+    tables = set()
+    for first, second in _TABLE_RE.findall(_LITERAL_RE.sub("''", query)):
+        tables.add((second or first).lower())
+    return frozenset(tables)
+
+
+def is_cacheable(query: str) -> bool:
+    """Whether a statement is a deterministic read whose result may be cached."""
+    return bool(_READ_RE.match(query)) and not _VOLATILE_RE.search(query)
+
+
+def fetch_table_versions(connection, tables) -> dict:
+    """Read UPDATE_TIME for the given tables of the current database."""
+    if not tables:
+        return {}
+    cursor = connection.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(tables))
+        cursor.execute(
+            "SELECT TABLE_NAME, UPDATE_TIME FROM information_schema.TABLES "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})",
+            tuple(sorted(tables))
+        )
+        return {str(name).lower(): update_time for name, update_time in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def load_table_versions(tables) -> dict:
+    """Read UPDATE_TIME for the given tables on a pooled connection."""
+    connection = get_db_connection()
+    if not connection:
+        raise ConnectionError("Failed to connect to the database")
+    try:
+        return fetch_table_versions(connection, tables)
+    finally:
+        connection.close()
+
+
+def estimate_size(rows) -> int:
+    """Rough in-memory size of a list of row dicts, in bytes."""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class _Entry:
+    __slots__ = ("rows", "size", "expires_at", "tables", "versions", "validated_at", "rendered")
+
+    def __init__(self, rows, size, expires_at, tables, versions):
+        self.rows = rows
+        self.size = size
+        self.expires_at = expires_at
+        self.tables = tables
+        self.versions = versions
+        self.validated_at = time.monotonic()
+        self.rendered = {}
+
+
+class QueryResultCache:
+    """
+    LRU cache of SELECT results keyed on normalized SQL.
+
+    Entries are bounded by total estimated size, expire after `ttl` seconds,
+    and are dropped when a write touches one of their tables or when the
+    tables' UPDATE_TIME moves (which requires information_schema_stats_expiry
+    = 0 on the connections reading it, see DB_STATS_EXPIRY).
+
+    Args:
+        max_bytes: Upper bound on the estimated size of all cached results
+        ttl: Seconds an entry stays valid
+        validate_interval: Seconds between UPDATE_TIME checks for an entry
+        version_loader: Callable mapping a set of tables to their UPDATE_TIME
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL,
+                 validate_interval=RESULT_CACHE_VALIDATE_INTERVAL, version_loader=load_table_versions):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.validate_interval = validate_interval
+        self.version_loader = version_loader
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, query: str):
+        """Return cached rows for a query, or None on a miss."""
+        key = normalize_sql(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            needs_validation = (
+                entry.versions is not None
+                and time.monotonic() - entry.validated_at >= self.validate_interval
+            )
+
+        if needs_validation and not self._still_valid(entry):
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+                    self._stats["invalidations"] += 1
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return entry.rows
+
+    def _still_valid(self, entry) -> bool:
+        try:
+            current = self.version_loader(entry.tables)
+        except Exception as err:
+            logger.info(f"Could not validate cached result: {err}")
+            return False
+        if current != entry.versions:
+            return False
+        entry.validated_at = time.monotonic()
+        return True
+
+    def put(self, query: str, rows, tables=None, versions=None):
+        """
+        Cache the rows of a query.
+
+        Args:
+            query: SQL statement the rows came from
+            rows: List of row dicts
+            tables: Tables the statement reads; defaults to those found in the SQL
+            versions: UPDATE_TIME of those tables read before the query ran,
+                or None when it could not be determined
+        """
+        size = estimate_size(rows)
+        # One result may not take more than an eighth of the cache
+        if size > self.max_bytes // 8:
+            return
+
+        key = normalize_sql(query)
+        tables = referenced_tables(query) if tables is None else frozenset(tables)
+        entry = _Entry(rows, size, time.monotonic() + self.ttl, tables, versions)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def get_rendered(self, query: str, fmt: str):
+        """Return a previously rendered form of a cached result, if any."""
+        with self._lock:
+            entry = self._entries.get(normalize_sql(query))
+            if entry is None or entry.expires_at <= time.monotonic():
+                return None
+            return entry.rendered.get(fmt)
+
+    def set_rendered(self, query: str, fmt: str, rendered, size=None):
+        """Attach a rendered form (e.g. formatted text) to a cached result."""
+        size = sys.getsizeof(rendered) if size is None else size
+        with self._lock:
+            entry = self._entries.get(normalize_sql(query))
+            if entry is None or fmt in entry.rendered:
+                return
+            entry.rendered[fmt] = rendered
+            entry.size += size
+            self._bytes += size
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that reads one of the given tables."""
+        tables = {table.lower() for table in tables}
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.tables & tables]
+            for key in stale:
+                self._remove(key)
+            self._stats["invalidations"] += len(stale)
+
+    def invalidate_for_write(self, query: str):
+        """Drop entries affected by a write; everything if its tables are unknown."""
+        tables = referenced_tables(query)
+        if tables:
+            self.invalidate_tables(tables)
+        else:
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self) -> dict:
+        """Snapshot of cache counters."""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                **self._stats,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
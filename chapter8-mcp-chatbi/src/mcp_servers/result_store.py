@@ -0,0 +1,367 @@
+# src/mcp_servers/result_store.py
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+
+from src.mcp_servers.encoding import rows_to_table
+from src.mcp_servers.result_cache import estimate_size
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Fetch budget: a SELECT stops streaming rows once either limit is reached
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "100000"))
+QUERY_MAX_BYTES = int(os.getenv("QUERY_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_FETCH_CHUNK = int(os.getenv("QUERY_FETCH_CHUNK", "1000"))
+
+# Paging of tool responses
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "100"))
+QUERY_PAGE_MAX_BYTES = int(os.getenv("QUERY_PAGE_MAX_BYTES", str(32 * 1024)))
+
+# Result handles kept for paging
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESULT_STORE_TTL = float(os.getenv("RESULT_STORE_TTL", "1800"))
+
+# Stored results (those paged by the database tools) are also written as
+# Parquet files to this directory, shared with the visualization server so it
+# can chart a result by its result_id.
+# Results larger than RESULT_SPILL_BYTES are kept only on disk.
+RESULT_STORE_DIR = os.getenv("RESULT_STORE_DIR", os.path.join(tempfile.gettempdir(), "chatbi-results"))
+RESULT_SPILL_BYTES = int(os.getenv("RESULT_SPILL_BYTES", str(16 * 1024 * 1024)))
+RESULT_STORE_DISK_BYTES = int(os.getenv("RESULT_STORE_DISK_BYTES", str(1024 * 1024 * 1024)))
+# Seconds between sweeps of expired and excess result files; the directory may
+# go over RESULT_STORE_DISK_BYTES by the files written in between
+RESULT_STORE_SWEEP_INTERVAL = float(os.getenv("RESULT_STORE_SWEEP_INTERVAL", "30"))
+
+_RESULT_ID = re.compile(r"[0-9a-f]{12}")
+
+
+class ResultSet(list):
+    """
+    Rows of a SELECT, as a list of dicts, plus how they were fetched.
+
+    Attributes:
+        columns: Column names in select order
+        truncated: True if the fetch budget stopped the stream early
+        size: Estimated in-memory size of the rows in bytes
+        notice: Message for the caller about how the query was run, if any
+    """
+
+    def __init__(self, rows=(), columns=(), truncated=False, size=None, notice=None):
+        super().__init__(rows)
+        self.columns = list(columns)
+        self.truncated = truncated
+        self.size = estimate_size(self) if size is None else size
+        self.notice = notice
+
+
+def fetch_result_set(cursor, max_rows=QUERY_MAX_ROWS, max_bytes=QUERY_MAX_BYTES,
+                     chunk_size=QUERY_FETCH_CHUNK) -> ResultSet:
+    """
+    Stream rows from an unbuffered cursor until the result or the budget ends.
+
+    When the budget is hit the remaining rows are left unread; the caller
+    must discard the connection rather than return it to the pool.
+    """
+    rows = []
+    size = 0
+    truncated = False
+    while True:
+        chunk = cursor.fetchmany(min(chunk_size, max_rows - len(rows) + 1))
+        if not chunk:
+            break
+        rows.extend(chunk)
+        size += estimate_size(chunk)
+        if len(rows) > max_rows or size > max_bytes:
+            truncated = True
+            del rows[max_rows:]
+            break
+    columns = [col[0] for col in cursor.description or ()]
+    return ResultSet(rows, columns, truncated, size)
+
+
+def make_page_token(result_id: str, offset: int) -> str:
+    return f"{result_id}:{offset}"
+
+
+def parse_page_token(page_token: str):
+    """Split a page token into (result_id, offset)."""
+    result_id, _, offset = page_token.rpartition(":")
+    if not result_id or not offset.isdigit():
+        raise ValueError(f"Invalid page token '{page_token}'")
+    return result_id, int(offset)
+
+
+def page_bounds(rows, offset, page_size, render, max_bytes=QUERY_PAGE_MAX_BYTES):
+    """
+    Render rows[offset:offset + page_size], shrinking the page until it fits
+    in `max_bytes`. Returns (rendered, end offset).
+    """
+    end = min(offset + page_size, len(rows))
+    rendered = render(rows[offset:end])
+    while len(rendered.encode()) > max_bytes and end - offset > 1:
+        end = offset + max(1, (end - offset) // 2)
+        rendered = render(rows[offset:end])
+    return rendered, end
+
+
+def result_path(result_id: str, directory=RESULT_STORE_DIR) -> str:
+    """Path of the Parquet file of a result; ValueError for a malformed result_id."""
+    if not isinstance(result_id, str) or not _RESULT_ID.fullmatch(result_id):
+        raise ValueError(f"Invalid result_id '{result_id}'")
+    return os.path.join(directory, f"{result_id}.parquet")
+
+
+def write_result_file(result_id, query, result, directory=RESULT_STORE_DIR) -> int:
+    """
+    Write a result set to its Parquet file, with the query and truncated
+    flag as file metadata. Returns the file size in bytes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    table = rows_to_table(result, result.columns).replace_schema_metadata({
+        "query": query,
+        "truncated": "1" if result.truncated else "0",
+    })
+    path = result_path(result_id, directory)
+    partial = f"{path}.{uuid.uuid4().hex[:6]}.partial"
+    pq.write_table(table, partial)
+    # Readers only ever see complete files
+    os.replace(partial, path)
+    return os.path.getsize(path)
+
+
+def read_result_table(result_id, directory=RESULT_STORE_DIR, ttl=RESULT_STORE_TTL):
+    """
+    Read a stored result as a pyarrow Table, or None if it does not exist or has expired.
+
+    The table's schema metadata holds b"query" and b"truncated".
+    """
+    path = result_path(result_id, directory)
+    try:
+        if os.path.getmtime(path) + ttl <= time.time():
+            return None
+        return pq.read_table(path)
+    except FileNotFoundError:
+        return None
+
+
+def sweep_result_files(directory=RESULT_STORE_DIR, ttl=RESULT_STORE_TTL, max_bytes=RESULT_STORE_DISK_BYTES):
+    """Delete expired result files, then the oldest ones until the rest fit in `max_bytes`."""
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".parquet")]
+    except FileNotFoundError:
+        return
+    now = time.time()
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime + ttl <= now:
+            _unlink(entry.path)
+        else:
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        _unlink(path)
+        total -= size
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _Handle:
+    __slots__ = ("query", "result", "expires_at", "on_disk", "columns", "truncated")
+
+    def __init__(self, query, result, expires_at, on_disk, spilled=False):
+        self.query = query
+        # None once the rows live only in the result file
+        self.result = None if spilled else result
+        self.expires_at = expires_at
+        self.on_disk = on_disk
+        self.columns = result.columns
+        self.truncated = result.truncated
+
+
+class ResultStore:
+    """
+    Bounded LRU store of result sets addressed by result_id.
+
+    Lets a tool return the first page of a large result and serve later pages
+    without running the query again. Each result is also written to a
+    Parquet file in `directory`, where the visualization server reads it by
+    result_id. Results over `spill_bytes`, and results evicted from memory,
+    are then served from that file.
+
+    Args:
+        max_bytes: Upper bound on the estimated size of the results held in memory
+        ttl: Seconds a result stays available
+        directory: Shared directory of result files, None to keep results in memory only
+        spill_bytes: Results larger than this are kept only on disk
+        sweep_interval: Seconds between sweeps of the result files after a write
+    """
+
+    def __init__(self, max_bytes=RESULT_STORE_MAX_BYTES, ttl=RESULT_STORE_TTL, directory=RESULT_STORE_DIR,
+                 spill_bytes=RESULT_SPILL_BYTES, sweep_interval=RESULT_STORE_SWEEP_INTERVAL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.spill_bytes = spill_bytes
+        self.sweep_interval = sweep_interval
+        self._swept_at = None
+
+        self._lock = threading.Lock()
+        self._handles = OrderedDict()
+        self._ids = {}  # id(result set) -> result_id
+        self._bytes = 0
+        self._stats = {"stored": 0, "pages_served": 0, "evictions": 0, "expired_lookups": 0,
+                       "files_written": 0, "file_errors": 0, "spilled": 0, "disk_reads": 0, "sweeps": 0}
+
+    def put(self, query: str, result: ResultSet) -> str:
+        """Store a result set and return its result_id. Writes the result file, so call it off the event loop."""
+        with self._lock:
+            # A cached result set handed out again keeps its existing handle
+            result_id = self._ids.get(id(result))
+            if result_id is not None:
+                handle = self._handles[result_id]
+                handle.expires_at = time.monotonic() + self.ttl
+                self._handles.move_to_end(result_id)
+                if handle.on_disk:
+                    # Keep the file alive as long as the handle
+                    self._touch(result_id)
+                return result_id
+
+        result_id = uuid.uuid4().hex[:12]
+        on_disk = self._write(result_id, query, result)
+
+        with self._lock:
+            spill = on_disk and result.size > self.spill_bytes
+            self._handles[result_id] = _Handle(query, result, time.monotonic() + self.ttl, on_disk, spill)
+            self._stats["stored"] += 1
+            if spill:
+                self._stats["spilled"] += 1
+            else:
+                self._ids[id(result)] = result_id
+                self._bytes += result.size
+            self._evict()
+        return result_id
+
+    def get(self, result_id: str):
+        """
+        Return (query, result set) for a result_id, or None if unknown or expired.
+
+        A result kept only on disk is read back from its file, so call it off
+        the event loop.
+        """
+        with self._lock:
+            handle = self._handles.get(result_id)
+            if handle is None:
+                return None
+            if handle.expires_at <= time.monotonic():
+                self._remove(result_id)
+                self._stats["expired_lookups"] += 1
+                return None
+            self._handles.move_to_end(result_id)
+            self._stats["pages_served"] += 1
+            if handle.result is not None:
+                return handle.query, handle.result
+            self._stats["disk_reads"] += 1
+
+        table = read_result_table(result_id, self.directory, self.ttl)
+        if table is None:
+            with self._lock:
+                if result_id in self._handles:
+                    self._remove(result_id)
+                self._stats["expired_lookups"] += 1
+            return None
+        rows = table.to_pylist()
+        return handle.query, ResultSet(rows, handle.columns, handle.truncated, size=0)
+
+    def metrics(self) -> dict:
+        """Snapshot of store counters."""
+        with self._lock:
+            return {
+                "results": len(self._handles),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "directory": self.directory,
+                **self._stats,
+            }
+
+    def _write(self, result_id, query, result) -> bool:
+        if not self.directory:
+            return False
+        try:
+            write_result_file(result_id, query, result, self.directory)
+        except Exception as err:
+            logger.warning(f"Could not write result file for {result_id}: {err}")
+            with self._lock:
+                self._stats["file_errors"] += 1
+            return False
+
+        # Listing the directory costs more than writing a small result, so sweep now and then
+        now = time.monotonic()
+        with self._lock:
+            self._stats["files_written"] += 1
+            sweep = self._swept_at is None or now - self._swept_at >= self.sweep_interval
+            if sweep:
+                self._swept_at = now
+                self._stats["sweeps"] += 1
+        if sweep:
+            try:
+                sweep_result_files(self.directory, self.ttl)
+            except Exception as err:
+                logger.warning(f"Could not sweep result files: {err}")
+        return True
+
+    def _touch(self, result_id):
+        try:
+            os.utime(result_path(result_id, self.directory))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Free memory down to max_bytes: results with a file are spilled, others dropped."""
+        now = time.monotonic()
+        for result_id in [rid for rid, handle in self._handles.items() if handle.expires_at <= now]:
+            self._remove(result_id)
+        for result_id in list(self._handles):
+            if self._bytes <= self.max_bytes or len(self._handles) <= 1:
+                break
+            handle = self._handles[result_id]
+            if handle.result is None:
+                continue
+            if handle.on_disk:
+                self._release(handle)
+                self._stats["spilled"] += 1
+            else:
+                self._remove(result_id)
+            self._stats["evictions"] += 1
+
+    def _release(self, handle):
+        """Drop a handle's rows from memory."""
+        self._ids.pop(id(handle.result), None)
+        self._bytes -= handle.result.size
+        handle.result = None
+
+    def _remove(self, result_id):
+        handle = self._handles.pop(result_id)
+        if handle.result is not None:
+            self._release(handle)
@@ -0,0 +1,299 @@
+# src/mcp_servers/schema_catalog.py
+import logging
+import os
+import re
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from src.mcp_servers.db_pool import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Schema catalog settings
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "600"))
+SCHEMA_CHECK_INTERVAL = float(os.getenv("SCHEMA_CHECK_INTERVAL", "30"))
+
+# Table statistics settings
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "60"))
+STATS_COUNT_TIMEOUT = float(os.getenv("STATS_COUNT_TIMEOUT", "10"))
+STATS_COUNT_CONCURRENCY = int(os.getenv("STATS_COUNT_CONCURRENCY", "4"))
+
+# MySQL error raised when MAX_EXECUTION_TIME interrupts a statement
+ER_QUERY_TIMEOUT = 3024
+
+_DDL_RE = re.compile(r"^\s*(CREATE|ALTER|DROP|RENAME|TRUNCATE)\b", re.IGNORECASE)
+
+# Every column of the current database with its table's row estimate and
+# any foreign key it takes part in, in a single round trip
+CATALOG_QUERY = """
+SELECT c.TABLE_NAME, c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE, c.COLUMN_KEY,
+       c.COLUMN_DEFAULT, t.TABLE_TYPE, t.TABLE_ROWS,
+       k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME
+FROM information_schema.COLUMNS c
+JOIN information_schema.TABLES t
+  ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+LEFT JOIN information_schema.KEY_COLUMN_USAGE k
+  ON k.TABLE_SCHEMA = c.TABLE_SCHEMA AND k.TABLE_NAME = c.TABLE_NAME
+ AND k.COLUMN_NAME = c.COLUMN_NAME AND k.REFERENCED_TABLE_NAME IS NOT NULL
+WHERE c.TABLE_SCHEMA = DATABASE()
+ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+# Cheap fingerprint of the column definitions, used to detect DDL
+FINGERPRINT_QUERY = """
+SELECT COUNT(*),
+       COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY))), 0)
+FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = DATABASE()
+"""
+
+# Row estimates and on-disk sizes maintained by the storage engine
+TABLE_SIZES_QUERY = """
+SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH
+FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+ORDER BY TABLE_NAME
+"""
+
+
+def is_ddl(query: str) -> bool:
+    """Whether a statement changes the schema."""
+    return bool(_DDL_RE.match(query))
+
+
+def _fetch(query: str):
+    connection = get_db_connection()
+    if not connection:
+        raise ConnectionError("Failed to connect to the database")
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+def build_catalog(rows) -> dict:
+    """Group CATALOG_QUERY rows into {table: {type, rows, columns, primary_key, foreign_keys}}."""
+    tables = {}
+    for (table_name, column_name, column_type, is_nullable, column_key,
+         default, table_type, table_rows, ref_table, ref_column) in rows:
+        table = tables.setdefault(table_name, {
+            "type": "view" if table_type == "VIEW" else "table",
+            "rows": table_rows,
+            "columns": [],
+            "primary_key": [],
+            "foreign_keys": {},
+        })
+        if not table["columns"] or table["columns"][-1]["name"] != column_name:
+            table["columns"].append({
+                "name": column_name,
+                "type": column_type.decode() if isinstance(column_type, bytes) else column_type,
+                "nullable": is_nullable == "YES",
+                "key": column_key,
+                "default": default,
+            })
+            if column_key == "PRI":
+                table["primary_key"].append(column_name)
+        if ref_table:
+            table["foreign_keys"][column_name] = f"{ref_table}.{ref_column}"
+    return tables
+
+
+def render_catalog(tables: dict) -> str:
+    """Render the catalog compactly: one line per table."""
+    lines = [f"Database schema ({len(tables)} tables):"]
+    for table_name, table in tables.items():
+        header = table_name
+        if table["type"] == "view":
+            header += " [view]"
+        elif table["rows"] is not None:
+            header += f" (~{table['rows']} rows)"
+
+        columns = []
+        for col in table["columns"]:
+            col_desc = f"{col['name']} {col['type']}"
+            if col["name"] in table["primary_key"]:
+                col_desc += " PK"
+            if col["name"] in table["foreign_keys"]:
+                col_desc += f" FK->{table['foreign_keys'][col['name']]}"
+            if not col["nullable"] and col["name"] not in table["primary_key"]:
+                col_desc += " NN"
+            columns.append(col_desc)
+        lines.append(f"- {header}: {', '.join(columns)}")
+    return "\n".join(lines)
+
+
+class SchemaCatalog:
+    """
+    Cached snapshot of the database schema built from information_schema.
+
+    The snapshot is rebuilt when it is older than `ttl`, when invalidate() is
+    called after DDL, or when the background refresher sees the column
+    fingerprint change.
+
+    Args:
+        ttl: Seconds after which the snapshot is rebuilt regardless of changes
+        check_interval: Seconds between background DDL fingerprint checks
+    """
+
+    def __init__(self, ttl=SCHEMA_CACHE_TTL, check_interval=SCHEMA_CHECK_INTERVAL):
+        self.ttl = ttl
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._tables = None
+        self._rendered = None
+        self._fingerprint = None
+        self._loaded_at = 0.0
+        self._refresher = None
+        self._stats = {"refreshes": 0, "hits": 0, "ddl_detected": 0}
+
+    def get(self) -> dict:
+        """Return the catalog, rebuilding it if stale."""
+        with self._lock:
+            if self._tables is not None and time.monotonic() - self._loaded_at < self.ttl:
+                self._stats["hits"] += 1
+                return self._tables
+        return self.refresh()
+
+    def render(self) -> str:
+        """Return the compact text form of the catalog."""
+        tables = self.get()
+        with self._lock:
+            if self._rendered is None or self._tables is not tables:
+                self._rendered = render_catalog(tables)
+            return self._rendered
+
+    def refresh(self) -> dict:
+        """Rebuild the catalog from information_schema."""
+        fingerprint = tuple(_fetch(FINGERPRINT_QUERY)[0])
+        tables = build_catalog(_fetch(CATALOG_QUERY))
+        with self._lock:
+            self._tables = tables
+            self._rendered = None
+            self._fingerprint = fingerprint
+            self._loaded_at = time.monotonic()
+            self._stats["refreshes"] += 1
+        logger.info(f"Schema catalog refreshed: {len(tables)} tables")
+        return tables
+
+    def refresh_if_changed(self):
+        """Rebuild the catalog if the column fingerprint moved since the last load."""
+        if self._tables is None:
+            return
+        fingerprint = tuple(_fetch(FINGERPRINT_QUERY)[0])
+        if fingerprint != self._fingerprint:
+            with self._lock:
+                self._stats["ddl_detected"] += 1
+            self.refresh()
+
+    def invalidate(self):
+        """Force a rebuild on next access, e.g. after DDL."""
+        with self._lock:
+            self._tables = None
+            self._rendered = None
+
+    def start_background_refresh(self):
+        """Warm the catalog and poll for DDL every `check_interval` seconds."""
+        if self._refresher is not None:
+            return
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as err:
+                logger.warning(f"Could not warm schema catalog: {err}")
+            while True:
+                time.sleep(self.check_interval)
+                try:
+                    self.refresh_if_changed()
+                except Exception as err:
+                    logger.warning(f"Schema catalog check failed: {err}")
+
+        self._refresher = threading.Thread(target=run, name="schema-catalog", daemon=True)
+        self._refresher.start()
+
+    def metrics(self) -> dict:
+        """Snapshot of catalog counters."""
+        with self._lock:
+            return {
+                "tables": len(self._tables) if self._tables is not None else None,
+                "age_s": round(time.monotonic() - self._loaded_at, 1) if self._tables is not None else None,
+                **self._stats,
+            }
+
+
+def fetch_table_sizes():
+    """Estimated rows and data/index bytes of every base table, from information_schema."""
+    return [tuple(row) for row in _fetch(TABLE_SIZES_QUERY)]
+
+
+def count_table_rows(table_name: str, timeout: float = STATS_COUNT_TIMEOUT):
+    """
+    Count the rows of a table exactly.
+
+    The statement carries a MAX_EXECUTION_TIME hint so the server gives up
+    after `timeout` seconds; None is returned in that case.
+    """
+    connection = get_db_connection()
+    if not connection:
+        raise ConnectionError("Failed to connect to the database")
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout * 1000)}) */ COUNT(*) "
+                f"FROM `{table_name.replace('`', '``')}`"
+            )
+            return cursor.fetchone()[0]
+        except Exception as err:
+            if getattr(err, "errno", None) == ER_QUERY_TIMEOUT:
+                return None
+            raise
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+def format_bytes(size) -> str:
+    """Human-readable byte count."""
+    size = float(size or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class StatsCache:
+    """Tiny TTL cache for rendered table statistics."""
+
+    def __init__(self, ttl=STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -3,70 +3,136 @@ import asyncio
 import json
 import logging
 import os
+import time
+from collections import Counter
 
 import mysql.connector
-import pandas as pd
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 
+from src.mcp_servers.aggregation import chart_aggregate_frame, chart_aggregate_query
+from src.mcp_servers.charts import (
+    ChartError,
+    bar_chart,
+    build_chart,
+    heatmap_chart,
+    line_chart,
+    pie_chart,
+    scatter_chart,
+)
+from src.mcp_servers.db_pool import QueryCancelled, get_db_connection, get_pool, run_db_call
+from src.mcp_servers.frames import fetch_frame, load_result_frame
+
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize MCP server
-mcp = FastMCP("Visualization Provider", port=8003)
-
-# Database connection settings
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "root")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "88888888")
-DB_NAME = os.getenv("DB_NAME", "chatbi")
-DB_PORT = os.getenv("DB_PORT", "3306")
+# Default time limit in seconds for the query behind each chart. A statement
+# still running when the limit expires, or when the client cancels the tool
+# call, is stopped with KILL QUERY.
+CHART_QUERY_TIMEOUT = float(os.getenv("CHART_QUERY_TIMEOUT", "60"))
 
+# Number of distinct dashboard queries run at the same time. Each holds a pool
+# connection and a query worker while it runs, so keep it at or below DB_POOL_SIZE.
+DASHBOARD_QUERY_CONCURRENCY = int(os.getenv("DASHBOARD_QUERY_CONCURRENCY", "8"))
 
-def get_db_connection():
-    """Create a connection to the MySQL database."""
-    try:
-        connection = mysql.connector.connect(
-            host=DB_HOST,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            database=DB_NAME,
-            port=DB_PORT
-        )
-        return connection
-    except mysql.connector.Error as err:
-        print(f"Error connecting to MySQL: {err}")
-        return None
+# Initialize MCP server
+mcp = FastMCP("Visualization Provider", port=8003)
 
 
 def execute_query(query: str):
-    """Execute a SQL query and return the results as a pandas DataFrame."""
+    """
+    Execute a SQL query and return the results as an Arrow-backed pandas DataFrame.
+
+    Rows are streamed in chunks of CHART_FETCH_CHUNK; ResultTooLarge is
+    raised once they exceed CHART_MAX_BYTES.
+    """
     connection = get_db_connection()
     if not connection:
         return None
 
+    cursor = None
+    complete = False
     try:
-        return pd.read_sql(query, connection)
+        cursor = connection.cursor()
+        cursor.execute(query)
+        if not cursor.description:
+            complete = True
+            return None
+        df = fetch_frame(cursor)
+        complete = True
+        return df
     except mysql.connector.Error as err:
         print(f"Error executing query: {err}")
         return None
     finally:
-        if connection.is_connected():
+        if not complete:
+            # Rows may still be on the wire; drop the connection rather than drain it
+            connection.discard()
+        else:
+            if cursor is not None and connection.is_connected():
+                cursor.close()
             connection.close()
 
 
+def truncated_notice(rows) -> str:
+    return (f"Built from the first {rows} rows only: the stored result was cut off at the "
+            "database server's fetch budget")
+
+
+async def load_chart_data(chart_type, query=None, result_id=None, params=None):
+    """
+    Load the DataFrame behind a chart and apply a bar or pie aggregation.
+
+    With result_id the result stored by the database server is read and
+    aggregated in pandas, without touching the database. Otherwise the
+    aggregation is pushed down into the query, which is then run.
+
+    Args:
+        chart_type: Chart type, used to pick the aggregation
+        query: SQL query to execute
+        result_id: result_id returned by the database tools, used instead of query
+        params: Chart parameters, including agg, measure and top_k
+
+    Returns:
+        (frame or None, extras) where extras holds the "aggregation" and
+        "notice" entries to add to the chart
+    """
+    extras = {}
+    if result_id:
+        df, truncated = await asyncio.to_thread(load_result_frame, result_id)
+        if truncated:
+            extras["notice"] = truncated_notice(len(df))
+        df, aggregation = chart_aggregate_frame(chart_type, df, params or {})
+    elif query:
+        query, aggregation = chart_aggregate_query(chart_type, query, params or {})
+        df = await run_db_call(execute_query, query, timeout=CHART_QUERY_TIMEOUT)
+    else:
+        raise ChartError("Either query or result_id is required")
+    if aggregation:
+        extras["aggregation"] = aggregation
+    return df, extras
+
+
 @mcp.tool(
     name="create_bar_chart",
-    description="Create a bar chart visualization from SQL query results"
+    description="Create a bar chart visualization from SQL query results, or from a result_id returned by the "
+                "database tools. Set agg (sum, avg, min, max, count, count_distinct) to group the rows by "
+                "x_column (and color_column) and aggregate the measure column into y_column; with a query the "
+                "database does the grouping. top_k keeps the k largest x values"
 )
 async def create_bar_chart(
-        query: str,
+        query: str = None,
+        *,
         x_column: str,
         y_column: str,
         title: str = "Bar Chart",
-        color_column: str = None
+        color_column: str = None,
+        agg: str = None,
+        measure: str = None,
+        top_k: int = None,
+        result_id: str = None
 ) -> str:
     """
     Create a bar chart visualization from SQL query results.
@@ -77,70 +143,53 @@ async def create_bar_chart(
         y_column: Column name for y-axis
         title: Chart title
         color_column: Optional column name for color grouping
+        agg: Optional aggregate function; the rows are then grouped by x_column, color_column
+        measure: Column of the query to aggregate, defaults to y_column
+        top_k: Optional number of x values with the largest aggregate to keep
+        result_id: Stored result of execute_sql_query to chart instead of running query
 
     Returns:
         JSON string with chart configuration
     """
-    df = execute_query(query)
-
-    logger.info(f"create_bar_chart Executing SQL query: {query}")
+    try:
+        df, extras = await load_chart_data("bar", query, result_id, {
+            "x_column": x_column, "y_column": y_column, "color_column": color_column,
+            "agg": agg, "measure": measure, "top_k": top_k
+        })
+    except QueryCancelled as err:
+        return json.dumps({"error": str(err), "cancelled": True})
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
+
+    logger.info(f"create_bar_chart Executing SQL query: {query or result_id}")
     logger.info(f"df: {df}")
 
     if df is None or df.empty:
         return json.dumps({"error": "No data returned from query"})
 
-    # Check if columns exist
-    if x_column not in df.columns or y_column not in df.columns:
-        return json.dumps({"error": f"Columns {x_column} or {y_column} not found in query results"})
-
-    if color_column and color_column not in df.columns:
-        return json.dumps({"error": f"Color column {color_column} not found in query results"})
-
-    # Create chart data
-    if color_column:
-        chart_data = []
-        for color_val in df[color_column].unique():
-            filtered_df = df[df[color_column] == color_val]
-            chart_data.append({
-                "x": filtered_df[x_column].tolist(),
-                "y": filtered_df[y_column].tolist(),
-                "type": "bar",
-                "name": str(color_val)
-            })
-    else:
-        chart_data = [{
-            "x": df[x_column].tolist(),
-            "y": df[y_column].tolist(),
-            "type": "bar"
-        }]
-
-    # Create chart configuration
-    chart_config = {
-        "title": title,
-        "chart_type": "bar",
-        "chart_data": {
-            "data": chart_data,
-            "layout": {
-                "title": title,
-                "xaxis": {"title": x_column},
-                "yaxis": {"title": y_column}
-            }
-        }
-    }
-
-    return json.dumps(chart_config)
+    try:
+        chart = bar_chart(df, x_column, y_column, title, color_column)
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
+    chart.update(extras)
+    return json.dumps(chart)
 
 
 @mcp.tool(
     name="create_line_chart",
-    description="Create a line chart visualization from SQL query results"
+    description="Create a line chart visualization from SQL query results, or from a result_id returned by the "
+                "database tools. Series longer than max_points are downsampled with LTTB; the response then "
+                "reports the ratio under 'downsampling'"
 )
 async def create_line_chart(
-        query: str,
+        query: str = None,
+        *,
         x_column: str,
         y_column: str,
         title: str = "Line Chart",
-        color_column: str = None
+        color_column: str = None,
+        max_points: int = None,
+        result_id: str = None
 ) -> str:
     """
     Create a line chart visualization from SQL query results.
@@ -151,70 +200,52 @@ async def create_line_chart(
         y_column: Column name for y-axis
         title: Chart title
         color_column: Optional column name for color grouping
+        max_points: Maximum number of points; longer series are reduced with LTTB.
+            Defaults to CHART_MAX_POINTS, 0 keeps every point
+        result_id: Stored result of execute_sql_query to chart instead of running query
 
     Returns:
         JSON string with chart configuration
     """
 
-    df = execute_query(query)
+    try:
+        df, extras = await load_chart_data("line", query, result_id)
+    except QueryCancelled as err:
+        return json.dumps({"error": str(err), "cancelled": True})
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
 
-    logger.info(f"create_line_chart Executing SQL query: {query}")
+    logger.info(f"create_line_chart Executing SQL query: {query or result_id}")
     logger.info(f"df: {df}")
 
     if df is None or df.empty:
         return json.dumps({"error": "No data returned from query"})
 
-    # Check if columns exist
-    if x_column not in df.columns or y_column not in df.columns:
-        return json.dumps({"error": f"Columns {x_column} or {y_column} not found in query results"})
-
-    if color_column and color_column not in df.columns:
-        return json.dumps({"error": f"Color column {color_column} not found in query results"})
-
-    # Create chart data
-    if color_column:
-        chart_data = []
-        for color_val in df[color_column].unique():
-            filtered_df = df[df[color_column] == color_val]
-            chart_data.append({
-                "x": filtered_df[x_column].tolist(),
-                "y": filtered_df[y_column].tolist(),
-                "type": "line",
-                "name": str(color_val)
-            })
-    else:
-        chart_data = [{
-            "x": df[x_column].tolist(),
-            "y": df[y_column].tolist(),
-            "type": "line"
-        }]
-
-    # Create chart configuration
-    chart_config = {
-        "title": title,
-        "chart_type": "line",
-        "chart_data": {
-            "data": chart_data,
-            "layout": {
-                "title": title,
-                "xaxis": {"title": x_column},
-                "yaxis": {"title": y_column}
-            }
-        }
-    }
-
-    return json.dumps(chart_config)
+    try:
+        chart = line_chart(df, x_column, y_column, title, color_column, max_points)
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
+    chart.update(extras)
+    return json.dumps(chart)
 
 
 @mcp.tool(
     name="create_pie_chart",
-    description="Create a pie chart visualization from SQL query results"
+    description="Create a pie chart visualization from SQL query results, or from a result_id returned by the "
+                "database tools. Set agg (sum, avg, min, max, count, count_distinct) to group the rows by "
+                "labels_column and aggregate the measure column into values_column; with a query the database "
+                "does the grouping. top_k keeps the k largest slices"
 )
 async def create_pie_chart(
-        query: str,
+        query: str = None,
+        *,
         labels_column: str,
         values_column: str,
-        title: str = "Pie Chart"
+        title: str = "Pie Chart",
+        agg: str = None,
+        measure: str = None,
+        top_k: int = None,
+        result_id: str = None
 ) -> str:
     """
     Create a pie chart visualization from SQL query results.
@@ -224,56 +255,55 @@ async def create_pie_chart(
         labels_column: Column name for pie chart labels
         values_column: Column name for pie chart values
         title: Chart title
+        agg: Optional aggregate function; the rows are then grouped by labels_column
+        measure: Column of the query to aggregate, defaults to values_column
+        top_k: Optional number of largest slices to keep
+        result_id: Stored result of execute_sql_query to chart instead of running query
 
     Returns:
         JSON string with chart configuration
     """
 
-    df = execute_query(query)
-
-    logger.info(f"create_pie_chart Executing SQL query: {query}")
+    try:
+        df, extras = await load_chart_data("pie", query, result_id, {
+            "labels_column": labels_column, "values_column": values_column,
+            "agg": agg, "measure": measure, "top_k": top_k
+        })
+    except QueryCancelled as err:
+        return json.dumps({"error": str(err), "cancelled": True})
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
+
+    logger.info(f"create_pie_chart Executing SQL query: {query or result_id}")
     logger.info(f"df: {df}")
 
     if df is None or df.empty:
         return json.dumps({"error": "No data returned from query"})
 
-    # Check if columns exist
-    if labels_column not in df.columns or values_column not in df.columns:
-        return json.dumps({"error": f"Columns {labels_column} or {values_column} not found in query results"})
-
-    # Create chart data
-    chart_data = [{
-        "labels": df[labels_column].tolist(),
-        "values": df[values_column].tolist(),
-        "type": "pie"
-    }]
-
-    # Create chart configuration
-    chart_config = {
-        "title": title,
-        "chart_type": "pie",
-        "chart_data": {
-            "data": chart_data,
-            "layout": {
-                "title": title
-            }
-        }
-    }
-
-    return json.dumps(chart_config)
+    try:
+        chart = pie_chart(df, labels_column, values_column, title)
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
+    chart.update(extras)
+    return json.dumps(chart)
 
 
 @mcp.tool(
     name="create_scatter_plot",
-    description="Create a scatter plot visualization from SQL query results"
+    description="Create a scatter plot visualization from SQL query results, or from a result_id returned by "
+                "the database tools. More than max_points points are thinned by grid decimation; the response "
+                "then reports the ratio under 'downsampling'"
 )
 async def create_scatter_plot(
-        query: str,
+        query: str = None,
+        *,
         x_column: str,
         y_column: str,
         title: str = "Scatter Plot",
         color_column: str = None,
-        size_column: str = None
+        size_column: str = None,
+        max_points: int = None,
+        result_id: str = None
 ) -> str:
     """
     Create a scatter plot visualization from SQL query results.
@@ -285,86 +315,51 @@ async def create_scatter_plot(
         title: Chart title
         color_column: Optional column name for color grouping
         size_column: Optional column name for point size
+        max_points: Maximum number of points; larger results are thinned on a grid.
+            Defaults to CHART_MAX_POINTS, 0 keeps every point
+        result_id: Stored result of execute_sql_query to chart instead of running query
 
     Returns:
         JSON string with chart configuration
     """
 
-    df = execute_query(query)
+    try:
+        df, extras = await load_chart_data("scatter", query, result_id)
+    except QueryCancelled as err:
+        return json.dumps({"error": str(err), "cancelled": True})
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
 
-    logger.info(f"create_scatter_plot Executing SQL query: {query}")
+    logger.info(f"create_scatter_plot Executing SQL query: {query or result_id}")
     logger.info(f"df: {df}")
 
     if df is None or df.empty:
         return json.dumps({"error": "No data returned from query"})
 
-    # Check if columns exist
-    if x_column not in df.columns or y_column not in df.columns:
-        return json.dumps({"error": f"Columns {x_column} or {y_column} not found in query results"})
-
-    if color_column and color_column not in df.columns:
-        return json.dumps({"error": f"Color column {color_column} not found in query results"})
-
-    if size_column and size_column not in df.columns:
-        return json.dumps({"error": f"Size column {size_column} not found in query results"})
-
-    # Create chart data
-    if color_column:
-        chart_data = []
-        for color_val in df[color_column].unique():
-            filtered_df = df[df[color_column] == color_val]
-            scatter_data = {
-                "x": filtered_df[x_column].tolist(),
-                "y": filtered_df[y_column].tolist(),
-                "mode": "markers",
-                "type": "scatter",
-                "name": str(color_val)
-            }
-
-            if size_column:
-                scatter_data["marker"] = {"size": filtered_df[size_column].tolist()}
-
-            chart_data.append(scatter_data)
-    else:
-        scatter_data = {
-            "x": df[x_column].tolist(),
-            "y": df[y_column].tolist(),
-            "mode": "markers",
-            "type": "scatter"
-        }
-
-        if size_column:
-            scatter_data["marker"] = {"size": df[size_column].tolist()}
-
-        chart_data = [scatter_data]
-
-    # Create chart configuration
-    chart_config = {
-        "title": title,
-        "chart_type": "scatter",
-        "chart_data": {
-            "data": chart_data,
-            "layout": {
-                "title": title,
-                "xaxis": {"title": x_column},
-                "yaxis": {"title": y_column}
-            }
-        }
-    }
-
-    return json.dumps(chart_config)
+    try:
+        chart = scatter_chart(df, x_column, y_column, title, color_column, size_column, max_points)
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
+    chart.update(extras)
+    return json.dumps(chart)
 
 
 @mcp.tool(
     name="create_heatmap",
-    description="Create a heatmap visualization from SQL query results"
+    description="Create a heatmap visualization from SQL query results, or from a result_id returned by the "
+                "database tools"
 )
 async def create_heatmap(
-        query: str,
+        query: str = None,
+        *,
         x_column: str,
         y_column: str,
         z_column: str,
-        title: str = "Heatmap"
+        title: str = "Heatmap",
+        agg: str = "sum",
+        bins: int = None,
+        top_k: int = None,
+        result_id: str = None
 ) -> str:
     """
     Create a heatmap visualization from SQL query results.
@@ -375,52 +370,67 @@ async def create_heatmap(
         y_column: Column name for y-axis
         z_column: Column name for z-axis (values)
         title: Chart title
+        agg: How rows falling into the same cell are combined:
+            sum, mean, count, min or max
+        bins: Number of bins for numeric axes with more distinct values than
+            that. Defaults to HEATMAP_MAX_BINS
+        top_k: Number of most frequent categories kept on non-numeric axes,
+            the rest are merged into "Other". Defaults to HEATMAP_TOP_K
+        result_id: Stored result of execute_sql_query to chart instead of running query
 
     Returns:
         JSON string with chart configuration
     """
-    df = execute_query(query)
+    try:
+        df, extras = await load_chart_data("heatmap", query, result_id)
+    except QueryCancelled as err:
+        return json.dumps({"error": str(err), "cancelled": True})
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
     if df is None or df.empty:
         return json.dumps({"error": "No data returned from query"})
 
-    # Check if columns exist
-    if x_column not in df.columns or y_column not in df.columns or z_column not in df.columns:
-        return json.dumps({"error": f"Columns {x_column}, {y_column}, or {z_column} not found in query results"})
-
-    # Pivot the data for heatmap
     try:
-        pivot_df = df.pivot(index=y_column, columns=x_column, values=z_column)
-
-        # Create chart data
-        chart_data = [{
-            "z": pivot_df.values.tolist(),
-            "x": pivot_df.columns.tolist(),
-            "y": pivot_df.index.tolist(),
-            "type": "heatmap"
-        }]
-
-        # Create chart configuration
-        chart_config = {
-            "title": title,
-            "chart_type": "heatmap",
-            "chart_data": {
-                "data": chart_data,
-                "layout": {
-                    "title": title,
-                    "xaxis": {"title": x_column},
-                    "yaxis": {"title": y_column}
-                }
-            }
-        }
+        chart = heatmap_chart(df, x_column, y_column, z_column, title, agg, bins, top_k)
+    except ChartError as err:
+        return json.dumps({"error": str(err)})
+    chart.update(extras)
+    return json.dumps(chart)
 
-        return json.dumps(chart_config)
-    except Exception as e:
-        return json.dumps({"error": f"Error creating heatmap: {str(e)}"})
+
+async def load_dashboard_sources(sources):
+    """
+    Load distinct dashboard data sources concurrently, at most
+    DASHBOARD_QUERY_CONCURRENCY at a time.
+
+    Args:
+        sources: ("query", SQL) or ("result_id", result_id) pairs, already de-duplicated
+
+    Returns:
+        List of (DataFrame or None, QueryCancelled, ChartError or None, truncated, elapsed ms),
+        in source order
+    """
+    semaphore = asyncio.Semaphore(max(1, DASHBOARD_QUERY_CONCURRENCY))
+
+    async def load(kind, value):
+        async with semaphore:
+            started = time.perf_counter()
+            df, error, truncated = None, None, False
+            try:
+                if kind == "result_id":
+                    df, truncated = await asyncio.to_thread(load_result_frame, value)
+                else:
+                    df = await run_db_call(execute_query, value, timeout=CHART_QUERY_TIMEOUT)
+            except (QueryCancelled, ChartError) as err:
+                error = err
+            return df, error, truncated, round((time.perf_counter() - started) * 1000, 1)
+
+    return await asyncio.gather(*(load(kind, value) for kind, value in sources))
 
 
 @mcp.tool(
     name="create_dashboard",
-    description="Create a dashboard with multiple visualizations from SQL queries"
+    description="Create a dashboard with multiple visualizations from SQL queries or stored result_ids"
 )
 async def create_dashboard(
         dashboard_title: str,
@@ -435,312 +445,106 @@ async def create_dashboard(
             Format: [
                 {
                     "chart_type": "bar|line|pie|scatter|heatmap",
-                    "query": "SQL query",
+                    "query": "SQL query" (or "result_id": "id from the database tools"),
                     "x_column": "x column name",
                     "y_column": "y column name",
                     "title": "chart title",
-                    ...other chart-specific parameters
+                    ...other chart-specific parameters, e.g. agg, measure and
+                    top_k for bar and pie, max_points for line and scatter,
+                    agg, bins and top_k for heatmap,
+                    encoding ("json" or "typed") for any chart
                 },
                 ...
             ]
 
+    Distinct queries and stored results are loaded concurrently; charts with
+    the same SQL or result_id share one frame. Each chart reports its query
+    (or load) and build time under "timing".
+
     Returns:
         JSON string with dashboard configuration
     """
     try:
         configs = json.loads(chart_configs)
+        started = time.perf_counter()
 
-        dashboard_charts = []
-
+        # Rewrite every chart's query first, so charts whose final SQL is the
+        # same (including after aggregation push-down) share one execution
+        plans = []
         for i, config in enumerate(configs):
             chart_type = config.get("chart_type")
             query = config.get("query")
+            result_id = config.get("result_id")
 
-            if not chart_type or not query:
+            if not chart_type or not (query or result_id):
                 return json.dumps({"error": f"Chart {i + 1} is missing chart_type or query"})
 
-            df = execute_query(query)
-            if df is None or df.empty:
-                dashboard_charts.append({
-                    "error": f"No data returned from query for chart {i + 1}"
-                })
+            if result_id:
+                # Stored results are aggregated in pandas once loaded
+                plans.append((chart_type, ("result_id", result_id), None, config))
                 continue
+            try:
+                query, aggregation = chart_aggregate_query(chart_type, query, config)
+            except ChartError as err:
+                plans.append({"error": f"{err} for chart {i + 1}"})
+                continue
+            plans.append((chart_type, ("query", query.strip()), aggregation, config))
 
-            if chart_type == "bar":
-                x_column = config.get("x_column")
-                y_column = config.get("y_column")
-                title = config.get("title", f"Bar Chart {i + 1}")
-                color_column = config.get("color_column")
-
-                if not x_column or not y_column:
-                    dashboard_charts.append({
-                        "error": f"Bar chart {i + 1} is missing x_column or y_column"
-                    })
-                    continue
-
-                if x_column not in df.columns or y_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Columns {x_column} or {y_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                if color_column and color_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Color column {color_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                # Create chart data
-                if color_column:
-                    chart_data = []
-                    for color_val in df[color_column].unique():
-                        filtered_df = df[df[color_column] == color_val]
-                        chart_data.append({
-                            "x": filtered_df[x_column].tolist(),
-                            "y": filtered_df[y_column].tolist(),
-                            "type": "bar",
-                            "name": str(color_val)
-                        })
-                else:
-                    chart_data = [{
-                        "x": df[x_column].tolist(),
-                        "y": df[y_column].tolist(),
-                        "type": "bar"
-                    }]
-
-                dashboard_charts.append({
-                    "title": title,
-                    "chart_type": "bar",
-                    "chart_data": {
-                        "data": chart_data,
-                        "layout": {
-                            "title": title,
-                            "xaxis": {"title": x_column},
-                            "yaxis": {"title": y_column}
-                        }
-                    }
-                })
-
-            elif chart_type == "line":
-                x_column = config.get("x_column")
-                y_column = config.get("y_column")
-                title = config.get("title", f"Line Chart {i + 1}")
-                color_column = config.get("color_column")
-
-                if not x_column or not y_column:
-                    dashboard_charts.append({
-                        "error": f"Line chart {i + 1} is missing x_column or y_column"
-                    })
-                    continue
-
-                if x_column not in df.columns or y_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Columns {x_column} or {y_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                if color_column and color_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Color column {color_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                # Create chart data
-                if color_column:
-                    chart_data = []
-                    for color_val in df[color_column].unique():
-                        filtered_df = df[df[color_column] == color_val]
-                        chart_data.append({
-                            "x": filtered_df[x_column].tolist(),
-                            "y": filtered_df[y_column].tolist(),
-                            "type": "line",
-                            "name": str(color_val)
-                        })
-                else:
-                    chart_data = [{
-                        "x": df[x_column].tolist(),
-                        "y": df[y_column].tolist(),
-                        "type": "line"
-                    }]
-
-                dashboard_charts.append({
-                    "title": title,
-                    "chart_type": "line",
-                    "chart_data": {
-                        "data": chart_data,
-                        "layout": {
-                            "title": title,
-                            "xaxis": {"title": x_column},
-                            "yaxis": {"title": y_column}
-                        }
-                    }
-                })
-
-            elif chart_type == "pie":
-                labels_column = config.get("labels_column")
-                values_column = config.get("values_column")
-                title = config.get("title", f"Pie Chart {i + 1}")
-
-                if not labels_column or not values_column:
-                    dashboard_charts.append({
-                        "error": f"Pie chart {i + 1} is missing labels_column or values_column"
-                    })
-                    continue
-
-                if labels_column not in df.columns or values_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Columns {labels_column} or {values_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                # Create chart data
-                chart_data = [{
-                    "labels": df[labels_column].tolist(),
-                    "values": df[values_column].tolist(),
-                    "type": "pie"
-                }]
-
-                dashboard_charts.append({
-                    "title": title,
-                    "chart_type": "pie",
-                    "chart_data": {
-                        "data": chart_data,
-                        "layout": {
-                            "title": title
-                        }
-                    }
-                })
-
-            elif chart_type == "scatter":
-                x_column = config.get("x_column")
-                y_column = config.get("y_column")
-                title = config.get("title", f"Scatter Plot {i + 1}")
-                color_column = config.get("color_column")
-                size_column = config.get("size_column")
-
-                if not x_column or not y_column:
-                    dashboard_charts.append({
-                        "error": f"Scatter plot {i + 1} is missing x_column or y_column"
-                    })
-                    continue
-
-                if x_column not in df.columns or y_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Columns {x_column} or {y_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                if color_column and color_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Color column {color_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                if size_column and size_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Size column {size_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                # Create chart data
-                if color_column:
-                    chart_data = []
-                    for color_val in df[color_column].unique():
-                        filtered_df = df[df[color_column] == color_val]
-                        scatter_data = {
-                            "x": filtered_df[x_column].tolist(),
-                            "y": filtered_df[y_column].tolist(),
-                            "mode": "markers",
-                            "type": "scatter",
-                            "name": str(color_val)
-                        }
-
-                        if size_column:
-                            scatter_data["marker"] = {"size": filtered_df[size_column].tolist()}
-
-                        chart_data.append(scatter_data)
-                else:
-                    scatter_data = {
-                        "x": df[x_column].tolist(),
-                        "y": df[y_column].tolist(),
-                        "mode": "markers",
-                        "type": "scatter"
-                    }
-
-                    if size_column:
-                        scatter_data["marker"] = {"size": df[size_column].tolist()}
+        sources = list(dict.fromkeys(plan[1] for plan in plans if isinstance(plan, tuple)))
+        loaded = dict(zip(sources, await load_dashboard_sources(sources)))
+        users = Counter(plan[1] for plan in plans if isinstance(plan, tuple))
 
-                    chart_data = [scatter_data]
+        dashboard_charts = []
+        for i, plan in enumerate(plans):
+            if isinstance(plan, dict):
+                dashboard_charts.append(plan)
+                continue
 
+            chart_type, source, aggregation, config = plan
+            df, error, truncated, load_ms = loaded[source]
+            timing = {
+                "query_ms" if source[0] == "query" else "load_ms": load_ms,
+                "shared_query": users[source] > 1
+            }
+            if error is not None:
+                entry = {"error": f"Chart {i + 1}: {error}", "timing": timing}
+                if isinstance(error, QueryCancelled):
+                    entry["cancelled"] = True
+                dashboard_charts.append(entry)
+                continue
+            if df is None or df.empty:
                 dashboard_charts.append({
-                    "title": title,
-                    "chart_type": "scatter",
-                    "chart_data": {
-                        "data": chart_data,
-                        "layout": {
-                            "title": title,
-                            "xaxis": {"title": x_column},
-                            "yaxis": {"title": y_column}
-                        }
-                    }
+                    "error": f"No data returned from query for chart {i + 1}",
+                    "timing": timing
                 })
+                continue
 
-            elif chart_type == "heatmap":
-                x_column = config.get("x_column")
-                y_column = config.get("y_column")
-                z_column = config.get("z_column")
-                title = config.get("title", f"Heatmap {i + 1}")
-
-                if not x_column or not y_column or not z_column:
-                    dashboard_charts.append({
-                        "error": f"Heatmap {i + 1} is missing x_column, y_column, or z_column"
-                    })
-                    continue
-
-                if x_column not in df.columns or y_column not in df.columns or z_column not in df.columns:
-                    dashboard_charts.append({
-                        "error": f"Columns {x_column}, {y_column}, or {z_column} not found in query results for chart {i + 1}"
-                    })
-                    continue
-
-                # Pivot the data for heatmap
+            build_started = time.perf_counter()
+            if source[0] == "result_id":
                 try:
-                    pivot_df = df.pivot(index=y_column, columns=x_column, values=z_column)
-
-                    # Create chart data
-                    chart_data = [{
-                        "z": pivot_df.values.tolist(),
-                        "x": pivot_df.columns.tolist(),
-                        "y": pivot_df.index.tolist(),
-                        "type": "heatmap"
-                    }]
-
-                    dashboard_charts.append({
-                        "title": title,
-                        "chart_type": "heatmap",
-                        "chart_data": {
-                            "data": chart_data,
-                            "layout": {
-                                "title": title,
-                                "xaxis": {"title": x_column},
-                                "yaxis": {"title": y_column}
-                            }
-                        }
-                    })
-                except Exception as e:
-                    dashboard_charts.append({
-                        "error": f"Error creating heatmap for chart {i + 1}: {str(e)}"
-                    })
-
-            else:
-                dashboard_charts.append({
-                    "error": f"Unsupported chart type '{chart_type}' for chart {i + 1}"
-                })
+                    df, aggregation = chart_aggregate_frame(chart_type, df, config)
+                except ChartError as err:
+                    dashboard_charts.append({"error": f"{err} for chart {i + 1}", "timing": timing})
+                    continue
+            chart = build_chart(df, chart_type, config, i + 1)
+            if "error" not in chart:
+                if aggregation:
+                    chart["aggregation"] = aggregation
+                if truncated:
+                    chart["notice"] = truncated_notice(len(df))
+            timing["build_ms"] = round((time.perf_counter() - build_started) * 1000, 1)
+            chart["timing"] = timing
+            dashboard_charts.append(chart)
 
         # Create dashboard configuration
         dashboard_config = {
             "title": dashboard_title,
-            "charts": dashboard_charts
+            "charts": dashboard_charts,
+            "timing": {
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                "queries": len(sources),
+                "concurrency": DASHBOARD_QUERY_CONCURRENCY
+            }
         }
 
         return json.dumps(dashboard_config)
@@ -750,5 +554,14 @@ async def create_dashboard(
         return json.dumps({"error": f"Error creating dashboard: {str(e)}"})
 
 
+@mcp.tool(
+    name="get_visualization_server_metrics",
+    description="Get connection pool metrics of the visualization server"
+)
+async def get_visualization_server_metrics() -> str:
+    """Get connection pool metrics of the visualization server."""
+    return json.dumps({"pool": get_pool().metrics()})
+
+
 if __name__ == "__main__":
     asyncio.run(mcp.run_sse_async())
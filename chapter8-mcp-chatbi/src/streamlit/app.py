@@ -1,7 +1,9 @@
+import base64
 import json
 import logging
 import os
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import requests
@@ -9,6 +11,8 @@ import streamlit as st
 
 # API URL from environment variable or default
 API_URL = os.getenv("API_URL", "http://localhost:8000")
+# Conversations listed in the sidebar per page
+CONVERSATION_PAGE_SIZE = int(os.getenv("CONVERSATION_PAGE_SIZE", "30"))
 
 st.set_page_config(layout="wide", page_title="ChatBI")
 
@@ -17,6 +21,112 @@ st.caption("与您的数据进行对话，获取智能洞察和可视化图表
 
 logger = logging.getLogger(__name__)
 
+
+def decode_typed_arrays(value):
+    """Replace Plotly typed arrays ({"dtype", "bdata"[, "shape"]}) in chart data with numpy arrays."""
+    if isinstance(value, dict):
+        if "bdata" in value and "dtype" in value:
+            array = np.frombuffer(base64.b64decode(value["bdata"]), dtype=np.dtype(value["dtype"]).newbyteorder("<"))
+            shape = value.get("shape")
+            if shape:
+                if isinstance(shape, str):
+                    shape = [int(dim) for dim in shape.split(",")]
+                array = array.reshape(shape)
+            return array
+        return {key: decode_typed_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_typed_arrays(item) for item in value]
+    return value
+
+
+def iter_sse_events(response):
+    """Yield the JSON payload of each Server-Sent Event of a streaming response."""
+    data = []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("data:"):
+            data.append(line[5:].strip())
+        elif not line and data:
+            yield json.loads("\n".join(data))
+            data = []
+
+
+def render_visualization(viz):
+    logger.info(f"Rendering visualization: {viz}")
+
+    # Ensure 'title' and 'chart_type' exist, provide defaults if not
+    viz_title = viz.get('title', '未命名图表')
+    viz_chart_type = viz.get('chart_type', 'unknown').lower()
+
+    with st.expander(f"{viz_title} ({viz_chart_type})", expanded=True):
+        try:
+            chart_data_payload = viz["chart_data"] # This is the main data payload for the chart
+            if isinstance(chart_data_payload, str):  # Handle if chart_data is a JSON string
+                chart_data_payload = json.loads(chart_data_payload)
+            chart_data_payload = decode_typed_arrays(chart_data_payload)
+
+            if not isinstance(chart_data_payload, dict) or "data" not in chart_data_payload:
+                st.warning(f"图表 '{viz_title}' 的数据格式不正确或缺少 'data' 键。")
+                st.json(chart_data_payload)
+                return
+
+            # Extracting data from the payload
+            plotly_data_list = chart_data_payload.get("data")
+
+            if not plotly_data_list or not isinstance(plotly_data_list, list) or not plotly_data_list[0]:
+                st.warning(f"图表 '{viz_title}' 的 'data' 列表为空或格式不正确。")
+                st.json(chart_data_payload)
+                return
+
+            # Assuming single trace for bar, line, pie for now
+            trace = plotly_data_list[0] 
+
+            if viz_chart_type == "bar":
+                x_values = trace.get("x")
+                y_values = trace.get("y")
+                series_name = trace.get("name", "数值")
+                if x_values is None or y_values is None:
+                    st.error(f"条形图 '{viz_title}' 缺少 x 或 y 数据。")
+                    st.json(trace)
+                    return
+                df = pd.DataFrame({series_name: y_values}, index=x_values)
+                st.bar_chart(df)
+            elif viz_chart_type == "line":
+                x_values = trace.get("x")
+                y_values = trace.get("y")
+                series_name = trace.get("name", "数值")
+                if x_values is None or y_values is None:
+                    st.error(f"折线图 '{viz_title}' 缺少 x 或 y 数据。")
+                    st.json(trace)
+                    return
+                df = pd.DataFrame({series_name: y_values}, index=x_values)
+                st.line_chart(df)
+            elif viz_chart_type == "pie":
+                labels = trace.get("labels")
+                values = trace.get("values")
+                if labels is None or values is None:
+                    st.error(f"饼图 '{viz_title}' 缺少 labels 或 values 数据。")
+                    st.json(trace)
+                    return
+                fig = px.pie(names=labels, values=values, title=viz_title)
+                st.plotly_chart(fig, use_container_width=True)
+            elif viz_chart_type == "table":
+                # Table data structure is different, directly from chart_data_payload
+                table_data = chart_data_payload.get("data")
+                table_columns = chart_data_payload.get("columns")
+                if table_data is None or table_columns is None:
+                    st.error(f"表格 '{viz_title}' 缺少 data 或 columns。")
+                    st.json(chart_data_payload)
+                    return
+                df = pd.DataFrame(table_data, columns=table_columns)
+                st.dataframe(df)
+            else:
+                st.warning(f"不支持的图表类型: {viz_chart_type}")
+                st.json(chart_data_payload)
+        except Exception as e:
+            st.error(f"渲染图表 '{viz_title}' 失败: {e}")
+            st.json(viz.get("chart_data", "无图表数据"))
+
+
 # Initialize session state variables
 if "conversation_id" not in st.session_state:
     st.session_state.conversation_id = None
@@ -26,17 +136,35 @@ if "visualizations" not in st.session_state:
     st.session_state.visualizations = []
 if "conversation_list" not in st.session_state:
     st.session_state.conversation_list = []
+if "conversation_cursor" not in st.session_state:
+    st.session_state.conversation_cursor = None  # Cursor of the next page of the list
 
 
 # --- Helper Functions ---
-def fetch_conversations():
+def fetch_conversations(cursor=None):
+    """Load the first page of the conversation list, or the page after `cursor`."""
+    params = {"limit": CONVERSATION_PAGE_SIZE}
+    if cursor is not None:
+        params["cursor"] = cursor
     try:
-        response = requests.get(f"{API_URL}/api/chat/conversations")
+        response = requests.get(f"{API_URL}/api/chat/conversations/page", params=params)
         response.raise_for_status()
-        st.session_state.conversation_list = response.json()
+        page = response.json()
     except requests.exceptions.RequestException as e:
         st.sidebar.error(f"加载会话列表失败: {e}")
         st.session_state.conversation_list = []
+        return
+
+    if cursor is not None:
+        st.session_state.conversation_list += page["items"]
+        st.session_state.conversation_cursor = page["next_cursor"]
+    elif page["next_cursor"] is not None and len(st.session_state.conversation_list) > len(page["items"]):
+        # Refresh the first page and keep the older pages already loaded
+        older = [conv for conv in st.session_state.conversation_list if conv["id"] < page["next_cursor"]]
+        st.session_state.conversation_list = page["items"] + older
+    else:
+        st.session_state.conversation_list = page["items"]
+        st.session_state.conversation_cursor = page["next_cursor"]
 
 
 def create_new_conversation():
@@ -78,12 +206,15 @@ with st.sidebar:
     if st.button("➕ 新建对话", use_container_width=True):
         create_new_conversation()
 
-    fetch_conversations()  # Fetch on each sidebar render if needed, or less frequently
+    fetch_conversations()  # Only the first page, without messages, on each sidebar render
 
     if st.session_state.conversation_list:
         for conv in st.session_state.conversation_list:
             if st.button(f"{conv['title']} (ID: {conv['id']})", key=f"conv_{conv['id']}", use_container_width=True):
                 load_conversation(conv['id'])
+        if st.session_state.conversation_cursor is not None and st.button("加载更多", use_container_width=True):
+            fetch_conversations(st.session_state.conversation_cursor)
+            st.rerun()
     else:
         st.write("暂无历史会话。")
 
@@ -103,80 +234,7 @@ if st.session_state.conversation_id:
     if st.session_state.visualizations:
         st.subheader("📊 可视化图表")
         for viz in st.session_state.visualizations:
-
-            logger.info(f"Rendering visualization: {viz}")
-
-            # Ensure 'title' and 'chart_type' exist, provide defaults if not
-            viz_title = viz.get('title', '未命名图表')
-            viz_chart_type = viz.get('chart_type', 'unknown').lower()
-
-            with st.expander(f"{viz_title} ({viz_chart_type})", expanded=True):
-                try:
-                    chart_data_payload = viz["chart_data"] # This is the main data payload for the chart
-                    if isinstance(chart_data_payload, str):  # Handle if chart_data is a JSON string
-                        chart_data_payload = json.loads(chart_data_payload)
-
-                    if not isinstance(chart_data_payload, dict) or "data" not in chart_data_payload:
-                        st.warning(f"图表 '{viz_title}' 的数据格式不正确或缺少 'data' 键。")
-                        st.json(chart_data_payload)
-                        continue
-                    
-                    # Extracting data from the payload
-                    plotly_data_list = chart_data_payload.get("data")
-
-                    if not plotly_data_list or not isinstance(plotly_data_list, list) or not plotly_data_list[0]:
-                        st.warning(f"图表 '{viz_title}' 的 'data' 列表为空或格式不正确。")
-                        st.json(chart_data_payload)
-                        continue
-                    
-                    # Assuming single trace for bar, line, pie for now
-                    trace = plotly_data_list[0] 
-
-                    if viz_chart_type == "bar":
-                        x_values = trace.get("x")
-                        y_values = trace.get("y")
-                        series_name = trace.get("name", "数值")
-                        if x_values is None or y_values is None:
-                            st.error(f"条形图 '{viz_title}' 缺少 x 或 y 数据。")
-                            st.json(trace)
-                            continue
-                        df = pd.DataFrame({series_name: y_values}, index=x_values)
-                        st.bar_chart(df)
-                    elif viz_chart_type == "line":
-                        x_values = trace.get("x")
-                        y_values = trace.get("y")
-                        series_name = trace.get("name", "数值")
-                        if x_values is None or y_values is None:
-                            st.error(f"折线图 '{viz_title}' 缺少 x 或 y 数据。")
-                            st.json(trace)
-                            continue
-                        df = pd.DataFrame({series_name: y_values}, index=x_values)
-                        st.line_chart(df)
-                    elif viz_chart_type == "pie":
-                        labels = trace.get("labels")
-                        values = trace.get("values")
-                        if labels is None or values is None:
-                            st.error(f"饼图 '{viz_title}' 缺少 labels 或 values 数据。")
-                            st.json(trace)
-                            continue
-                        fig = px.pie(names=labels, values=values, title=viz_title)
-                        st.plotly_chart(fig, use_container_width=True)
-                    elif viz_chart_type == "table":
-                        # Table data structure is different, directly from chart_data_payload
-                        table_data = chart_data_payload.get("data")
-                        table_columns = chart_data_payload.get("columns")
-                        if table_data is None or table_columns is None:
-                            st.error(f"表格 '{viz_title}' 缺少 data 或 columns。")
-                            st.json(chart_data_payload)
-                            continue
-                        df = pd.DataFrame(table_data, columns=table_columns)
-                        st.dataframe(df)
-                    else:
-                        st.warning(f"不支持的图表类型: {viz_chart_type}")
-                        st.json(chart_data_payload)
-                except Exception as e:
-                    st.error(f"渲染图表 '{viz_title}' 失败: {e}")
-                    st.json(viz.get("chart_data", "无图表数据"))
+            render_visualization(viz)
 
     # Chat input
     if prompt := st.chat_input("请输入您的问题或指令..."):
@@ -185,26 +243,57 @@ if st.session_state.conversation_id:
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Send message to API and get response
+        # Send message to API and render the answer as it streams in
         try:
-            with st.spinner("AI思考中..."):
-                response = requests.post(
-                    f"{API_URL}/api/chat/conversations/{st.session_state.conversation_id}/messages",
-                    json={"content": prompt, "role": "user"}
-                )
-                response.raise_for_status()
-                ai_response = response.json()
-
-            # Add AI response to UI
-            st.session_state.messages.append({"role": "assistant", "content": ai_response["content"]})
-
-            # Fetch updated visualizations
-            viz_response = requests.get(
-                f"{API_URL}/api/chat/conversations/{st.session_state.conversation_id}/visualizations")
-            viz_response.raise_for_status()
-            st.session_state.visualizations = viz_response.json()
-
-            st.rerun()  # Rerun to display new messages and visualizations
+            with st.chat_message("assistant"):
+                status = st.status("AI思考中...")
+                answer = st.empty()
+                text = ""
+                error = None
+                with requests.post(
+                    f"{API_URL}/api/chat/conversations/{st.session_state.conversation_id}/messages/stream",
+                    json={"content": prompt, "role": "user"},
+                    stream=True,
+                ) as response:
+                    response.raise_for_status()
+                    for event in iter_sse_events(response):
+                        if event["type"] == "token":
+                            text += event["content"]
+                            answer.markdown(text + "▌")
+                        elif event["type"] == "tool_start":
+                            status.update(label=f"调用工具: {event['name']}")
+                            status.write(f"🔧 {event['name']}")
+                        elif event["type"] == "visualization":
+                            render_visualization(event["visualization"])
+                        elif event["type"] == "done":
+                            # The saved reply is the final answer, without text from intermediate steps
+                            text = event["message"]["content"]
+                            answer.markdown(text)
+                            break
+                        elif event["type"] == "error":
+                            error = event["message"]
+                            break
+                    else:
+                        # The stream closed without a done or error event
+                        error = "连接在回答完成前中断"
+                if error is None:
+                    status.update(label="完成", state="complete")
+                else:
+                    answer.markdown(text)
+                    status.update(label="出错", state="error")
+                    st.error(f"生成回答失败: {error}")
+
+            if error is None:
+                # Add AI response to UI
+                st.session_state.messages.append({"role": "assistant", "content": text})
+
+                # Fetch updated visualizations
+                viz_response = requests.get(
+                    f"{API_URL}/api/chat/conversations/{st.session_state.conversation_id}/visualizations")
+                viz_response.raise_for_status()
+                st.session_state.visualizations = viz_response.json()
+
+                st.rerun()  # Rerun to display new messages and visualizations
 
         except requests.exceptions.RequestException as e:
             st.error(f"与API通信失败: {e}")
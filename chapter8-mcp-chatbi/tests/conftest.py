@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import the project as `src.…`, as the servers and the API do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+import asyncio
+
+import anyio
+import httpx
+import pytest
+from mcp import types
+from mcp.shared.exceptions import McpError
+
+from src.api.services.agent_runtime import MCPConnection
+
+
+class FakeSession:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    async def call_tool(self, name, arguments):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return types.CallToolResult(content=[types.TextContent(type="text", text="ok")])
+
+
+class FakeConnection(MCPConnection):
+    """An MCPConnection handing out the given sessions, one per (re)connect."""
+
+    def __init__(self, *sessions):
+        super().__init__(client=None, name="database")
+        self.sessions = list(sessions)
+        self.reconnects = 0
+
+    async def session(self):
+        return self.sessions[0]
+
+    def reconnect(self, session=None):
+        if session is self.sessions[0]:
+            self.reconnects += 1
+            self.sessions.pop(0)
+
+
+@pytest.mark.parametrize("error", [anyio.ClosedResourceError(), anyio.BrokenResourceError()])
+def test_retries_when_the_request_was_not_sent(error):
+    closed, fresh = FakeSession(error), FakeSession()
+    connection = FakeConnection(closed, fresh)
+
+    result = asyncio.run(connection.call_tool("execute_sql_query", {"query": "INSERT ..."}))
+
+    assert result.content[0].text == "ok"
+    assert (closed.calls, fresh.calls, connection.reconnects) == (1, 1, 1)
+
+
+@pytest.mark.parametrize("error, reconnects", [
+    (httpx.ReadTimeout("timed out"), 1),
+    (McpError(types.ErrorData(code=types.CONNECTION_CLOSED, message="Connection closed")), 1),
+    (McpError(types.ErrorData(code=httpx.codes.REQUEST_TIMEOUT, message="Timed out")), 0),
+])
+def test_does_not_retry_once_the_request_may_have_run(error, reconnects):
+    broken, fresh = FakeSession(error), FakeSession()
+    connection = FakeConnection(broken, fresh)
+
+    with pytest.raises(type(error)):
+        asyncio.run(connection.call_tool("execute_sql_query", {"query": "INSERT ..."}))
+
+    assert (broken.calls, fresh.calls, connection.reconnects) == (1, 0, reconnects)
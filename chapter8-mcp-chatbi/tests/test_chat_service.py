@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.prebuilt import create_react_agent
+
+from src.api.services.chat_service import process_chat_message, stream_chat_events
+
+CHART = {"chart_type": "bar", "title": "Sales by region", "chart_data": {"data": []}}
+
+
+class CountingModel(FakeMessagesListChatModel):
+    """Replays `responses` and counts the model calls."""
+
+    calls: int = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+
+class RecordingAgent:
+    """Wraps the compiled agent to count how it is run and keep the events it emits."""
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.runs = 0
+        self.events = []
+
+    async def astream_events(self, *args, **kwargs):
+        self.runs += 1
+        async for event in self.agent.astream_events(*args, **kwargs):
+            self.events.append(event)
+            yield event
+
+    async def ainvoke(self, *args, **kwargs):
+        self.runs += 1
+        return await self.agent.ainvoke(*args, **kwargs)
+
+
+class Runtime:
+    model = None
+
+    def __init__(self):
+        self.tool_calls = 0
+
+        @tool
+        def create_bar_chart(query: str, x_column: str, y_column: str) -> str:
+            """Create a bar chart."""
+            self.tool_calls += 1
+            return json.dumps(CHART)
+
+        self.model = CountingModel(responses=[
+            AIMessage(content="", tool_calls=[{
+                "name": "create_bar_chart",
+                "args": {"query": "SELECT ...", "x_column": "region", "y_column": "sales"},
+                "id": "call_1",
+            }]),
+            AIMessage(content="North leads with 1.2M in sales."),
+        ])
+        self.agent = RecordingAgent(create_react_agent(self.model, [create_bar_chart]))
+
+    async def get_agent(self):
+        return self.agent
+
+
+HISTORY = [{"role": "user", "content": "Show sales by region"}]
+
+
+def test_one_agent_run_per_turn():
+    runtime = Runtime()
+
+    content, visualizations = asyncio.run(process_chat_message(HISTORY, None, runtime))
+
+    assert content == "North leads with 1.2M in sales."
+    assert visualizations == [CHART]
+    # One model call to pick the tool, one to answer, and the graph runs once
+    assert runtime.model.calls == 2
+    assert runtime.tool_calls == 1
+    assert runtime.agent.runs == 1
+
+
+def test_answer_comes_from_the_root_run():
+    runtime = Runtime()
+
+    async def collect():
+        return [event async for event in stream_chat_events(HISTORY, runtime)]
+
+    events = asyncio.run(collect())
+
+    assert [event["type"] for event in events] == ["tool_start", "tool_end", "visualization", "final"]
+    roots = [event for event in runtime.agent.events
+             if event["event"] == "on_chain_end" and not event.get("parent_ids")]
+    assert len(roots) == 1
+    assert events[-1]["content"] == roots[0]["data"]["output"]["messages"][-1].content
+    assert runtime.model.calls == 2
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.api.database import get_async_db
+from src.api.models import Base, Conversation, User
+from src.api.routers import chat
+from src.api.services.agent_runtime import get_agent_runtime
+
+
+class Runtime:
+    model = None
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "api.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    sessions = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with sessions() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api/chat")
+    app.dependency_overrides[get_async_db] = get_db
+    app.dependency_overrides[get_agent_runtime] = Runtime
+    with TestClient(app) as client:
+        async def seed():
+            async with sessions() as db:
+                db.add(User(id=1, username="analyst", email="analyst@example.com", password_hash="x"))
+                db.add(Conversation(id=1, user_id=1, title="sales"))
+                await db.commit()
+
+        client.portal.call(seed)
+        yield client
+        client.portal.call(async_engine.dispose)
+
+
+def stream(client):
+    with client.stream("POST", "/api/chat/conversations/1/messages/stream", json={"content": "how are sales?"}) as r:
+        assert r.status_code == 200
+        lines = [line for line in r.iter_lines() if line]
+    return [(lines[i][len("event: "):], json.loads(lines[i + 1][len("data: "):])) for i in range(0, len(lines), 2)]
+
+
+async def final_events(message_history, runtime):
+    yield {"type": "token", "content": "Sales "}
+    yield {"type": "final", "content": "Sales went up.", "visualizations": []}
+
+
+def test_stream_ends_with_done(client, monkeypatch):
+    monkeypatch.setattr(chat, "stream_chat_events", final_events)
+
+    events = stream(client)
+
+    assert [name for name, _ in events] == ["token", "done"]
+    assert events[-1][1]["message"]["content"] == "Sales went up."
+
+
+def test_agent_failure_ends_with_an_error_event(client, monkeypatch):
+    async def failing_events(message_history, runtime):
+        yield {"type": "token", "content": "Sales "}
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(chat, "stream_chat_events", failing_events)
+
+    events = stream(client)
+
+    assert [name for name, _ in events] == ["token", "error"]
+    assert events[-1][1] == {"type": "error", "message": "model unavailable"}
+
+
+def test_save_failure_ends_with_an_error_event(client, monkeypatch):
+    async def failing_save(*args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(chat, "stream_chat_events", final_events)
+    monkeypatch.setattr(chat, "save_assistant_reply", failing_save)
+
+    events = stream(client)
+
+    assert [name for name, _ in events] == ["token", "error"]
+    assert events[-1][1]["message"] == "database is locked"
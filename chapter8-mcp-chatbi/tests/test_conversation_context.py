@@ -0,0 +1,62 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.api.models import Base, Conversation, ConversationSummary, Message, User
+from src.api.services.conversation_context import ConversationContext, _tokens
+
+
+class Summarizer:
+    """Records the transcripts it is asked to summarize."""
+
+    def __init__(self):
+        self.transcripts = []
+
+    async def ainvoke(self, messages):
+        self.transcripts.append(messages[1].content)
+        return AIMessage(content=f"summary {len(self.transcripts)}")
+
+
+async def seed(tmp_path, messages):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'api.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    async with sessions() as db:
+        db.add(User(id=1, username="analyst", email="analyst@example.com", password_hash="x"))
+        db.add(Conversation(id=1, user_id=1, title="sales"))
+        for i in range(messages):
+            db.add(Message(conversation_id=1, role=("user", "assistant")[i % 2],
+                           content=f"message {i} about revenue by region " * 5))
+        await db.commit()
+    return engine, sessions
+
+
+def test_summary_is_folded_after_the_turn_in_batches(tmp_path):
+    async def run():
+        engine, sessions = await seed(tmp_path, 60)
+        context = ConversationContext(max_tokens=300, cache_messages=10, session_factory=sessions)
+        model = Summarizer()
+
+        async with sessions() as db:
+            history = await context.build_history(db, 1)
+        # Building the history never calls the model
+        assert model.transcripts == []
+        assert all(message["role"] != "system" for message in history)
+
+        await context.update_summary(1, model)
+        async with sessions() as db:
+            summary = await db.get(ConversationSummary, 1)
+            history = await context.build_history(db, 1)
+        await engine.dispose()
+        return model.transcripts, summary, history
+
+    transcripts, summary, history = asyncio.run(run())
+
+    # Every message before the window is folded, a batch of them per call
+    assert len(transcripts) > 1
+    assert all(_tokens([{"role": "user", "content": t}]) <= 300 + 50 for t in transcripts)
+    assert summary.summary == f"summary {len(transcripts)}"
+    assert history[0]["content"].endswith(summary.summary)
+    assert summary.summarized_upto == 60 - (len(history) - 1)
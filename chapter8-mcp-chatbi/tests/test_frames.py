@@ -0,0 +1,78 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from src.mcp_servers import frames
+from src.mcp_servers.charts import bar_chart, heatmap_chart, line_chart, pie_chart, scatter_chart
+from src.mcp_servers.result_store import ResultSet, read_result_table, write_result_file
+
+# "SELECT region, month, SUM(sales) AS sales ... GROUP BY region, month" on MySQL
+COLUMNS = ["region", "month", "sales"]
+ROWS = [
+    ("north", 1, Decimal("1200.50")),
+    ("north", 2, Decimal("980.25")),
+    ("south", 1, Decimal("1530.00")),
+    ("south", 2, None),
+]
+
+
+class FakeCursor:
+    description = [(name,) for name in COLUMNS]
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+
+def charts(df):
+    return [
+        bar_chart(df, "region", "sales", color_column="month"),
+        line_chart(df, "month", "sales", color_column="region"),
+        pie_chart(df, "region", "sales"),
+        scatter_chart(df, "month", "sales", size_column="sales"),
+        heatmap_chart(df, "region", "month", "sales"),
+    ]
+
+
+@pytest.mark.parametrize("encoding", ["json", "typed"])
+def test_decimal_query_result_charts_serialize(encoding):
+    df = frames.fetch_frame(FakeCursor(ROWS), chunk_size=2)
+
+    assert df["sales"].dtype.pyarrow_dtype == "double"
+    for chart in charts(df):
+        json.dumps(chart)
+    assert bar_chart(df, "region", "sales", encoding=encoding)["chart_data"]["data"][0]["type"] == "bar"
+
+
+def test_decimal_stored_result_charts_serialize(tmp_path, monkeypatch):
+    result = ResultSet([dict(zip(COLUMNS, row)) for row in ROWS], COLUMNS)
+    write_result_file("0123456789ab", "SELECT ...", result, directory=str(tmp_path))
+    monkeypatch.setattr(frames, "read_result_table", lambda result_id: read_result_table(result_id, str(tmp_path)))
+
+    df, truncated = frames.load_result_frame("0123456789ab")
+
+    assert not truncated
+    assert df["sales"].tolist()[:3] == [1200.5, 980.25, 1530.0]
+    for chart in charts(df):
+        json.dumps(chart)
+
+
+@pytest.mark.parametrize("chart", [line_chart, scatter_chart])
+def test_date_axis_over_the_point_budget(chart):
+    # "SELECT order_date, SUM(amount) ... GROUP BY order_date": a DATE x axis, downsampled
+    rows = [(date(2020, 1, 1) + timedelta(days=i), i % 7, Decimal(i % 100)) for i in range(6000)]
+    rows[10] = (None, 0, Decimal(1))
+    cursor = FakeCursor(rows)
+    cursor.description = [("order_date",), ("weekday",), ("amount",)]
+    df = frames.fetch_frame(cursor)
+
+    config = chart(df, "order_date", "amount", max_points=500)
+
+    assert config["downsampling"]["output_points"] <= 500
+    assert config["chart_data"]["data"][0]["x"][0] == "2020-01-01"
+    json.dumps(config)
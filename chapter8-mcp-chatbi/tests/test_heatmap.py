@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.mcp_servers.charts import heatmap_chart
+from src.mcp_servers.heatmap import HEATMAP_AGGS, heatmap_grid
+
+
+def make_frame(n_rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "region": rng.choice(["north", "south", "east", "west"], n_rows),
+        "month": rng.integers(1, 13, n_rows),
+        "sales": rng.random(n_rows) * 100,
+    })
+
+
+@pytest.mark.parametrize("agg", HEATMAP_AGGS)
+def test_matches_pivot_table(agg):
+    df = make_frame()
+    # Leave some cells empty
+    df = df[~((df["region"] == "east") & (df["month"] > 9))]
+
+    grid, x_labels, y_labels, _ = heatmap_grid(df, "region", "month", "sales", agg)
+
+    pivot = df.pivot_table(index="month", columns="region", values="sales", aggfunc=agg)
+    pivot = pivot.reindex(index=list(y_labels), columns=list(x_labels))
+    np.testing.assert_allclose(grid, pivot.to_numpy(dtype=float), equal_nan=True)
+
+
+@pytest.mark.parametrize("agg", HEATMAP_AGGS)
+@pytest.mark.parametrize("df", [
+    pd.DataFrame({"region": [], "month": [], "sales": []}),
+    # e.g. SUM over a LEFT JOIN without matches
+    pd.DataFrame({"region": ["north", "south"], "month": [1, 2], "sales": [None, None]}),
+], ids=["empty", "all_null"])
+def test_no_values(df, agg):
+    grid, x_labels, y_labels, _ = heatmap_grid(df, "region", "month", "sales", agg)
+
+    assert grid.shape == (len(y_labels), len(x_labels))
+    assert np.isnan(grid).all()
+    heatmap_chart(df, "region", "month", "sales", agg=agg)
+
+
+def test_large_axes_are_bounded():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({
+        "x": rng.normal(size=10000),
+        "y": [f"c{i}" for i in rng.integers(0, 500, 10000)],
+        "z": rng.random(10000),
+    })
+
+    grid, _, _, report = heatmap_grid(df, "x", "y", "z", bins=20, top_k=10)
+
+    assert grid.shape == (11, 20)
+    assert report["x"]["method"] == "bins" and report["y"]["method"] == "top_k"
+    assert np.nansum(grid) == pytest.approx(df["z"].sum())
+    json.dumps(heatmap_chart(df, "x", "y", "z", bins=20, top_k=10))
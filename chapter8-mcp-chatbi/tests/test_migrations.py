@@ -0,0 +1,52 @@
+import os
+
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'chatbi.db'}"
+    config = Config()
+    config.set_main_option("script_location", os.path.join(ROOT, "src", "api", "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    engine = sa.create_engine(url)
+    yield config, engine
+    engine.dispose()
+
+
+def index_names(engine, table):
+    return {index["name"] for index in sa.inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_downgrade_upgrade(database):
+    config, engine = database
+
+    command.upgrade(config, "head")
+    command.downgrade(config, "0001")
+    command.upgrade(config, "head")
+
+    # Raises if the schema differs from the models
+    command.check(config)
+
+
+def test_upgrade_after_a_mysql_downgrade(database):
+    config, engine = database
+    command.upgrade(config, "head")
+    command.downgrade(config, "0001")
+    # What a downgrade leaves on MySQL: the visualizations index stays as the
+    # foreign key index, and single-column foreign key indexes are put back
+    with engine.begin() as connection:
+        connection.execute(sa.text("CREATE INDEX ix_visualizations_conversation_id ON visualizations (conversation_id)"))
+        connection.execute(sa.text("CREATE INDEX ix_conversations_user_id ON conversations (user_id)"))
+        connection.execute(sa.text("CREATE INDEX ix_messages_conversation_id ON messages (conversation_id)"))
+
+    command.upgrade(config, "head")
+
+    assert "ix_conversations_user_id" not in index_names(engine, "conversations")
+    assert "ix_messages_conversation_id" not in index_names(engine, "messages")
+    command.check(config)
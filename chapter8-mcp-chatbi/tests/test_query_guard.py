@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from src.mcp_servers.query_guard import add_execution_time_hint, check_query
+
+
+def scan(rows):
+    return {"table_name": "orders", "access_type": "ALL", "rows_examined_per_scan": rows,
+            "rows_produced_per_join": rows}
+
+
+PLAIN_SCAN = {"query_block": {"select_id": 1, "table": scan(5_000_000)}}
+GROUPED_SCAN = {"query_block": {"select_id": 1, "grouping_operation": {
+    "using_temporary_table": True, "using_filesort": True, "table": scan(5_000_000)}}}
+
+
+class FakeConnection:
+    """Answers EXPLAIN FORMAT=JSON with a fixed plan."""
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    def cursor(self):
+        plan = self.plan
+
+        class Cursor:
+            def execute(self, operation, params=None):
+                assert operation.startswith("EXPLAIN FORMAT=JSON ")
+
+            def fetchone(self):
+                return (json.dumps(plan),)
+
+            def fetchall(self):
+                return []
+
+            def close(self):
+                pass
+
+        return Cursor()
+
+
+def test_limit_is_appended_to_a_plain_scan():
+    decision = check_query(FakeConnection(PLAIN_SCAN), "SELECT * FROM orders", action="limit", limit=1000)
+
+    assert decision.action == "limit"
+    assert decision.query == "SELECT * FROM orders LIMIT 1000"
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT region, SUM(amount) FROM orders GROUP BY region",
+    "SELECT region, SUM(amount) FROM orders GROUP BY region LIMIT 10",
+])
+def test_limit_falls_back_to_confirm_when_the_plan_needs_a_full_pass(query):
+    decision = check_query(FakeConnection(GROUPED_SCAN), query, action="limit", limit=1000)
+
+    assert decision.action == "confirm"
+    assert decision.query == query
+    assert decision.estimated_rows == 5_000_000
+
+
+def test_small_estimates_are_allowed():
+    decision = check_query(FakeConnection(GROUPED_SCAN), "SELECT 1", max_rows=10_000_000)
+
+    assert decision.action == "allow"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM orders",
+     "SELECT /*+ MAX_EXECUTION_TIME(5000) */ * FROM orders"),
+    ("WITH totals AS (SELECT region, SUM(amount) AS total FROM orders GROUP BY region) SELECT * FROM totals",
+     "WITH totals AS (SELECT /*+ MAX_EXECUTION_TIME(5000) */ region, SUM(amount) AS total FROM orders "
+     "GROUP BY region) SELECT * FROM totals"),
+    ("WITH t AS (SELECT /*+ NO_BNL() */ 1) SELECT * FROM t",
+     "WITH t AS (SELECT /*+ NO_BNL() */ 1) SELECT * FROM t"),
+])
+def test_execution_time_hint(query, expected):
+    assert add_execution_time_hint(query, 5000) == expected
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from src.mcp_servers import database_server
+from src.mcp_servers.result_store import ResultSet, ResultStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ResultStore(directory=str(tmp_path))
+    monkeypatch.setattr(database_server, "result_store", store)
+    return store
+
+
+def result(rows):
+    return ResultSet([{"region": f"r{i}", "revenue": i} for i in range(rows)], ["region", "revenue"])
+
+
+def test_single_page_result_is_not_stored(store, tmp_path):
+    body = json.loads(database_server.render_page("SELECT 1 -- single", result(3), "columnar", page_size=10))
+
+    assert body["row_count"] == 3
+    assert "result_id" not in body
+    assert store.metrics()["stored"] == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_paged_result_is_stored_for_charts_and_later_pages(store, tmp_path):
+    body = json.loads(database_server.render_page("SELECT 1 -- paged", result(25), "columnar", page_size=10))
+
+    assert body["returned_rows"] == 10
+    assert body["next_page_token"] == f"{body['result_id']}:10"
+    assert store.metrics()["files_written"] == 1
+    assert (tmp_path / f"{body['result_id']}.parquet").exists()